@@ -21,6 +21,11 @@ class TestSqlModel(BaseModel):
     db: str | None = None
 
 
+class TestSqlBatchModel(BaseModel):
+    sql: list[str]
+    db: str | None = None
+
+
 class GetSchemaModel(BaseModel):
     db: str | None = None
 
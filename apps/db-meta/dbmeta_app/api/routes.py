@@ -1,18 +1,29 @@
+import hashlib
 import logging
 from typing import Annotated, Any
 
 from fastapi import Header
 from fastmcp import FastMCP
 
-from dbmeta_app.api.model import GetPromptModel, PromptsSetModel, TestSqlModel
+from dbmeta_app.api.model import (
+    GetPromptModel,
+    GetSchemaModel,
+    PromptsSetModel,
+    TestSqlBatchModel,
+    TestSqlModel,
+)
 from dbmeta_app.config import get_settings
+from dbmeta_app.metrics import tool_timer
 from dbmeta_app.prompt_items.db_struct import (
     DbSchema,
     PreflightResult,
+    aget_schema_prompt_item,
     get_data_samples,
     get_db_schema,
-    get_schema_prompt_item,
-    query_preflight,
+    preflight_cache,
+    query_preflight_async,
+    query_preflight_batch,
+    schema_prompt_cache,
 )
 from dbmeta_app.prompt_items.prompt_instructions import (
     get_prompt_instructions,
@@ -23,7 +34,10 @@ from dbmeta_app.prompt_items.query_examples import (
     get_query_examples,
 )
 from dbmeta_app.prompt_items.sql_dialect import get_sql_dialect_item
-from dbmeta_app.vector_db.milvus import QueryExample
+from dbmeta_app.vector_db.embeddings import embedding_cache
+from dbmeta_app.vector_db.model import QueryExample
+from dbmeta_app.vector_db.search import hits_cache
+from dbmeta_app.wh_db.db import pool_stats
 
 settings = get_settings()
 
@@ -41,7 +55,7 @@ async def get_prompts_set(
     db = req.db if req.db else settings.database_wh_db
     response = PromptsSetModel(
         prompt_items=[
-            get_schema_prompt_item(),
+            await aget_schema_prompt_item(profile=req.db),
             get_query_example_prompt_item(query=user_request, db=db),
             get_prompt_instructions_item(profile=db),
         ],
@@ -62,8 +76,14 @@ async def prompt_items(
     )
     user_request = req.user_request
     db = req.db if req.db else settings.database_wh_db
+    with tool_timer("prompt_items"):
+        return await _db_meta_prompt(user_request, db, req.db)
+
+
+async def _db_meta_prompt(user_request: str, db: str, profile: str | None) -> str:
+    schema = await aget_schema_prompt_item(profile=profile)
     db_meta = f"""
-        {get_schema_prompt_item().text}\n\n
+        {schema.text}\n\n
         {get_query_example_prompt_item(query=user_request, db=db).text}\n\n
         {get_prompt_instructions_item(profile=db).text}
         {get_sql_dialect_item(profile=db).text}
@@ -71,6 +91,25 @@ async def prompt_items(
     return db_meta
 
 
+@mcp.tool()
+async def schema_fingerprint(req: GetSchemaModel) -> str:
+    """
+    Hash of the request-independent part of `prompt_items` (schema, instructions
+    and dialect); it changes whenever answers built on that prompt may be stale.
+    """
+    db = req.db if req.db else settings.database_wh_db
+    with tool_timer("schema_fingerprint"):
+        schema = await aget_schema_prompt_item(profile=req.db)
+        text = "\n".join(
+            [
+                schema.text,
+                get_prompt_instructions_item(profile=db).text,
+                get_sql_dialect_item(profile=db).text,
+            ]
+        )
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
 # @app.get("/schema/{db_name}")
 async def db_schema(db_name: str) -> DbSchema:
     """
@@ -118,6 +157,48 @@ async def preflight_query(req: TestSqlModel) -> PreflightResult:
     Returns an object which could contain **explanation** or **error** fields.
     Presence or absence of **error** field indicates if the query is invalid or not.
     """
-    db = req.db or get_settings().database_wh_db
     query = req.sql
-    return query_preflight(query=query)
+    with tool_timer("preflight_query"):
+        return await query_preflight_async(query=query, profile=req.db)
+
+
+@mcp.tool()
+async def preflight_queries(req: TestSqlBatchModel) -> list[PreflightResult]:
+    """
+    Batch variant of **preflight_query**: checks several queries concurrently.
+    Returns one result per query, in the same order as **sql**.
+    """
+    with tool_timer("preflight_queries"):
+        return await query_preflight_batch(queries=req.sql, profile=req.db)
+
+
+@mcp.resource("stats://schema_cache")
+async def schema_cache_stats() -> dict[str, Any]:
+    """
+    Schema prompt cache counters: hits, misses, hit_rate, background refreshes.
+    """
+    return schema_prompt_cache.stats()
+
+
+@mcp.resource("stats://wh_pool")
+async def wh_pool_stats() -> dict[str, Any]:
+    """
+    ClickHouse pool utilization per warehouse profile.
+    """
+    return pool_stats()
+
+
+@mcp.resource("stats://preflight_cache")
+async def preflight_cache_stats() -> dict[str, Any]:
+    """
+    EXPLAIN result cache counters.
+    """
+    return preflight_cache.stats()
+
+
+@mcp.resource("stats://query_examples_cache")
+async def query_examples_cache_stats() -> dict[str, Any]:
+    """
+    Query-example embedding cache and vector search result cache counters.
+    """
+    return {"embeddings": embedding_cache.stats(), "hits": hits_cache.stats()}
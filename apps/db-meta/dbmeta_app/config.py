@@ -9,6 +9,7 @@ load_dotenv()
 
 class Settings(BaseSettings):
     port: int = 8080
+    metrics_port: int = 9100  # Prometheus exporter; 0 disables
     log_level: str = "INFO"
     database_wh_user: Optional[str] = None
     database_wh_pass: Optional[str] = None
@@ -32,11 +33,29 @@ class Settings(BaseSettings):
     vector_db_metric_type: Optional[str] = "L2"
     vector_db_index_type: Optional[str] = "HNSW"
     vector_db_params: Optional[str] = '{"nprobe": 15}'
+    vector_db_backend: str = "milvus"  # "milvus" | "local"
+    local_index_dir: str = "/tmp/dbmeta_app_index"
     etl_file_name: Optional[str] = None
     schema_descriptions_file: Optional[str] = None
     query_examples_file: Optional[str] = None
     prompt_instructions_file: Optional[str] = None
     data_examples: bool = False
+    schema_cache_ttl: int = 600
+    schema_cache_check_interval: int = 30
+    schema_cache_profiles: str = ""  # prewarmed at startup; empty = default_profile
+    wh_pool_size: int = 20
+    wh_max_overflow: int = 30
+    wh_pool_timeout: int = 30
+    preflight_workers: int = 8
+    preflight_cache_size: int = 2048
+    preflight_cache_ttl: int = 600
+    embedding_cache_size: int = 4096
+    embedding_cache_dir: Optional[str] = None
+    embedding_batch_size: int = 256
+    embedding_concurrency: int = 4
+    embedding_retries: int = 5
+    hits_cache_size: int = 1024
+    hits_cache_ttl: int = 120
     openai_api_key: Optional[str] = None
     client: Optional[str] = "apegpt"
     env: Optional[str] = "prod"
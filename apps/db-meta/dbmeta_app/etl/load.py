@@ -1,9 +1,8 @@
+import hashlib
 import json
-import pathlib
+import time
 
 import numpy as np
-import openai
-import pymilvus
 from pymilvus import (
     Collection,
     CollectionSchema,
@@ -14,7 +13,9 @@ from pymilvus import (
 )
 
 from dbmeta_app.config import get_settings
-from dbmeta_app.prompt_assembler.prompt_packs import assemble_effective_tree, load_yaml
+from dbmeta_app.vector_db.embeddings import get_embeddings, get_embeddings_batched
+from dbmeta_app.vector_db.examples import example_text, load_examples
+from dbmeta_app.vector_db.model import QueryExample
 
 # print(os.getenv("VECTOR_DB_EMBEDDINGS"))
 
@@ -26,46 +27,18 @@ settings = get_settings()
 collection_name = settings.vector_db_collection_name
 
 
-def get_embeddings(
-    texts: list[str], model: str = settings.vector_db_embeddings
-) -> list[list[float]]:
-    response = openai.embeddings.create(input=texts, model=model)
-    # Order is preserved in OpenAI responses
-    return [r.embedding for r in response.data]
-
-
 def normalize_vector(vector):
     norm = np.linalg.norm(vector)
     return vector / (norm if norm > 0 else vector)  # Avoid division by zero
 
 
-def load_query_examples():
-    settings = get_settings()
-    repo_root = pathlib.Path(settings.packs_resources_dir).resolve()
-    client = settings.client
-    env = settings.env
-    profile = settings.default_profile
-    tree = assemble_effective_tree(repo_root, profile, client, env)
-
-    file = load_yaml(tree, "resources/query_examples.yaml")
-    data = file["profiles"][profile]["examples"]
-    examples = []
-    print(f"loaded {len(data)} examples")
-    for row in data:
-        request = row.get("request", "").strip()
-        response = row.get("response", "").strip()
-        db = row.get("db", "").strip()
-        # print(f"loading: {request} -> {response} ({db})")
-        examples.append((request, response, db))
-
-    # Generate embeddings
-    example_texts = [
-        f"User request: {request}, SQL response {response}"
-        for request, response, db in examples
-    ]
-    token_embeddings = get_embeddings(example_texts)
+def example_hash(request: str, response: str, db: str, model: str) -> str:
+    """Content key of an indexed row; any edit (or a new model) changes it."""
+    payload = json.dumps([request, response, db, model], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 
-    # Connect to Milvus
+def connect():
     if settings.vector_db_port is not None and settings.vector_db_host is not None:
         connections.connect(
             host=settings.vector_db_host,
@@ -84,20 +57,93 @@ def load_query_examples():
         )
         exit(1)
 
-    # Define schema
+
+def collection_description(model: str) -> str:
+    return f"Query examples ({model})"
+
+
+def collection_schema(dim: int, model: str) -> CollectionSchema:
     fields = [
-        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
         FieldSchema(
-            name="embedding", dtype=DataType.FLOAT_VECTOR, dim=len(token_embeddings[0])
+            name="content_hash",
+            dtype=DataType.VARCHAR,
+            max_length=64,
+            is_primary=True,
+            auto_id=False,
         ),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=dim),
         FieldSchema(name="request", dtype=DataType.VARCHAR, max_length=1000),
         FieldSchema(name="response", dtype=DataType.VARCHAR, max_length=5000),
         FieldSchema(name="db", dtype=DataType.VARCHAR, max_length=20),
     ]
-    schema = CollectionSchema(fields, description="Query examples")
+    return CollectionSchema(fields, description=collection_description(model))
+
+
+def current_collection() -> Collection | None:
+    """
+    The physical collection the serving alias points at, or None when the
+    alias does not exist yet (first run, or a pre-alias plain collection).
+    """
+    for name in utility.list_collections():
+        if collection_name in utility.list_aliases(name):
+            return Collection(name)
+    return None
+
+
+def is_compatible(collection: Collection, model: str) -> bool:
+    """Keyed by content hash and embedded with the same model (same dim)."""
+    fields = {f.name: f for f in collection.schema.fields}
+    if "content_hash" not in fields or not fields["content_hash"].is_primary:
+        return False
+    return collection.description == collection_description(model)
+
+
+def indexed_hashes(collection: Collection) -> set[str]:
+    iterator = collection.query_iterator(
+        batch_size=1000, expr='content_hash != ""', output_fields=["content_hash"]
+    )
+    hashes = set()
+    try:
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            hashes.update(row["content_hash"] for row in batch)
+    finally:
+        iterator.close()
+    return hashes
+
+
+def to_entities(rows: list[tuple[str, str, str, str]]) -> list[dict]:
+    texts = [example_text(request, response) for _, request, response, _ in rows]
+    embeddings = get_embeddings_batched(texts)
+    return [
+        {
+            "content_hash": content_hash,
+            "embedding": normalize_vector(np.array(embedding)),
+            "request": request,
+            "response": response,
+            "db": db,
+        }
+        for (content_hash, request, response, db), embedding in zip(rows, embeddings)
+    ]
+
 
-    # Create or load collection
-    collection_name = settings.vector_db_collection_name
+def insert_batched(collection: Collection, entities: list[dict]):
+    batch_size = settings.embedding_batch_size
+    for i in range(0, len(entities), batch_size):
+        collection.upsert(entities[i : i + batch_size])
+
+
+def rebuild(
+    rows: list[tuple[str, str, str, str]], previous: Collection | None, model: str
+):
+    """
+    Build a fresh versioned collection next to the serving one, then flip the
+    alias to it. Searches keep hitting the old collection until the flip.
+    """
+    entities = to_entities(rows)
+    dim = len(entities[0]["embedding"])
     index_params = {
         "metric_type": settings.vector_db_metric_type,
         # Use Inner Product for Cosine Similarity
@@ -106,27 +152,71 @@ def load_query_examples():
         "params": json.loads(settings.vector_db_params),
         # Adjust based on dataset size
     }
-    if collection_name in pymilvus.utility.list_collections():
-        utility.drop_collection(collection_name)
-    collection = Collection(name=collection_name, schema=schema)
+    physical_name = f"{collection_name}_{int(time.time())}"
+    collection = Collection(name=physical_name, schema=collection_schema(dim, model))
+    insert_batched(collection, entities)
+    collection.flush()
     collection.create_index("embedding", index_params)
+    collection.load()
+    utility.wait_for_loading_complete(physical_name)
 
-    # Insert data into Milvus
+    if previous is not None:
+        utility.alter_alias(physical_name, collection_name)
+        previous.release()
+        utility.drop_collection(previous.name)
+    else:
+        if collection_name in utility.list_collections():
+            # one-off migration from the pre-alias layout: the alias cannot
+            # shadow a real collection, so this is the only gap in serving
+            utility.drop_collection(collection_name)
+        utility.create_alias(physical_name, collection_name)
+    print(f"Rebuilt {physical_name} with {len(entities)} examples, alias flipped")
 
-    entities = [
-        {
-            "embedding": normalize_vector(np.array(token_embeddings[i])),
-            # "embedding": normalized_vector,
-            "request": examples[i][0],
-            "response": examples[i][1],
-            "db": examples[i][2],
-        }
-        for i in range(len(examples))
-    ]
 
-    collection.insert(entities)
-    collection.flush()
-    print("Inserted embeddings into Milvus")
+def load_query_examples():
+    """
+    Sync the serving collection with the effective query_examples.yaml.
+
+    Rows are keyed by content hash, so only new or edited examples are
+    embedded and upserted, and removed ones are deleted; unchanged rows are
+    left alone. A full rebuild (new collection + alias flip) only happens
+    when there is no compatible collection yet or the embedding model
+    changed.
+    """
+    model = settings.vector_db_embeddings
+    wanted = {}
+    for request, response, db in load_examples():
+        wanted[example_hash(request, response, db, model)] = (request, response, db)
+    print(f"loaded {len(wanted)} examples")
+    if not wanted:
+        print("No query examples found, leaving the collection untouched")
+        return
+
+    connect()
+    collection = current_collection()
+    rows = [(h, *example) for h, example in wanted.items()]
+    if collection is None or not is_compatible(collection, model):
+        rebuild(rows, collection, model)
+        return
+
+    existing = indexed_hashes(collection)
+    added = [row for row in rows if row[0] not in existing]
+    removed = sorted(existing - wanted.keys())
+    print(
+        f"{len(added)} new/changed, {len(removed)} removed, "
+        f"{len(existing) - len(removed)} unchanged"
+    )
+
+    # insert first so an edited example is never briefly missing
+    if added:
+        insert_batched(collection, to_entities(added))
+    batch_size = settings.embedding_batch_size
+    for i in range(0, len(removed), batch_size):
+        batch = removed[i : i + batch_size]
+        collection.delete(expr=f"content_hash in {json.dumps(batch)}")
+    if added or removed:
+        collection.flush()
+    print("Query examples in sync")
 
 
 def get_hits(query: str, db: str, top_k=3):
@@ -140,19 +230,8 @@ def get_hits(query: str, db: str, top_k=3):
         "params": json.loads(settings.vector_db_params),
     }
 
-    fields = [
-        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-        FieldSchema(
-            name="embedding",
-            dtype=DataType.FLOAT_VECTOR,
-            dim=len(get_embeddings([query])[0]),
-        ),
-        FieldSchema(name="request", dtype=DataType.VARCHAR, max_length=1000),
-        FieldSchema(name="response", dtype=DataType.VARCHAR, max_length=5000),
-        FieldSchema(name="db", dtype=DataType.VARCHAR, max_length=20),
-    ]
-    schema = CollectionSchema(fields, description="Query examples")
-    collection = Collection(name=collection_name, schema=schema)
+    connect()
+    collection = Collection(name=collection_name)  # resolved through the alias
 
     results = collection.search(
         # data=[query_embedding.tolist()],  # Query vector
@@ -163,7 +242,6 @@ def get_hits(query: str, db: str, top_k=3):
         output_fields=["request", "response"],
         expr=f'db == "{db}"',
     )
-    from dbmeta_app.vector_db.milvus import QueryExample
     output = []
     for i, hit in enumerate(results[0]):
         request = hit.entity.get("request")
@@ -7,6 +7,9 @@ from fastmcp import Client, FastMCP
 from dbmeta_app.api.routes import mcp
 from dbmeta_app.config import get_settings
 from dbmeta_app.logs import LOGGING_CONFIG
+from dbmeta_app.metrics import start_exporter
+from dbmeta_app.prompt_items.db_struct import prewarm_schema_prompts
+from dbmeta_app.wh_db.db import dispose_engines
 
 logging.config.dictConfig(LOGGING_CONFIG)
 
@@ -69,10 +72,25 @@ def main():
     """
     # Optional: skip this on production boots if it slows startup; gate via env
     # if settings.check_mcp_on_start:
+    if settings.vector_db_backend == "local":
+        # build (or load) the in-process example index before taking traffic
+        from dbmeta_app.vector_db.local_index import get_index
+
+        get_index()
+
+    # the first prompt_items call of a profile shouldn't wait for its schema
+    prewarm_schema_prompts()
+
     asyncio.run(check_mcp(mcp))
 
+    if settings.metrics_port:
+        start_exporter(settings.metrics_port)
+
     # Start the FastMCP (FastAPI/uvicorn) server; this is typically blocking.
-    mcp.run(transport="sse", host="0.0.0.0", port=settings.port)
+    try:
+        mcp.run(transport="sse", host="0.0.0.0", port=settings.port)
+    finally:
+        dispose_engines()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+"""
+Prometheus metrics for the db-meta MCP server.
+
+db-meta is a single process, so the default registry is served as-is from
+a background thread on `metrics_port` (see main.py).
+"""
+
+import contextlib
+import time
+
+from prometheus_client import Histogram, start_http_server
+from sqlalchemy import Engine, event
+
+_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+_ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000)
+
+TOOL_DURATION = Histogram(
+    "dbmeta_tool_duration_seconds",
+    "MCP tool latency",
+    ["tool", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+WH_QUERY_DURATION = Histogram(
+    "dbmeta_wh_query_duration_seconds",
+    "ClickHouse query time",
+    ["profile", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+WH_ROWS_RETURNED = Histogram(
+    "dbmeta_wh_rows_returned",
+    "Rows returned by ClickHouse queries",
+    ["profile"],
+    buckets=_ROW_BUCKETS,
+)
+WH_POOL_WAIT = Histogram(
+    "dbmeta_wh_pool_wait_seconds",
+    "Time spent waiting for a warehouse connection from the pool",
+    buckets=_LATENCY_BUCKETS,
+)
+
+
+@contextlib.contextmanager
+def tool_timer(tool: str):
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        TOOL_DURATION.labels(tool, outcome).observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine: Engine, profile: str):
+    """Time every statement on `engine` and record the rows it returned."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        WH_QUERY_DURATION.labels(profile, "ok").observe(time.perf_counter() - start)
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            WH_ROWS_RETURNED.labels(profile).observe(cursor.rowcount)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = (
+            context.connection.info.get("query_start") if context.connection else None
+        )
+        if starts:
+            WH_QUERY_DURATION.labels(profile, "error").observe(
+                time.perf_counter() - starts.pop()
+            )
+
+
+def start_exporter(port: int):
+    start_http_server(port)
@@ -1,4 +1,9 @@
+import asyncio
+import hashlib
+import logging
 import pathlib
+import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict
 
 import yaml
@@ -6,8 +11,14 @@ from pydantic import BaseModel, RootModel
 from sqlalchemy import inspect, text
 
 from dbmeta_app.api.model import PromptItem, PromptItemType
+from dbmeta_app.cache import TTLCache
 from dbmeta_app.config import get_settings
-from dbmeta_app.prompt_assembler.prompt_packs import assemble_effective_tree, load_yaml
+from dbmeta_app.prompt_assembler.prompt_packs import (
+    assemble_effective_tree,
+    load_yaml,
+    sha256_bytes,
+)
+from dbmeta_app.prompt_items.schema_cache import SchemaPromptCache
 from dbmeta_app.wh_db.db import get_db
 
 
@@ -38,14 +49,14 @@ def load_yaml_descriptions(yaml_file):
         return yaml.safe_load(file)
 
 
-def generate_schema_prompt(engine, settings, with_examples=False):
+def generate_schema_prompt(engine, settings, with_examples=False, profile=None):
     """Generates a human-readable schema description merged with YAML descriptions,
     including examples."""
     inspector = inspect(engine)
     repo_root = pathlib.Path(settings.packs_resources_dir).resolve()
     client = settings.client
     env = settings.env
-    profile = settings.default_profile
+    profile = profile or settings.default_profile
     tree = assemble_effective_tree(repo_root, profile, client, env)
 
     file = load_yaml(tree, "resources/schema_descriptions.yaml")
@@ -131,21 +142,91 @@ def generate_schema_prompt(engine, settings, with_examples=False):
     return schema_text
 
 
-def get_schema_prompt_item() -> PromptItem:
+def _build_schema_prompt(key) -> str:
+    profile, _client, _env, with_examples = key
+    return generate_schema_prompt(
+        get_db(profile), get_settings(), with_examples=with_examples, profile=profile
+    )
+
+
+def _schema_fingerprint(scope) -> tuple:
+    """
+    Cheap change detector: ClickHouse DDL timestamps and a column signature,
+    plus the effective schema_descriptions overlay bytes. Computed per
+    (profile, client, env), whatever the with_examples flag of the key.
+    """
+    profile, client, env = scope
     settings = get_settings()
-    engine = get_db()
+    with get_db(profile).connect() as conn:
+        tables = conn.execute(
+            text(
+                "SELECT count(), max(metadata_modification_time) FROM system.tables "
+                "WHERE database = currentDatabase()"
+            )
+        ).fetchone()
+        columns = conn.execute(
+            text(
+                "SELECT count(), sum(cityHash64(table, name, type)) "
+                "FROM system.columns WHERE database = currentDatabase()"
+            )
+        ).fetchone()
+    repo_root = pathlib.Path(settings.packs_resources_dir).resolve()
+    tree = assemble_effective_tree(repo_root, profile, client, env)
+    descriptions = tree.get("resources/schema_descriptions.yaml", b"")
+    return tuple(tables), tuple(columns), sha256_bytes(descriptions)
+
+
+_settings = get_settings()
+schema_prompt_cache = SchemaPromptCache(
+    build=_build_schema_prompt,
+    fingerprint=_schema_fingerprint,
+    fingerprint_key=lambda key: key[:3],
+    ttl=_settings.schema_cache_ttl,
+    check_interval=_settings.schema_cache_check_interval,
+)
 
+
+def _schema_key(profile: str | None) -> tuple:
+    settings = get_settings()
+    return (
+        profile or settings.default_profile,
+        settings.client,
+        settings.env,
+        settings.data_examples,
+    )
+
+
+def _schema_prompt_item(text: str) -> PromptItem:
     return PromptItem(
-        text=generate_schema_prompt(
-            engine,
-            settings,
-            with_examples=settings.data_examples,
-        ),
+        text=text,
         prompt_item_type=PromptItemType.db_struct,
         score=100_000,
     )
 
 
+def get_schema_prompt_item(profile: str | None = None) -> PromptItem:
+    return _schema_prompt_item(schema_prompt_cache.get(_schema_key(profile)))
+
+
+async def aget_schema_prompt_item(profile: str | None = None) -> PromptItem:
+    return _schema_prompt_item(await schema_prompt_cache.aget(_schema_key(profile)))
+
+
+def prewarm_schema_prompts():
+    """Build the schema prompts of `schema_cache_profiles` before taking traffic."""
+    settings = get_settings()
+    profiles = [p.strip() for p in settings.schema_cache_profiles.split(",")]
+    for profile in [p for p in profiles if p] or [settings.default_profile]:
+        try:
+            get_schema_prompt_item(profile)
+        except Exception as e:
+            # the first request of the profile builds it instead
+            logging.warning(
+                "Schema prompt prewarm failed",
+                extra={"profile": profile, "error": str(e)},
+            )
+
+
 def get_db_schema() -> DbSchema:
     settings = get_settings()
     engine = get_db()
@@ -241,8 +322,8 @@ def get_data_samples() -> dict[str, Any]:
     return result
 
 
-def query_preflight(query: str) -> PreflightResult:
-    engine = get_db()
+def query_preflight(query: str, profile: str | None = None) -> PreflightResult:
+    engine = get_db(profile)
     with engine.connect() as conn:
         try:
             res = conn.execute(text(f"EXPLAIN ESTIMATE {query}"))
@@ -252,3 +333,65 @@ def query_preflight(query: str) -> PreflightResult:
 
         except Exception as e:
             return PreflightResult(error=f"SQL error: {str(e)}")
+
+
+# EXPLAIN runs on its own pool so the MCP event loop never blocks on ClickHouse
+_preflight_executor = ThreadPoolExecutor(
+    max_workers=_settings.preflight_workers, thread_name_prefix="preflight"
+)
+preflight_cache = TTLCache(
+    maxsize=_settings.preflight_cache_size, ttl=_settings.preflight_cache_ttl
+)
+
+
+# string literals and quoted identifiers, where whitespace is significant
+_QUOTED = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|`(?:[^`\\]|\\.)*`")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Whitespace/trailing-semicolon insensitive form used for cache keys; quoted
+    literals and identifiers are kept as written.
+    """
+    parts = []
+    end = 0
+    for quoted in _QUOTED.finditer(sql):
+        parts.append(re.sub(r"\s+", " ", sql[end : quoted.start()]))
+        parts.append(quoted.group())
+        end = quoted.end()
+    parts.append(re.sub(r"\s+", " ", sql[end:]))
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def _preflight_key(query: str, profile: str | None) -> tuple[str, str]:
+    profile = profile or get_settings().default_profile
+    digest = hashlib.sha256(normalize_sql(query).encode("utf-8")).hexdigest()
+    return profile, digest
+
+
+async def query_preflight_async(
+    query: str, profile: str | None = None
+) -> PreflightResult:
+    key = _preflight_key(query, profile)
+    cached = preflight_cache.get(key)
+    if cached is not None:
+        return cached
+
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        _preflight_executor, query_preflight, query, profile
+    )
+    # server-side rejections are deterministic for the same SQL; anything else
+    # (connection drops, timeouts) is retried on the next call
+    if result.error is None or "DB::Exception" in result.error:
+        preflight_cache.set(key, result)
+    return result
+
+
+async def query_preflight_batch(
+    queries: list[str], profile: str | None = None
+) -> list[PreflightResult]:
+    """EXPLAIN several statements concurrently; results keep input order."""
+    return list(
+        await asyncio.gather(*(query_preflight_async(q, profile) for q in queries))
+    )
@@ -1,5 +1,6 @@
 from dbmeta_app.api.model import PromptItem, PromptItemType
-from dbmeta_app.vector_db.milvus import QueryExample, get_hits
+from dbmeta_app.vector_db.model import QueryExample
+from dbmeta_app.vector_db.search import get_hits
 
 
 def get_query_example_prompt_item(query: str, db: str) -> PromptItem:
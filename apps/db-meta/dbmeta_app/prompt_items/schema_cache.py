@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+
+
+@dataclass
+class _Entry:
+    text: str
+    fingerprint: Any
+    built_at: float
+    used_at: float
+
+
+class SchemaPromptCache:
+    """
+    Rendered schema text per key, refreshed off the request path.
+
+    A background thread re-checks every `check_interval` seconds and rebuilds an
+    entry when its TTL expired or when its fingerprint changed (e.g. ClickHouse
+    metadata_modification_time). Requests only wait for the very first build of a
+    key (coroutines use `aget`, which runs it in a worker thread); after that they
+    always get the last good text.
+
+    Keys sharing a `fingerprint_key` (e.g. one warehouse profile) share one
+    `fingerprint` call per pass. Entries not requested for longer than `ttl` are
+    dropped instead of refreshed, so idle keys cost no warehouse queries.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[Hashable], str],
+        fingerprint: Callable[[Hashable], Any],
+        ttl: float = 600.0,
+        check_interval: float = 30.0,
+        fingerprint_key: Callable[[Hashable], Hashable] = lambda key: key,
+    ):
+        self._build = build
+        self._fingerprint = fingerprint
+        self._fingerprint_key = fingerprint_key
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._entries: dict[Hashable, _Entry] = {}
+        self._lock = threading.Lock()
+        self._build_locks: dict[Hashable, threading.Lock] = {}
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> str:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            entry.used_at = time.monotonic()
+            return entry.text
+
+        self.misses += 1
+        self.start()
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        # only one request builds a cold key, the rest wait for its result
+        with build_lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._rebuild(key)
+        return entry.text
+
+    async def aget(self, key: Hashable) -> str:
+        """`get` for the event loop: a cold build doesn't block it."""
+        if key in self._entries:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    def _rebuild(self, key: Hashable, fingerprint: Any = None) -> _Entry:
+        if fingerprint is None:
+            fingerprint = self._fingerprint(self._fingerprint_key(key))
+        previous = self._entries.get(key)
+        now = time.monotonic()
+        entry = _Entry(
+            text=self._build(key),
+            fingerprint=fingerprint,
+            built_at=now,
+            used_at=previous.used_at if previous is not None else now,
+        )
+        self._entries[key] = entry
+        return entry
+
+    def invalidate(self, key: Hashable | None = None):
+        """Drop one key (or everything); the next request rebuilds it."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def refresh_due(self):
+        """One pass of the background refresher; safe to call directly."""
+        now = time.monotonic()
+        fingerprints: dict[Hashable, Any] = {}
+        for key, entry in list(self._entries.items()):
+            if now - entry.used_at >= self.ttl:
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                self.evictions += 1
+                continue
+            try:
+                scope = self._fingerprint_key(key)
+                if scope not in fingerprints:
+                    fingerprints[scope] = self._fingerprint(scope)
+                expired = now - entry.built_at >= self.ttl
+                if not expired and fingerprints[scope] == entry.fingerprint:
+                    continue
+                self._rebuild(key, fingerprints[scope])
+                self.refreshes += 1
+            except Exception as e:
+                # keep serving the previous text
+                self.refresh_errors += 1
+                logging.warning(
+                    "Schema cache refresh failed",
+                    extra={"key": str(key), "error": str(e)},
+                )
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            self.refresh_due()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="schema-prompt-cache", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+        }
@@ -0,0 +1,71 @@
+import pytest
+
+from dbmeta_app.prompt_items import db_struct
+from dbmeta_app.prompt_items.db_struct import PreflightResult, normalize_sql
+
+
+@pytest.mark.parametrize(
+    "sql, normalized",
+    [
+        ("select  *\n\tfrom trades ;", "select * from trades"),
+        ("  SELECT 1;;  ", "SELECT 1"),
+        ("select * from t where a = 'x  y'", "select * from t where a = 'x  y'"),
+        ("select 'it''s  ok',\n  1", "select 'it''s  ok', 1"),
+        ("select 'a\\'  b'  ,  2", "select 'a\\'  b' , 2"),
+        ('select "my  col"  from `my  table`', 'select "my  col" from `my  table`'),
+    ],
+)
+def test_normalize_sql(sql, normalized):
+    assert normalize_sql(sql) == normalized
+
+
+def test_literal_whitespace_changes_the_key():
+    a = db_struct._preflight_key("select * from t where a = 'x y'", "wh_v2")
+    b = db_struct._preflight_key("select * from t where a = 'x  y'", "wh_v2")
+    assert a != b
+
+
+def test_preflight_key_is_per_profile():
+    default = db_struct.get_settings().default_profile
+    sql = "select count() from trades"
+    assert db_struct._preflight_key(sql, None) == db_struct._preflight_key(sql, default)
+    assert db_struct._preflight_key(sql, "wh")[0] == "wh"
+    assert db_struct._preflight_key(sql, "wh") != db_struct._preflight_key(sql, "wh_v2")
+
+
+@pytest.fixture
+def explains(monkeypatch):
+    calls = []
+
+    def query_preflight(query, profile=None):
+        calls.append((query, profile))
+        if "missing" in query:
+            return PreflightResult(error="SQL error: DB::Exception: no table")
+        if "timeout" in query:
+            return PreflightResult(error="SQL error: timed out")
+        return PreflightResult(explanation=[{"rows": 1}])
+
+    monkeypatch.setattr(db_struct, "query_preflight", query_preflight)
+    db_struct.preflight_cache.clear()
+    yield calls
+    db_struct.preflight_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_preflight_is_cached_per_profile(explains):
+    await db_struct.query_preflight_async("select 1", "wh_v2")
+    await db_struct.query_preflight_async("select  1;", "wh_v2")
+    await db_struct.query_preflight_async("select 1", "wh")
+    assert explains == [("select 1", "wh_v2"), ("select 1", "wh")]
+
+
+@pytest.mark.asyncio
+async def test_only_deterministic_errors_are_cached(explains):
+    for _ in range(2):
+        await db_struct.query_preflight_async("select * from missing", "wh_v2")
+        await db_struct.query_preflight_async("select timeout", "wh_v2")
+    assert [query for query, _ in explains] == [
+        "select * from missing",
+        "select timeout",
+        "select timeout",
+    ]
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+
+import pytest
+
+from dbmeta_app.prompt_items.schema_cache import SchemaPromptCache
+
+
+class Warehouse:
+    """Fake schema source: one text and one DDL version per profile."""
+
+    def __init__(self):
+        self.versions = {"wh": 1, "wh_v2": 1}
+        self.builds = []
+        self.fingerprints = []
+
+    def build(self, key) -> str:
+        profile = key[0]
+        self.builds.append(key)
+        return f"{profile} schema v{self.versions[profile]}"
+
+    def fingerprint(self, scope):
+        self.fingerprints.append(scope)
+        return self.versions[scope[0]]
+
+
+def key(profile: str, with_examples: bool = False) -> tuple:
+    return profile, "apegpt", "prod", with_examples
+
+
+@pytest.fixture
+def warehouse():
+    return Warehouse()
+
+
+@pytest.fixture
+def schema_cache(warehouse):
+    cache = SchemaPromptCache(
+        build=warehouse.build,
+        fingerprint=warehouse.fingerprint,
+        ttl=600,
+        check_interval=3600,
+        fingerprint_key=lambda key: key[:3],
+    )
+    yield cache
+    cache.stop()
+
+
+def test_hits_and_misses_per_profile(schema_cache, warehouse):
+    assert schema_cache.get(key("wh_v2")) == "wh_v2 schema v1"
+    assert schema_cache.get(key("wh_v2")) == "wh_v2 schema v1"
+    assert schema_cache.get(key("wh")) == "wh schema v1"
+    stats = schema_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+    assert warehouse.builds == [key("wh_v2"), key("wh")]
+
+
+def test_refresh_rebuilds_only_the_changed_profile(schema_cache, warehouse):
+    schema_cache.get(key("wh"))
+    schema_cache.get(key("wh_v2"))
+    schema_cache.get(key("wh_v2", with_examples=True))
+    warehouse.fingerprints.clear()
+    warehouse.versions["wh_v2"] = 2
+
+    schema_cache.refresh_due()
+
+    # one fingerprint per profile, however many keys it has
+    assert sorted(warehouse.fingerprints) == [key("wh")[:3], key("wh_v2")[:3]]
+    assert schema_cache.get(key("wh")) == "wh schema v1"
+    assert schema_cache.get(key("wh_v2")) == "wh_v2 schema v2"
+    assert schema_cache.stats()["refreshes"] == 2
+
+
+def test_failed_refresh_keeps_the_last_good_text(schema_cache, warehouse):
+    schema_cache.get(key("wh_v2"))
+    warehouse.versions["wh_v2"] = 2
+    schema_cache._build = lambda key: 1 / 0  # the warehouse went away
+    schema_cache.refresh_due()
+
+    assert schema_cache.get(key("wh_v2")) == "wh_v2 schema v1"
+    assert schema_cache.stats()["refresh_errors"] == 1
+
+
+def test_idle_entries_are_evicted(schema_cache):
+    schema_cache.get(key("wh_v2"))
+    schema_cache.ttl = 0
+    schema_cache.refresh_due()
+    assert schema_cache.stats()["entries"] == 0
+    assert schema_cache.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cold_build_does_not_block_the_event_loop(schema_cache, warehouse):
+    release = threading.Event()
+
+    def slow_build(key):
+        release.wait(5)
+        return warehouse.build(key)
+
+    schema_cache._build = slow_build
+    pending = asyncio.create_task(schema_cache.aget(key("wh_v2")))
+    # the loop keeps running while the schema is built in a worker thread
+    await asyncio.sleep(0.05)
+    assert not pending.done()
+    release.set()
+    assert await pending == "wh_v2 schema v1"
+    assert await schema_cache.aget(key("wh_v2")) == "wh_v2 schema v1"
+    assert schema_cache.stats()["hits"] == 1
@@ -0,0 +1,118 @@
+import hashlib
+import pathlib
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import openai
+
+from dbmeta_app.cache import TTLCache
+from dbmeta_app.config import get_settings
+
+settings = get_settings()
+
+# embeddings are deterministic per (model, text), so the in-memory tier never
+# expires; it is only bounded by size
+embedding_cache = TTLCache(maxsize=settings.embedding_cache_size, ttl=float("inf"))
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+def _cache_key(text: str, model: str) -> tuple[str, str]:
+    return model, hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _disk_path(key: tuple[str, str]) -> pathlib.Path | None:
+    if not settings.embedding_cache_dir:
+        return None
+    model, digest = key
+    safe_model = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+    return pathlib.Path(settings.embedding_cache_dir) / safe_model / f"{digest}.npy"
+
+
+def _load_from_disk(key: tuple[str, str]) -> list[float] | None:
+    path = _disk_path(key)
+    if path is None or not path.exists():
+        return None
+    try:
+        return np.load(path).tolist()
+    except Exception:
+        return None  # corrupt/partial file: re-embed and overwrite
+
+
+def _save_to_disk(key: tuple[str, str], embedding: list[float]):
+    path = _disk_path(key)
+    if path is None:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp.npy")
+    np.save(tmp, np.asarray(embedding, dtype=np.float32))
+    tmp.replace(path)
+
+
+def get_embeddings(
+    texts: list[str], model: str = settings.vector_db_embeddings
+) -> list[list[float]]:
+    """
+    Embeddings for `texts`, in order. Served from the LRU, then the optional
+    on-disk cache (EMBEDDING_CACHE_DIR); only the rest go to the OpenAI API,
+    in a single request.
+    """
+    keys = [_cache_key(t, model) for t in texts]
+    out: list[list[float] | None] = []
+    for key in keys:
+        emb = embedding_cache.get(key)
+        if emb is None:
+            emb = _load_from_disk(key)
+            if emb is not None:
+                embedding_cache.set(key, emb)
+        out.append(emb)
+
+    missing = [i for i, emb in enumerate(out) if emb is None]
+    if missing:
+        response = openai.embeddings.create(
+            input=[texts[i] for i in missing], model=model
+        )
+        # Order is preserved in OpenAI responses
+        for i, r in zip(missing, response.data):
+            out[i] = r.embedding
+            embedding_cache.set(keys[i], r.embedding)
+            _save_to_disk(keys[i], r.embedding)
+    return out
+
+
+def get_embedding(text: str, model: str = settings.vector_db_embeddings) -> list[float]:
+    return get_embeddings([text], model=model)[0]
+
+
+def get_embeddings_batched(
+    texts: list[str],
+    model: str = settings.vector_db_embeddings,
+    batch_size: int = settings.embedding_batch_size,
+    concurrency: int = settings.embedding_concurrency,
+    retries: int = settings.embedding_retries,
+) -> list[list[float]]:
+    """
+    `get_embeddings` for large inputs: bounded batches, `concurrency` of them
+    in flight, each retried with exponential backoff on API errors
+    (rate limits, timeouts). Results keep input order.
+    """
+
+    def embed_batch(batch: list[str]) -> list[list[float]]:
+        for attempt in range(retries + 1):
+            try:
+                return get_embeddings(batch, model=model)
+            except (openai.APIConnectionError, openai.APIStatusError) as e:
+                if attempt == retries:
+                    raise
+                delay = min(2**attempt, 30)
+                print(f"Embedding batch failed ({e}), retrying in {delay}s")
+                time.sleep(delay)
+
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = pool.map(embed_batch, batches)
+        return [emb for batch in results for emb in batch]
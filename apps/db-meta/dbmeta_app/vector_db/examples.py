@@ -0,0 +1,27 @@
+import pathlib
+
+from dbmeta_app.config import get_settings
+from dbmeta_app.prompt_assembler.prompt_packs import assemble_effective_tree, load_yaml
+
+
+def example_text(request: str, response: str) -> str:
+    """Text that gets embedded for a query example (search and ETL alike)."""
+    return f"User request: {request}, SQL response {response}"
+
+
+def load_examples(profile: str | None = None) -> list[tuple[str, str, str]]:
+    """(request, response, db) rows from the effective query_examples.yaml."""
+    settings = get_settings()
+    repo_root = pathlib.Path(settings.packs_resources_dir).resolve()
+    profile = profile or settings.default_profile
+    tree = assemble_effective_tree(repo_root, profile, settings.client, settings.env)
+
+    file = load_yaml(tree, "resources/query_examples.yaml")
+    data = file["profiles"][profile]["examples"]
+    examples = []
+    for row in data:
+        request = row.get("request", "").strip()
+        response = row.get("response", "").strip()
+        db = row.get("db", "").strip()
+        examples.append((request, response, db))
+    return examples
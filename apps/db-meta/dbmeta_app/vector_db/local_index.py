@@ -0,0 +1,126 @@
+import hashlib
+import json
+import logging
+import pathlib
+import threading
+
+import numpy as np
+
+from dbmeta_app.config import get_settings
+from dbmeta_app.vector_db.embeddings import get_embedding, get_embeddings_batched
+from dbmeta_app.vector_db.examples import example_text, load_examples
+from dbmeta_app.vector_db.model import QueryExample
+
+settings = get_settings()
+
+
+class LocalIndex:
+    """
+    In-process replacement for the Milvus collection: a matrix of normalized
+    example embeddings searched by brute force. For a few hundred examples this
+    is a single small matmul, well under a millisecond.
+    """
+
+    def __init__(self, embeddings: np.ndarray, rows: list[dict[str, str]]):
+        self.embeddings = embeddings
+        self.rows = rows
+        self.dbs = np.array([r["db"] for r in rows])
+
+    def search(self, query_vector: np.ndarray, db: str, top_k: int = 3):
+        mask = self.dbs == db
+        if not mask.any():
+            return []
+        candidates = np.flatnonzero(mask)
+        # squared L2 on unit vectors, same metric Milvus reports for "L2"
+        distances = 2.0 - 2.0 * (self.embeddings[candidates] @ query_vector)
+        k = min(top_k, len(candidates))
+        best = np.argpartition(distances, k - 1)[:k]
+        best = best[np.argsort(distances[best])]
+        return [(self.rows[candidates[i]], float(distances[i])) for i in best]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _manifest_hash(examples: list[tuple[str, str, str]], model: str) -> str:
+    hasher = hashlib.sha256(model.encode("utf-8"))
+    for request, response, db in examples:
+        hasher.update(json.dumps([request, response, db]).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def build_index(index_dir: str | pathlib.Path | None = None) -> LocalIndex:
+    """
+    Load the persisted index if its manifest hash matches the effective pack
+    tree, otherwise embed the examples and persist `embeddings.npy` +
+    `manifest.json`. The matrix is memory-mapped on load.
+    """
+    index_dir = pathlib.Path(index_dir or settings.local_index_dir)
+    model = settings.vector_db_embeddings
+    examples = load_examples()
+    digest = _manifest_hash(examples, model)
+    manifest_path = index_dir / "manifest.json"
+    matrix_path = index_dir / "embeddings.npy"
+
+    if manifest_path.exists() and matrix_path.exists():
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            if manifest.get("hash") == digest:
+                embeddings = np.load(matrix_path, mmap_mode="r")
+                return LocalIndex(embeddings, manifest["rows"])
+        except Exception as e:
+            logging.warning(
+                "Local index unreadable, rebuilding", extra={"error": str(e)}
+            )
+
+    rows = [{"request": r, "response": s, "db": d} for r, s, d in examples]
+    if examples:
+        texts = [example_text(r, s) for r, s, _ in examples]
+        vectors = get_embeddings_batched(texts, model)
+        embeddings = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+    else:
+        embeddings = np.zeros((0, 0), dtype=np.float32)
+
+    index_dir.mkdir(parents=True, exist_ok=True)
+    tmp_matrix = index_dir / "embeddings.tmp.npy"
+    np.save(tmp_matrix, embeddings)
+    tmp_matrix.replace(matrix_path)
+    tmp_manifest = index_dir / "manifest.tmp.json"
+    tmp_manifest.write_text(
+        json.dumps({"hash": digest, "model": model, "rows": rows}), encoding="utf-8"
+    )
+    tmp_manifest.replace(manifest_path)
+    print(f"Built local query example index: {len(rows)} examples")
+    return LocalIndex(np.load(matrix_path, mmap_mode="r"), rows)
+
+
+_index: LocalIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> LocalIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_index()
+    return _index
+
+
+def get_hits(query: str, db: str, top_k=3) -> list[QueryExample]:
+    index = get_index()
+    if len(index.rows) == 0:
+        return []
+    query_vector = np.asarray(get_embedding(query), dtype=np.float32)
+    norm = np.linalg.norm(query_vector)
+    if norm > 0:
+        query_vector = query_vector / norm
+    return [
+        QueryExample(
+            request=row["request"], response=row["response"], score=1 / (1 + dist)
+        )
+        for row, dist in index.search(query_vector, db, top_k)
+    ]
@@ -2,20 +2,13 @@ import json
 import os
 
 import numpy as np
-import openai
 import pymilvus
-from pydantic import BaseModel
 from pymilvus import Collection, connections, utility
 from pymilvus.client.types import LoadState
 
 from dbmeta_app.config import get_settings
-
-
-class QueryExample(BaseModel):
-    request: str
-    response: str
-    score: float
-
+from dbmeta_app.vector_db.embeddings import get_embedding
+from dbmeta_app.vector_db.model import QueryExample
 
 # load_dotenv()
 print(os.getenv("VECTOR_DB_EMBEDDINGS"))
@@ -23,11 +16,6 @@ settings = get_settings()
 print(settings.vector_db_embeddings)
 
 
-def get_embedding(text: str, model: str = settings.vector_db_embeddings) -> list[float]:
-    response = openai.embeddings.create(input=[text], model=model)
-    return response.data[0].embedding
-
-
 # Connect to Milvus
 if settings.vector_db_port is not None and settings.vector_db_host is not None:
     connections.connect(
@@ -48,7 +36,16 @@ else:
 
 collection_name = settings.vector_db_collection_name
 
-if collection_name not in pymilvus.utility.list_collections():
+
+def collection_exists(name: str) -> bool:
+    # the ETL serves a versioned collection through an alias of this name
+    collections = pymilvus.utility.list_collections()
+    return name in collections or any(
+        name in utility.list_aliases(c) for c in collections
+    )
+
+
+if not collection_exists(collection_name):
     print(f"Collection {collection_name} not found.")
     exit(1)
 else:
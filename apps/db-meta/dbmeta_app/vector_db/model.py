@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+
+class QueryExample(BaseModel):
+    request: str
+    response: str
+    score: float
@@ -0,0 +1,33 @@
+from dbmeta_app.cache import TTLCache
+from dbmeta_app.config import get_settings
+from dbmeta_app.vector_db.embeddings import normalize_text
+from dbmeta_app.vector_db.model import QueryExample
+
+settings = get_settings()
+
+# (normalized query, db, top_k) -> hits; short TTL so re-indexed examples show up
+hits_cache = TTLCache(maxsize=settings.hits_cache_size, ttl=settings.hits_cache_ttl)
+
+
+def _backend_get_hits(query: str, db: str, top_k: int) -> list[QueryExample]:
+    # imported lazily: the Milvus module connects (or exits) at import time,
+    # which the local backend must not trigger
+    if settings.vector_db_backend == "local":
+        from dbmeta_app.vector_db import local_index
+
+        return local_index.get_hits(query, db, top_k)
+
+    from dbmeta_app.vector_db import milvus
+
+    return milvus.get_hits(query, db, top_k)
+
+
+def get_hits(query: str, db: str, top_k=3) -> list[QueryExample]:
+    cache_key = (normalize_text(query), db, top_k)
+    cached = hits_cache.get(cache_key)
+    if cached is not None:
+        return list(cached)
+
+    output = _backend_get_hits(query, db, top_k)
+    hits_cache.set(cache_key, tuple(output))
+    return output
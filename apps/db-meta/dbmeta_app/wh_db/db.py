@@ -1,11 +1,123 @@
-from sqlalchemy import create_engine, Engine
+import atexit
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.pool import QueuePool
 
 from dbmeta_app.config import get_settings
+from dbmeta_app.metrics import WH_POOL_WAIT, instrument_engine
+
+# warehouse profile -> settings suffix; "new_wh" is the name fm-app sends
+_PROFILE_SUFFIX = {
+    "wh": "",
+    "wh_new": "_new",
+    "new_wh": "_new",
+    "wh_v2": "_v2",
+}
+
+
+class _TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers waited to get a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            self.wait_count += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            WH_POOL_WAIT.observe(waited)
+
+    def recreate(self):
+        # keep counters across pool_pre_ping/invalidation recreation
+        pool = super().recreate()
+        pool.wait_count = self.wait_count
+        pool.wait_total = self.wait_total
+        pool.wait_max = self.wait_max
+        return pool
+
+
+_ENGINES: dict[str, Engine] = {}
+_ENGINES_LOCK = threading.Lock()
 
 
-def get_db() -> Engine:
+def _profile_url(settings, profile: str) -> str:
+    if profile not in _PROFILE_SUFFIX:
+        raise ValueError(f"Unknown warehouse profile: {profile}")
+    sfx = _PROFILE_SUFFIX[profile]
+    server = getattr(settings, f"database_wh_server{sfx}")
+    port = getattr(settings, f"database_wh_port{sfx}")
+    db = getattr(settings, f"database_wh_db{sfx}")
+    params = getattr(settings, f"database_wh_params{sfx}") or ""
+    return f"clickhouse+native://{settings.database_wh_user}:{settings.database_wh_pass}@{server}:{port}/{db}{params}"  # noqa: E501
+
+
+def get_db(profile: str | None = None) -> Engine:
+    """
+    Process-wide engine for a warehouse profile (wh, wh_new, wh_v2).
+    Created on first use and reused afterwards, so callers share one pool.
+    """
     settings = get_settings()
-    url = f"clickhouse+native://{settings.database_wh_user}:{settings.database_wh_pass}@{settings.database_wh_server_v2}:{settings.database_wh_port_v2}/{settings.database_wh_db_v2}{settings.database_wh_params_v2}"  # noqa: E501
-    return create_engine(
-        url, pool_size=20, max_overflow=30, pool_pre_ping=True, pool_recycle=360
-    )
+    profile = profile or settings.default_profile
+    if profile == "new_wh":
+        profile = "wh_new"
+    engine = _ENGINES.get(profile)
+    if engine is not None:
+        return engine
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(profile)
+        if engine is None:
+            engine = create_engine(
+                _profile_url(settings, profile),
+                poolclass=_TimedQueuePool,
+                pool_size=settings.wh_pool_size,
+                max_overflow=settings.wh_max_overflow,
+                pool_timeout=settings.wh_pool_timeout,
+                pool_pre_ping=True,
+                pool_recycle=360,
+            )
+            instrument_engine(engine, profile)
+            _ENGINES[profile] = engine
+    return engine
+
+
+def pool_stats() -> dict[str, dict[str, Any]]:
+    """Per-profile pool utilization: checked out, overflow and checkout wait."""
+    out = {}
+    for profile, engine in list(_ENGINES.items()):
+        pool = engine.pool
+        wait_count = getattr(pool, "wait_count", 0)
+        out[profile] = {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "wait_count": wait_count,
+            "wait_avg_ms": (
+                getattr(pool, "wait_total", 0.0) * 1000.0 / wait_count
+                if wait_count
+                else 0.0
+            ),
+            "wait_max_ms": getattr(pool, "wait_max", 0.0) * 1000.0,
+        }
+    return out
+
+
+def dispose_engines():
+    with _ENGINES_LOCK:
+        for engine in _ENGINES.values():
+            engine.dispose()
+        _ENGINES.clear()
+
+
+atexit.register(dispose_engines)
@@ -0,0 +1,28 @@
+"""Add timings column to request table
+
+Revision ID: 3c9e1f7a2b54
+Revises: a0686b6349c6
+Create Date: 2026-10-18 10:12:41.503117
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3c9e1f7a2b54"
+down_revision: Union[str, None] = "a0686b6349c6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "request", sa.Column("timings", sa.dialects.postgresql.JSONB, nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("request", "timings")
@@ -0,0 +1,369 @@
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import random
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import httpx
+import structlog
+from dotenv import load_dotenv
+
+logger = structlog.get_logger()
+load_dotenv()
+
+APP_URL = os.getenv("APP_URL")
+
+
+@dataclass
+class Case:
+    line: int
+    flow: str
+    query: str
+    expected: list[str]
+
+
+@dataclass
+class Result:
+    line: int
+    flow: str
+    model: str
+    db: str
+    status: str  # Done / Error / Timeout / SubmitError
+    submit_ms: Optional[float] = None  # POST /request round trip
+    latency_ms: Optional[float] = None  # submit to Done/Error, as seen by polling
+    server_ms: Optional[float] = None  # worker trace total, when reported
+    stages: dict[str, float] = field(default_factory=dict)
+    matched: Optional[bool] = None  # expected value found in the result
+    err: Optional[str] = None
+
+
+def get_auth_header():
+    auth_url = os.getenv("AUTH_URL")
+    body = {
+        "client_id": os.getenv("CLIENT_ID"),
+        "client_secret": os.getenv("CLIENT_SECRET"),
+        "audience": os.getenv("AUDIENCE"),
+        "grant_type": os.getenv("GRANT_TYPE"),
+    }
+    resp = httpx.post(url=auth_url, json=body)
+    return {"authorization": f"Bearer {resp.json().get('access_token')}"}
+
+
+def split_flow(flow: str) -> tuple[str, str, str]:
+    """'OpenAIDataOnlyV2' -> ('DataOnly', 'OpenAI', 'V2'), as run_list.py does."""
+    if "NWH" in flow:
+        db = "NWH"
+    elif "V2" in flow:
+        db = "V2"
+    else:
+        db = ""
+    for model in ("OpenAI", "Gemini", "Deepseek", "Anthropic"):
+        if model in flow:
+            break
+    else:
+        raise ValueError(f"Unknown model in flow {flow}")
+    return flow.replace(model, "").replace(db, ""), model, db
+
+
+def read_cases(file_name: str, default_flow: str) -> list[Case]:
+    """Question lists in the run_list.py format: flow|question|expected,..."""
+    cases = []
+    with open(file_name, mode="r", encoding="utf-8") as f:
+        for i, line in enumerate(f, start=1):
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            parts = line.split("|")
+            if len(parts) == 1:
+                flow, query, expected = default_flow, parts[0].strip(), [""]
+            else:
+                flow = parts[0].strip()
+                query = parts[1].strip()
+                expected = parts[2].strip().split(",") if len(parts) > 2 else [""]
+            if flow == "Skip":
+                continue
+            cases.append(Case(line=i, flow=flow, query=query, expected=expected))
+    return cases
+
+
+def values_match(expected_val, actual_val):
+    try:
+        # Try numeric comparison on whole parts
+        return int(float(expected_val)) == int(float(actual_val))
+    except (ValueError, TypeError):
+        # Fallback to exact match if not both are numeric
+        return expected_val == actual_val
+
+
+def check_expected(case: Case, response: dict[str, Any]) -> Optional[bool]:
+    if case.expected[0] == "":
+        return None
+    rows = list(csv.DictReader(io.StringIO(response.get("csv") or "")))
+    return any(
+        any(values_match(e, v) for v in row.values())
+        for e in case.expected
+        for row in rows
+    )
+
+
+class Bench:
+    def __init__(self, client: httpx.AsyncClient, poll_interval: float, timeout: float):
+        self.client = client
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    async def create_session(self) -> str:
+        datetime_now = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+        resp = await self.client.post(
+            "session", json={"name": f"{datetime_now}-bench", "tags": "benchmark"}
+        )
+        resp.raise_for_status()
+        return resp.json().get("session_id")
+
+    async def run_case(self, case: Case) -> Result:
+        # the raw flow until it parses, so a malformed line is still reported
+        result = Result(
+            line=case.line, flow=case.flow, model="", db="", status="SubmitError"
+        )
+        try:
+            flow, model, db = split_flow(case.flow)
+            result.flow, result.model, result.db = flow, model, db
+            # a session per request keeps histories apart under concurrency
+            session_id = await self.create_session()
+            req = {"request": case.query, "flow": flow, "model": model, "db": db}
+            start = time.perf_counter()
+            resp = await self.client.post(f"request/{session_id}", json=req)
+            result.submit_ms = (time.perf_counter() - start) * 1000.0
+            resp.raise_for_status()
+            seq_number = resp.json().get("sequence_number")
+
+            result.status = "Timeout"
+            while time.perf_counter() - start < self.timeout:
+                await asyncio.sleep(self.poll_interval)
+                resp = await self.client.get(f"request/{session_id}/{seq_number}")
+                response = resp.json()
+                if response.get("status") in ("Done", "Error"):
+                    result.latency_ms = (time.perf_counter() - start) * 1000.0
+                    result.status = response["status"]
+                    result.err = response.get("err")
+                    timings = response.get("timings") or {}
+                    result.server_ms = timings.get("total_ms")
+                    result.stages = {
+                        name: stage["ms"]
+                        for name, stage in (timings.get("stages") or {}).items()
+                    }
+                    if result.status == "Done":
+                        result.matched = check_expected(case, response)
+                    break
+        except (httpx.HTTPError, ValueError) as e:
+            result.err = str(e)
+        logger.info(
+            f"Finished line {case.line} with {case.flow} in "
+            f"{(result.latency_ms or 0) / 1000.0:.2f}s ({result.status})"
+        )
+        return result
+
+
+async def run_closed(bench: Bench, cases: list[Case], concurrency: int) -> list[Result]:
+    """`concurrency` virtual users, each sending its next question when done."""
+    queue: asyncio.Queue[Case] = asyncio.Queue()
+    for case in cases:
+        queue.put_nowait(case)
+    results = []
+
+    async def user():
+        while not queue.empty():
+            results.append(await bench.run_case(queue.get_nowait()))
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return results
+
+
+async def run_open(
+    bench: Bench, cases: list[Case], rate: float, max_in_flight: int
+) -> list[Result]:
+    """Poisson arrivals at `rate` questions/s, whatever the service latency."""
+    in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def limited(case: Case) -> Result:
+        async with in_flight:
+            return await bench.run_case(case)
+
+    tasks = []
+    for case in cases:
+        tasks.append(asyncio.create_task(limited(case)))
+        await asyncio.sleep(random.expovariate(rate))
+    return list(await asyncio.gather(*tasks))
+
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    """Linear interpolation between closest ranks, q in [0, 100]."""
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * q / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return round(values[lo] + (values[hi] - values[lo]) * (k - lo), 1)
+
+
+def distribution(values: list[float]) -> dict[str, Optional[float]]:
+    return {
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": round(max(values), 1) if values else None,
+        "mean": round(sum(values) / len(values), 1) if values else None,
+    }
+
+
+def summarize(results: list[Result], duration_s: float) -> dict[str, Any]:
+    groups: dict[str, list[Result]] = {}
+    for r in results:
+        groups.setdefault(f"{r.flow}/{r.model}/{r.db or 'legacy'}", []).append(r)
+
+    def group_summary(items: list[Result]) -> dict[str, Any]:
+        done = [r for r in items if r.status == "Done"]
+        stage_names = sorted({name for r in done for name in r.stages})
+        return {
+            "count": len(items),
+            "done": len(done),
+            "errors": sum(r.status == "Error" for r in items),
+            "timeouts": sum(r.status == "Timeout" for r in items),
+            "submit_errors": sum(r.status == "SubmitError" for r in items),
+            "mismatches": sum(r.matched is False for r in items),
+            "error_rate": round(1 - len(done) / len(items), 4),
+            "latency_ms": distribution([r.latency_ms for r in done]),
+            "server_ms": distribution([r.server_ms for r in done if r.server_ms]),
+            "submit_ms": distribution([r.submit_ms for r in items if r.submit_ms]),
+            "stages_ms": {
+                name: distribution([r.stages[name] for r in done if name in r.stages])
+                for name in stage_names
+            },
+        }
+
+    return {
+        "duration_s": round(duration_s, 2),
+        "throughput_rps": round(len(results) / duration_s, 4) if duration_s else None,
+        "total": group_summary(results) if results else {},
+        "groups": {
+            name: group_summary(items) for name, items in sorted(groups.items())
+        },
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any]):
+    """Log p50/p95 latency and error-rate deltas against an earlier report."""
+    for name, group in report["groups"].items():
+        base = baseline.get("groups", {}).get(name)
+        if not base:
+            continue
+        for key in ("p50", "p95"):
+            now, before = group["latency_ms"][key], base["latency_ms"][key]
+            if now is not None and before:
+                logger.info(
+                    f"{name} {key}: {before:.0f} -> {now:.0f} ms "
+                    f"({(now - before) * 100.0 / before:+.1f}%)"
+                )
+        logger.info(
+            f"{name} error rate: {base['error_rate']:.2%} -> {group['error_rate']:.2%}"
+        )
+
+
+async def bench_main(args) -> dict[str, Any]:
+    cases = read_cases(args.src, args.flow) * args.repeat
+    if args.limit:
+        cases = cases[: args.limit]
+    mode = f"rate {args.rate}/s" if args.rate else f"concurrency {args.concurrency}"
+    logger.info(f"Replaying {len(cases)} questions from {args.src} at {mode}")
+
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_in_flight))
+    async with httpx.AsyncClient(
+        base_url=APP_URL, headers=get_auth_header(), limits=limits, timeout=60.0
+    ) as client:
+        bench = Bench(client, args.poll_interval, args.timeout)
+        started_at = datetime.now(timezone.utc).isoformat()
+        start = time.perf_counter()
+        if args.rate:
+            results = await run_open(bench, cases, args.rate, args.max_in_flight)
+        else:
+            results = await run_closed(bench, cases, args.concurrency)
+        duration_s = time.perf_counter() - start
+
+    report = {
+        "meta": {
+            "src": args.src,
+            "commit": args.commit or git_commit(),
+            "started_at": started_at,
+            "app_url": APP_URL,
+            "concurrency": None if args.rate else args.concurrency,
+            "rate": args.rate,
+            "max_in_flight": args.max_in_flight if args.rate else None,
+            "poll_interval_s": args.poll_interval,
+            "timeout_s": args.timeout,
+            "cases": len(cases),
+        },
+        **summarize(results, duration_s),
+    }
+    if args.include_requests:
+        report["requests"] = [asdict(r) for r in sorted(results, key=lambda r: r.line)]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser("python run_bench.py")
+    parser.add_argument("--src", type=str, default="master_list_v2.csv")
+    parser.add_argument("--out", type=str, default="bench_report.json")
+    parser.add_argument("--flow", type=str, default="OpenAISimple")
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="closed loop: parallel users"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=None, help="open loop: arrivals per second"
+    )
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--timeout", type=float, default=500.0)
+    parser.add_argument("--commit", type=str, default=None)
+    parser.add_argument("--include-requests", action="store_true")
+    parser.add_argument("--baseline", type=str, default=None, help="report to diff")
+    args = parser.parse_args()
+
+    report = asyncio.run(bench_main(args))
+    with open(args.out, mode="w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    total = report["total"]
+    logger.info(
+        f"Finished {total.get('count', 0)} in {report['duration_s']:.2f}s, "
+        f"p50 {total.get('latency_ms', {}).get('p50')} ms, "
+        f"p95 {total.get('latency_ms', {}).get('p95')} ms, "
+        f"error rate {total.get('error_rate')}; report in {args.out}"
+    )
+    if args.baseline:
+        with open(args.baseline, mode="r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
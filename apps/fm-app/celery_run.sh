@@ -1,2 +1,11 @@
 #!/usr/bin/env sh
+# pool children share their Prometheus samples through this directory;
+# the main worker process serves them on $WRK_METRICS_PORT
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/fm_worker_metrics}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+if [ "${WRK_FLOW_CONCURRENCY:-1}" -gt 1 ]; then
+  # flows share one event loop per process; threads only hand tasks to it
+  exec celery -A fm_app.workers.worker worker --loglevel=INFO \
+    --pool threads --concurrency "$WRK_FLOW_CONCURRENCY"
+fi
 celery -A fm_app.workers.worker worker --loglevel=INFO
@@ -1,11 +1,14 @@
 import logging.config
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from fm_app.api.db_session import engine
 from fm_app.api.routes import api_router
+from fm_app.config import get_settings
 from fm_app.logs import LOGGING_CONFIG
+from fm_app.metrics import HTTP_REQUEST_DURATION, start_exporter
+from fm_app.tracing import TRACEPARENT_HEADER, start_trace
 
 logging.config.dictConfig(LOGGING_CONFIG)
 LOGGER = logging.getLogger("fm_app")
@@ -28,6 +31,36 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    # one trace per API call; routes that enqueue work pass it on to the worker
+    with start_trace(
+        f"{request.method} {request.url.path}",
+        traceparent=request.headers.get(TRACEPARENT_HEADER),
+        http_method=request.method,
+    ) as trace:
+        response = await call_next(request)
+        # the route template, not the path, keeps label cardinality bounded
+        route = getattr(request.scope.get("route"), "path", None)
+        trace.root.set(http_route=route, http_status_code=response.status_code)
+    HTTP_REQUEST_DURATION.labels(
+        request.method, route or "unmatched", response.status_code
+    ).observe(trace.root.duration_ms / 1000.0)
+    return response
+
+
+@app.on_event("startup")
+async def start_metrics_exporter():
+    # served on its own port, never next to the public routes; the first
+    # uvicorn worker to bind it aggregates all of them (PROMETHEUS_MULTIPROC_DIR)
+    port = get_settings().api_metrics_port
+    if port:
+        try:
+            start_exporter(port)
+        except OSError:
+            pass  # another worker of this server already serves it
+
+
 @app.on_event("shutdown")
 async def on_shutdown():
     print("shutting down fm_app")
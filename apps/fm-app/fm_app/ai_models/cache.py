@@ -0,0 +1,502 @@
+"""
+Response cache for the LLM calls of opted-in prompt slots.
+
+A flow opens `cache_slot(slot, ...)` around a call; when the slot is listed
+in `llm_cache_slots` ("planner,linked_query:600", TTL in seconds after the
+colon), the model built by `cached_model` answers from the cache:
+
+- exact tier: keyed by a hash of the model, the full messages and the
+  response schema, so only an identical prompt is served. Values the flow
+  marks as volatile (the current time, a freshly drawn id) are replaced by
+  stand-ins first, so they don't make every prompt unique;
+- semantic tier, for slots in `llm_cache_semantic_slots`: the embedding of
+  the user request is compared with earlier ones by cosine similarity, and
+  the nearest at or above `llm_cache_semantic_threshold` is served. It is
+  scoped to the slot, the prompt pack (version and content hashes), the
+  response schema, what the flow adds (e.g. the warehouse profile) and the
+  db-meta schema fingerprint, so a schema change starts a new index. Flows
+  only pass a request for it when the prompt carries no other context
+  (history, selected rows, current query).
+
+Entries live in `llm_cache_store`: "memory" (LRU per process), "disk" (files
+under `llm_cache_dir`, shared by the processes of a host) or "redis" (any
+Redis-protocol server at `llm_cache_redis_url`, shared by every worker).
+"""
+
+import asyncio
+import base64
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, ClassVar, Iterator, Mapping, Optional
+
+import numpy as np
+import redis
+from cachetools import LRUCache
+from pydantic import BaseModel
+
+from fm_app.ai_models.llm import OpenAIModel
+from fm_app.ai_models.model import AIModel, ChatMessage, InvestigationStep
+from fm_app.api.model import IntentAnalysis, QueryMetadata
+from fm_app.config import Settings, get_settings
+from fm_app.metrics import LLM_CACHE_LOOKUPS
+from fm_app.prompt_assembler.prompt_packs import SlotMaterial
+from fm_app.tracing import span
+
+_KEY_PREFIX = "fm:llm:"
+
+
+# ---------- storage
+
+
+class CacheStore(ABC):
+    """String values with a TTL; implementations must be thread-safe."""
+
+    blocking: ClassVar[bool] = True  # calls do I/O and leave the event loop
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """The value of `key`, None if it is missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: int):
+        """Store `value` under `key` for `ttl` seconds."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Drop `key`; a missing key is not an error."""
+
+
+class MemoryStore(CacheStore):
+    blocking = False
+
+    def __init__(self, max_entries: int):
+        self._entries: LRUCache = LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key: str, value: str, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class DiskStore(CacheStore):
+    """One JSON file per key; expired files are removed when read."""
+
+    def __init__(self, path: str):
+        self.path = pathlib.Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _file(self, key: str) -> pathlib.Path:
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.path / name[:2] / name
+
+    def get(self, key: str) -> Optional[str]:
+        file = self._file(key)
+        try:
+            entry = json.loads(file.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry["expires"] < time.time():
+            file.unlink(missing_ok=True)
+            return None
+        return entry["value"]
+
+    def set(self, key: str, value: str, ttl: int):
+        file = self._file(key)
+        file.parent.mkdir(exist_ok=True)
+        # write then rename, so readers in other processes never see half a file
+        fd, tmp = tempfile.mkstemp(dir=file.parent)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"expires": time.time() + ttl, "value": value}, f)
+        os.replace(tmp, file)
+
+    def delete(self, key: str):
+        self._file(key).unlink(missing_ok=True)
+
+
+class RedisStore(CacheStore):
+    def __init__(self, url: str):
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: str, ttl: int):
+        self._client.set(key, value, ex=ttl)
+
+    def delete(self, key: str):
+        self._client.delete(key)
+
+
+def create_store(settings: Settings) -> CacheStore:
+    if settings.llm_cache_store == "memory":
+        return MemoryStore(settings.llm_cache_max_entries)
+    if settings.llm_cache_store == "disk":
+        return DiskStore(settings.llm_cache_dir)
+    if settings.llm_cache_store == "redis":
+        return RedisStore(settings.llm_cache_redis_url)
+    raise ValueError(f"Invalid llm_cache_store: {settings.llm_cache_store!r}")
+
+
+# ---------- slots
+
+
+@dataclass
+class CacheSlot:
+    name: str
+    ttl: int
+    scope: str  # hash the semantic tier is partitioned by
+    semantic_text: Optional[str] = None
+    volatile: Mapping[str, str] = field(default_factory=dict)  # text -> stand-in
+    schema: Optional[Callable[[], Awaitable[str]]] = None  # schema fingerprint
+    key: Optional[str] = None  # exact key of the last call in the slot
+    result: Optional[str] = None  # "exact", "semantic" or "miss"
+
+
+_slot: ContextVar[Optional[CacheSlot]] = ContextVar("fm_llm_cache_slot", default=None)
+
+
+def parse_slots(value: str, default_ttl: int) -> dict[str, int]:
+    """'planner,linked_query:600' -> {'planner': default_ttl, 'linked_query': 600}"""
+    slots = {}
+    for item in value.split(","):
+        name, _, ttl = item.strip().partition(":")
+        if name:
+            slots[name] = int(ttl) if ttl else default_ttl
+    return slots
+
+
+def _hash(value: Any, volatile: Optional[Mapping[str, str]] = None) -> str:
+    payload = json.dumps(value, sort_keys=True, default=_jsonable)
+    for text, stand_in in (volatile or {}).items():
+        # as the text appears inside the JSON strings of the payload
+        payload = payload.replace(json.dumps(text)[1:-1], stand_in)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _jsonable(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+@contextlib.contextmanager
+def cache_slot(
+    slot: SlotMaterial,
+    semantic_text: Optional[str] = None,
+    volatile: Optional[Mapping[str, str]] = None,
+    schema: Optional[Callable[[], Awaitable[str]]] = None,
+    **scope,
+) -> Iterator[Optional[CacheSlot]]:
+    """
+    Let the LLM calls in the block be served from the cache if `slot` opted
+    in; yields None otherwise. `semantic_text` (the user request) enables the
+    semantic tier for slots listed in llm_cache_semantic_slots; `schema`
+    fetches the fingerprint that tier is scoped by, only when it is used.
+    Each `volatile` text rendered into the prompt is keyed as its stand-in.
+    """
+    settings = get_settings()
+    ttls = parse_slots(settings.llm_cache_slots, settings.llm_cache_ttl)
+    if slot.slot not in ttls:
+        yield None
+        return
+    semantic = slot.slot in parse_slots(settings.llm_cache_semantic_slots, 0)
+    lineage = slot.lineage
+    cached = CacheSlot(
+        name=slot.slot,
+        ttl=ttls[slot.slot],
+        scope=_hash(
+            [
+                slot.slot,
+                lineage.get("system_pack"),
+                lineage.get("overlays"),
+                lineage.get("extras_sha256"),
+                scope,
+            ]
+        ),
+        semantic_text=semantic_text if semantic else None,
+        volatile=volatile or {},
+        schema=schema,
+    )
+    token = _slot.set(cached)
+    try:
+        yield cached
+    finally:
+        _slot.reset(token)
+
+
+# ---------- cache
+
+
+def _pack(vector: np.ndarray) -> str:
+    return base64.b64encode(vector.astype(np.float32).tobytes()).decode("ascii")
+
+
+def _unpack(value: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value), dtype=np.float32)
+
+
+class ResponseCache:
+    def __init__(self, settings: Settings, store: CacheStore):
+        self.settings = settings
+        self.store = store
+        self._index_lock = threading.Lock()
+
+    async def _call(self, fn, *args):
+        if self.store.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._call(self.store.get, _KEY_PREFIX + key)
+
+    async def set(self, key: str, value: str, ttl: int):
+        await self._call(self.store.set, _KEY_PREFIX + key, value, ttl)
+
+    async def delete(self, key: str):
+        await self._call(self.store.delete, _KEY_PREFIX + key)
+
+    async def embed(self, text: str) -> np.ndarray:
+        OpenAIModel.init(self.settings)
+        vector = np.asarray(
+            await OpenAIModel.aget_embedding(
+                text,
+                self.settings.llm_cache_embedding_model,
+                self.settings.llm_cache_embedding_dimensions,
+            ),
+            dtype=np.float32,
+        )
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _read_index(self, scope: str) -> list[dict[str, Any]]:
+        raw = self.store.get(f"{_KEY_PREFIX}semantic:{scope}")
+        now = time.time()
+        return [e for e in json.loads(raw or "[]") if e["expires"] >= now]
+
+    def _nearest(self, scope: str, vector: np.ndarray) -> Optional[str]:
+        entries = self._read_index(scope)
+        if not entries:
+            return None
+        matrix = np.stack([_unpack(e["vector"]) for e in entries])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.settings.llm_cache_semantic_threshold:
+            return None
+        return entries[best]["key"]
+
+    def _add_to_index(self, scope: str, vector: np.ndarray, key: str, ttl: int):
+        # read-modify-write: concurrent writers on other hosts may drop an
+        # entry, which only costs a future miss
+        with self._index_lock:
+            entries = [e for e in self._read_index(scope) if e["key"] != key]
+            entries.append(
+                {"key": key, "vector": _pack(vector), "expires": time.time() + ttl}
+            )
+            entries = entries[-self.settings.llm_cache_semantic_max_entries :]
+            self.store.set(
+                f"{_KEY_PREFIX}semantic:{scope}",
+                json.dumps(entries),
+                max(int(e["expires"] - time.time()) for e in entries) + 1,
+            )
+
+    async def nearest(self, scope: str, vector: np.ndarray) -> Optional[str]:
+        return await self._call(self._nearest, scope, vector)
+
+    async def add_to_index(self, scope: str, vector: np.ndarray, key: str, ttl: int):
+        await self._call(self._add_to_index, scope, vector, key, ttl)
+
+
+# ---------- model
+
+
+class CachedModel(AIModel):
+    """
+    Base of the per-provider caching models built by `cached_model`. Calls
+    outside of an opted-in `cache_slot` go straight to the wrapped model.
+    """
+
+    target: ClassVar[type[AIModel]] = AIModel
+    cache: ClassVar[Optional[ResponseCache]] = None
+
+    @classmethod
+    def get_name(cls) -> str:
+        return cls.target.get_name()
+
+    @classmethod
+    def get_specific_instructions(cls) -> str:
+        return cls.target.get_specific_instructions()
+
+    @classmethod
+    def get_response(cls, messages) -> str:
+        return cls.target.get_response(messages)
+
+    @classmethod
+    def get_structured(
+        cls,
+        messages: list[ChatMessage],
+        step: type[InvestigationStep | QueryMetadata | IntentAnalysis],
+        model_override: Optional[str] = None,
+    ) -> InvestigationStep | QueryMetadata | IntentAnalysis:
+        return cls.target.get_structured(messages, step, model_override)
+
+    @classmethod
+    def _key(
+        cls,
+        slot: CacheSlot,
+        messages,
+        step: Optional[type],
+        model_override: Optional[str],
+    ):
+        model = model_override or getattr(cls.target, "llm_name", "")
+        schema = step.model_json_schema() if step else None
+        return _hash([cls.get_name(), model, messages, schema], slot.volatile)
+
+    @classmethod
+    async def _semantic_index(cls, slot: CacheSlot, index: str) -> Optional[str]:
+        """`index` narrowed to the current schema; None skips the semantic tier."""
+        if not slot.semantic_text:
+            return None
+        if slot.schema is None:
+            return index
+        try:
+            return _hash([index, await slot.schema()])
+        except Exception as e:
+            # without it a near match could predate a schema change
+            logging.warning(
+                "LLM cache schema fingerprint failed", extra={"error": str(e)}
+            )
+            return None
+
+    @classmethod
+    async def _lookup(
+        cls, slot: CacheSlot, index: Optional[str]
+    ) -> tuple[Optional[str], Any]:
+        """Cached value for `slot.key`, else for the nearest request in `index`."""
+        value = await cls.cache.get(slot.key)
+        if value is not None:
+            slot.result = "exact"
+            return value, None
+        vector = None
+        if index is not None:
+            vector = await cls.cache.embed(slot.semantic_text)
+            near = await cls.cache.nearest(index, vector)
+            if near is not None:
+                value = await cls.cache.get(near)
+                if value is not None:
+                    slot.key = near
+                    slot.result = "semantic"
+                    return value, vector
+        slot.result = "miss"
+        return None, vector
+
+    @classmethod
+    async def _store(cls, slot: CacheSlot, index: Optional[str], value: str, vector):
+        await cls.cache.set(slot.key, value, slot.ttl)
+        if vector is not None:
+            await cls.cache.add_to_index(index, vector, slot.key, slot.ttl)
+
+    @classmethod
+    async def _cached(cls, slot: CacheSlot, key: str, index: str):
+        slot.key = key
+        with span("cache.llm", slot=slot.name) as s:
+            index = await cls._semantic_index(slot, index)
+            try:
+                value, vector = await cls._lookup(slot, index)
+            except Exception as e:
+                # a cache outage costs a provider call, not the flow
+                logging.warning("LLM cache lookup failed", extra={"error": str(e)})
+                value, vector, slot.result = None, None, "error"
+            if s is not None:
+                s.set(result=slot.result)
+        LLM_CACHE_LOOKUPS.labels(slot.name, slot.result).inc()
+        return value, vector, index
+
+    @classmethod
+    async def _save(cls, slot: CacheSlot, index: Optional[str], value: str, vector):
+        try:
+            await cls._store(slot, index, value, vector)
+        except Exception as e:
+            logging.warning("LLM cache store failed", extra={"error": str(e)})
+
+    @classmethod
+    async def aget_response(cls, messages) -> str:
+        slot = _slot.get()
+        if slot is None:
+            return await cls.target.aget_response(messages)
+        key = cls._key(slot, messages, None, None)
+        value, vector, index = await cls._cached(slot, key, _hash([slot.scope, None]))
+        if value is not None:
+            return value
+        output = await cls.target.aget_response(messages)
+        if output:
+            await cls._save(slot, index, output, vector)
+        return output
+
+    @classmethod
+    async def aget_structured(
+        cls,
+        messages: list[ChatMessage],
+        step: type[InvestigationStep | QueryMetadata | IntentAnalysis],
+        model_override: Optional[str] = None,
+    ) -> InvestigationStep | QueryMetadata | IntentAnalysis:
+        slot = _slot.get()
+        if slot is None:
+            return await cls.target.aget_structured(messages, step, model_override)
+        key = cls._key(slot, messages, step, model_override)
+        # one semantic index per response type within the slot's scope
+        index = _hash([slot.scope, step.__name__])
+        value, vector, index = await cls._cached(slot, key, index)
+        if value is not None:
+            return step.model_validate_json(value)
+        output = await cls.target.aget_structured(messages, step, model_override)
+        # providers that answer with another type than asked aren't cached
+        if isinstance(output, step):
+            await cls._save(slot, index, output.model_dump_json(), vector)
+        return output
+
+
+_cached_models: dict[type[AIModel], type[CachedModel]] = {}
+_lock = threading.Lock()
+
+
+def cached_model(settings: Settings, target: type[AIModel]) -> type[AIModel]:
+    """
+    `target` itself when no slot opted in (llm_cache_slots is empty),
+    otherwise its caching wrapper. Built once per provider and process.
+    """
+    if not settings.llm_cache_slots.strip():
+        return target
+    with _lock:
+        if CachedModel.cache is None:
+            CachedModel.cache = ResponseCache(settings, create_store(settings))
+        if target not in _cached_models:
+            _cached_models[target] = type(
+                f"Cached{target.__name__}",
+                (CachedModel,),
+                {"__module__": __name__, "target": target},
+            )
+        return _cached_models[target]
@@ -1,15 +1,23 @@
+import asyncio
+import importlib.util
 import json
 import re
-from typing import Optional
+import threading
+from typing import Any, Callable, ClassVar, Optional
 
+import anthropic
+import httpx
+import openai
 import vertexai
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
 from google.oauth2 import service_account
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from vertexai.generative_models import Content, GenerationConfig, GenerativeModel, Part
 
 from fm_app.ai_models.model import AIModel, ChatMessage, InvestigationStep, schema
 from fm_app.api.model import QueryMetadata, IntentAnalysis
+from fm_app.metrics import observe_llm_tokens
+from fm_app.tracing import traced
 
 
 def normalize_schema(sch):
@@ -71,16 +79,101 @@ def openai_to_gemini(messages: list[ChatMessage]):
     return "\n".join(formatted_input)
 
 
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def pooled_http_client(settings, factory: Callable[..., httpx.AsyncClient]):
+    """
+    httpx client for one provider, shared by every call this process makes:
+    connections stay alive between requests and are multiplexed over HTTP/2
+    when the h2 package is installed. `factory` is the SDK's
+    DefaultAsyncHttpxClient so its redirect/timeout defaults are kept.
+    """
+    return factory(
+        limits=httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(settings.llm_timeout, connect=10.0),
+        http2=settings.llm_http2 and _HTTP2_AVAILABLE,
+    )
+
+
+def record_usage(provider: str, model: str, usage):
+    """Token counts from an OpenAI- or Anthropic-style usage object."""
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", None) or getattr(usage, "input_tokens", 0)
+    completion = getattr(usage, "completion_tokens", None) or getattr(
+        usage, "output_tokens", 0
+    )
+    observe_llm_tokens(provider, model, prompt or 0, completion or 0)
+
+
+class SharedAsyncClient:
+    """
+    Async SDK client built lazily on first use and then reused for the life of
+    the process. httpx pools belong to the event loop that opened them, so
+    each loop (the flow loop, asyncio.run in a script) gets its own client
+    instead of a pool it cannot use. `aclose` closes all of them.
+    """
+
+    def __init__(self):
+        self._factory: Optional[Callable[[], Any]] = None
+        self._clients: dict[asyncio.AbstractEventLoop, Any] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, factory: Callable[[], Any]):
+        self._factory = factory
+
+    def get(self):
+        if self._factory is None:
+            raise ValueError("Client not initialized. Call `init(settings)` first.")
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            with self._lock:
+                # a closed loop can't run its client's close() any more; drop
+                # the client so its sockets are released with it
+                for stale in [lp for lp in self._clients if lp.is_closed()]:
+                    del self._clients[stale]
+                client = self._clients[loop] = self._factory()
+        return client
+
+    async def aclose(self):
+        """Close the clients of this loop and of every other loop still running."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for owner, client in clients.items():
+            if owner is loop:
+                await client.close()
+            elif owner.is_running():
+                await asyncio.wrap_future(
+                    asyncio.run_coroutine_threadsafe(client.close(), owner)
+                )
+
+
 class OpenAIModel(AIModel):
-    _client: OpenAI = None  # Static client
+    _client: ClassVar[Optional[OpenAI]] = None  # sync, for legacy callers
+    _async_client: ClassVar[SharedAsyncClient] = SharedAsyncClient()
 
     model_config = {"arbitrary_types_allowed": True}
 
     @staticmethod
     def init(settings):
-        """Initializes and returns the OpenAI client (singleton)."""
-        # if OpenAIModel._client is None:
-        OpenAIModel._client = OpenAI(api_key=settings.openai_api_key)
+        """Initializes the OpenAI clients once per process; later calls are no-ops."""
+        if OpenAIModel._client is None:
+            OpenAIModel._client = OpenAI(api_key=settings.openai_api_key)
+            OpenAIModel._async_client.configure(
+                lambda: AsyncOpenAI(
+                    api_key=settings.openai_api_key,
+                    http_client=pooled_http_client(
+                        settings, openai.DefaultAsyncHttpxClient
+                    ),
+                )
+            )
         OpenAIModel.llm_name = settings.openai_llm_name
         return OpenAIModel._client
 
@@ -98,24 +191,23 @@ class OpenAIModel(AIModel):
         resp = OpenAIModel._client.chat.completions.create(
             temperature=0, model=OpenAIModel.llm_name, messages=messages
         )
+        record_usage("openai", OpenAIModel.llm_name, resp.usage)
         return resp.choices[0].message.content
 
     @staticmethod
-    def get_structured(
-        messages: list[ChatMessage],
-        step: type[InvestigationStep | QueryMetadata | IntentAnalysis],
-        model_override: Optional[str] = None,
-    ) -> InvestigationStep | QueryMetadata | IntentAnalysis:
-        """Generates a structured response."""
-        if OpenAIModel._client is None:
-            raise ValueError(
-                "Client not initialized. Call `get_client(settings)` first."
-            )
+    @traced("llm.response", provider="openai")
+    async def aget_response(messages) -> str:
+        resp = await OpenAIModel._async_client.get().chat.completions.create(
+            temperature=0, model=OpenAIModel.llm_name, messages=messages
+        )
+        record_usage("openai", OpenAIModel.llm_name, resp.usage)
+        return resp.choices[0].message.content
 
+    @staticmethod
+    def _structured_args(messages, model_override: Optional[str]) -> dict:
         model_name = model_override or OpenAIModel.llm_name
-        temperature = 1 if model_name.startswith("gpt-5") else 0
-        resp = OpenAIModel._client.chat.completions.create(
-            temperature=temperature,
+        return dict(
+            temperature=1 if model_name.startswith("gpt-5") else 0,
             model=model_name,
             messages=messages,
             response_format={"type": "json_object"},
@@ -123,24 +215,83 @@ class OpenAIModel(AIModel):
                 "OpenAI-Beta": "prompt-caching"
             }
         )
+
+    @staticmethod
+    def _parse_structured(resp, step, args: dict):
+        record_usage("openai", args["model"], resp.usage)
         data = json.loads(
             resp.choices[0].message.content, object_hook=fix_nulls_and_convert_rows
         )
-        print("LLM OUT", model_name, temperature, data)
+        print("LLM OUT", args["model"], args["temperature"], data)
         return step(**data)
 
+    @staticmethod
+    def get_structured(
+        messages: list[ChatMessage],
+        step: type[InvestigationStep | QueryMetadata | IntentAnalysis],
+        model_override: Optional[str] = None,
+    ) -> InvestigationStep | QueryMetadata | IntentAnalysis:
+        """Generates a structured response."""
+        if OpenAIModel._client is None:
+            raise ValueError(
+                "Client not initialized. Call `get_client(settings)` first."
+            )
+
+        args = OpenAIModel._structured_args(messages, model_override)
+        resp = OpenAIModel._client.chat.completions.create(**args)
+        return OpenAIModel._parse_structured(resp, step, args)
+
+    @staticmethod
+    @traced("llm.structured", record_args=("model_override",), provider="openai")
+    async def aget_structured(
+        messages: list[ChatMessage],
+        step: type[InvestigationStep | QueryMetadata | IntentAnalysis],
+        model_override: Optional[str] = None,
+    ) -> InvestigationStep | QueryMetadata | IntentAnalysis:
+        args = OpenAIModel._structured_args(messages, model_override)
+        resp = await OpenAIModel._async_client.get().chat.completions.create(**args)
+        return OpenAIModel._parse_structured(resp, step, args)
+
+    @staticmethod
+    @traced("llm.embedding", provider="openai")
+    async def aget_embedding(
+        text: str, model: str, dimensions: Optional[int] = None
+    ) -> list[float]:
+        """Embedding of `text`, on the same pooled client as the chat calls."""
+        args = {"dimensions": dimensions} if dimensions else {}
+        resp = await OpenAIModel._async_client.get().embeddings.create(
+            model=model, input=text, **args
+        )
+        record_usage("openai", model, resp.usage)
+        return resp.data[0].embedding
+
+    @staticmethod
+    async def aclose():
+        await OpenAIModel._async_client.aclose()
+
 
 class DeepSeekModel(AIModel):
-    _client = None  # Static client
+    _client: ClassVar[Optional[OpenAI]] = None  # sync, for legacy callers
+    _async_client: ClassVar[SharedAsyncClient] = SharedAsyncClient()
 
     @staticmethod
     def init(settings):
-        """Initializes the static client once."""
-        # if DeepSeekModel._client is None:  # Ensure it's only initialized once
+        """Initializes the static clients once."""
+        if DeepSeekModel._client is None:
+            DeepSeekModel._client = OpenAI(
+                base_url=settings.deepseek_ai_api_url,
+                api_key=settings.deepseek_ai_api_key,
+            )
+            DeepSeekModel._async_client.configure(
+                lambda: AsyncOpenAI(
+                    base_url=settings.deepseek_ai_api_url,
+                    api_key=settings.deepseek_ai_api_key,
+                    http_client=pooled_http_client(
+                        settings, openai.DefaultAsyncHttpxClient
+                    ),
+                )
+            )
         DeepSeekModel.llm_name = settings.deepseek_llm_name
-        DeepSeekModel._client = OpenAI(
-            base_url=settings.deepseek_ai_api_url, api_key=settings.deepseek_ai_api_key
-        )
 
     @staticmethod
     def get_name() -> str:
@@ -151,38 +302,75 @@ class DeepSeekModel(AIModel):
         resp = DeepSeekModel._client.chat.completions.create(
             temperature=0, model=DeepSeekModel.llm_name, messages=messages
         )
+        record_usage("deepseek", DeepSeekModel.llm_name, resp.usage)
         return resp.choices[0].message.content
 
     @staticmethod
-    def get_structured(
-        messages: list[ChatMessage],
-        step: type[InvestigationStep],
-        model_override: Optional[str] = None,
-    ) -> InvestigationStep:
-        # resp = DeepSeekModel._client.beta.chat.completions.parse(
-        model_name = model_override or DeepSeekModel.llm_name
-        resp = DeepSeekModel._client.chat.completions.create(
+    @traced("llm.response", provider="deepseek")
+    async def aget_response(messages) -> str:
+        resp = await DeepSeekModel._async_client.get().chat.completions.create(
+            temperature=0, model=DeepSeekModel.llm_name, messages=messages
+        )
+        record_usage("deepseek", DeepSeekModel.llm_name, resp.usage)
+        return resp.choices[0].message.content
+
+    @staticmethod
+    def _structured_args(messages, model_override: Optional[str]) -> dict:
+        return dict(
             temperature=0,
             # model="deepseek-reasoner",
-            model=model_name,
+            model=model_override or DeepSeekModel.llm_name,
             messages=messages,
             response_format={"type": "json_object"},
             # response_format=step
         )
+
+    @staticmethod
+    def _parse_structured(resp) -> InvestigationStep:
+        record_usage("deepseek", resp.model, resp.usage)
         data = json.loads(
             resp.choices[0].message.content, object_hook=fix_nulls_and_convert_rows
         )
         return InvestigationStep(**data)
 
+    @staticmethod
+    def get_structured(
+        messages: list[ChatMessage],
+        step: type[InvestigationStep],
+        model_override: Optional[str] = None,
+    ) -> InvestigationStep:
+        # resp = DeepSeekModel._client.beta.chat.completions.parse(
+        resp = DeepSeekModel._client.chat.completions.create(
+            **DeepSeekModel._structured_args(messages, model_override)
+        )
+        return DeepSeekModel._parse_structured(resp)
+
+    @staticmethod
+    @traced("llm.structured", record_args=("model_override",), provider="deepseek")
+    async def aget_structured(
+        messages: list[ChatMessage],
+        step: type[InvestigationStep],
+        model_override: Optional[str] = None,
+    ) -> InvestigationStep:
+        resp = await DeepSeekModel._async_client.get().chat.completions.create(
+            **DeepSeekModel._structured_args(messages, model_override)
+        )
+        return DeepSeekModel._parse_structured(resp)
+
+    @staticmethod
+    async def aclose():
+        await DeepSeekModel._async_client.aclose()
+
 
 class GeminiModel(AIModel):
-    _client: GenerativeModel = None  # Static client
+    _client: ClassVar[Optional[GenerativeModel]] = None  # Static client
     model_config = {"arbitrary_types_allowed": True}
 
     @staticmethod
     def init(settings):
         """Initializes the static client once."""
-        # if cls._client is None:  # Ensure it's only initialized once
+        if GeminiModel._client is not None:
+            return
         scopes = ["https://www.googleapis.com/auth/cloud-platform"]
         cred_file = settings.google_cred_file
         project_id = settings.google_project_id
@@ -233,6 +421,13 @@ class GeminiModel(AIModel):
             ),
             stream=False,
         )
+        usage = resp.usage_metadata
+        observe_llm_tokens(
+            "gemini",
+            GeminiModel.llm_name,
+            usage.prompt_token_count,
+            usage.candidates_token_count,
+        )
         data = json.loads(
             resp.candidates[0].content.parts[0].text,
             object_hook=fix_nulls_and_convert_rows,
@@ -241,14 +436,24 @@ class GeminiModel(AIModel):
 
 
 class AnthropicModel(AIModel):
-    _client: Anthropic = None
+    _client: ClassVar[Optional[Anthropic]] = None  # sync, for legacy callers
+    _async_client: ClassVar[SharedAsyncClient] = SharedAsyncClient()
 
     model_config = {"arbitrary_types_allowed": True}
 
     @staticmethod
     def init(settings):
-        """Initializes and returns the Anthropic client (singleton)."""
-        AnthropicModel._client = Anthropic(api_key=settings.anthropic_api_key)
+        """Sets up the Anthropic clients once per process; later calls are no-ops."""
+        if AnthropicModel._client is None:
+            AnthropicModel._client = Anthropic(api_key=settings.anthropic_api_key)
+            AnthropicModel._async_client.configure(
+                lambda: AsyncAnthropic(
+                    api_key=settings.anthropic_api_key,
+                    http_client=pooled_http_client(
+                        settings, anthropic.DefaultAsyncHttpxClient
+                    ),
+                )
+            )
         AnthropicModel.llm_name = settings.anthropic_llm_name
         return AnthropicModel._client
 
@@ -257,30 +462,74 @@ class AnthropicModel(AIModel):
         return "anthropic"
 
     @staticmethod
-    def get_response(messages) -> str:
-        """Generates a response from Anthropic."""
-        if AnthropicModel._client is None:
-            raise ValueError("Client not initialized. Call `init(settings)` first.")
-
-        # Anthropic uses a single prompt string
-        # prompt = AnthropicModel._build_prompt(messages)
+    def _split_system(messages, system_instruction: str = "") -> tuple[str, list]:
+        # Anthropic takes the system prompt separately from the turns
         filtered_messages = []
-        system_instruction = ""
         for msg in messages:
             if msg["role"] == "system":
                 system_instruction = f"{system_instruction}{msg['content']}"
             else:
                 filtered_messages.append(msg)
+        return system_instruction, filtered_messages
 
-        response = AnthropicModel._client.messages.create(
+    @staticmethod
+    def _response_args(messages) -> dict:
+        system_instruction, filtered_messages = AnthropicModel._split_system(messages)
+        return dict(
             model=AnthropicModel.llm_name,
             max_tokens=8192,  # max for Anthropic
             temperature=0,
             system=system_instruction,
             messages=filtered_messages,
         )
+
+    @staticmethod
+    def get_response(messages) -> str:
+        """Generates a response from Anthropic."""
+        if AnthropicModel._client is None:
+            raise ValueError("Client not initialized. Call `init(settings)` first.")
+
+        response = AnthropicModel._client.messages.create(
+            **AnthropicModel._response_args(messages)
+        )
+        record_usage("anthropic", response.model, response.usage)
         return response.content[0].text
 
+    @staticmethod
+    @traced("llm.response", provider="anthropic")
+    async def aget_response(messages) -> str:
+        response = await AnthropicModel._async_client.get().messages.create(
+            **AnthropicModel._response_args(messages)
+        )
+        record_usage("anthropic", response.model, response.usage)
+        return response.content[0].text
+
+    @staticmethod
+    def _structured_args(messages, model_override: Optional[str]) -> dict:
+        system_instruction, filtered_messages = AnthropicModel._split_system(
+            messages,
+            "Return only a valid JSON object matching the expected schema:\n"
+            f"{schema}\n",
+        )
+        print("system_instruction", len(system_instruction))
+        print("messages", len(filtered_messages))
+        return dict(
+            model=model_override or AnthropicModel.llm_name,
+            max_tokens=8192,  # max for Anthropic
+            temperature=0,
+            system=system_instruction,
+            messages=filtered_messages,
+        )
+
+    @staticmethod
+    def _parse_structured(content: str) -> InvestigationStep:
+        content = fix_multiline_strings(content)
+        if content == "":
+            print("Empty response from Anthropic")
+            return InvestigationStep()
+        data = json.loads(content, object_hook=fix_nulls_and_convert_rows)
+        return InvestigationStep(**data)
+
     @staticmethod
     def get_structured(
         messages: list[ChatMessage],
@@ -291,28 +540,10 @@ class AnthropicModel(AIModel):
         if AnthropicModel._client is None:
             raise ValueError("Client not initialized. Call `init(settings)` first.")
 
-        filtered_messages = []
-        system_instruction = (
-            f"Return only a valid JSON object matching the expected schema:\n{schema}\n"
-        )
-        for msg in messages:
-            if msg["role"] == "system":
-                system_instruction += msg["content"]
-            else:
-                filtered_messages.append(msg)
-
-        print("system_instruction", len(system_instruction))
-        print("messages", len(filtered_messages))
         content = ""
-        model_name = model_override or AnthropicModel.llm_name
-
-        try:  # Anthropic uses a single prompt string
+        try:
             with AnthropicModel._client.messages.stream(
-                model=model_name,
-                max_tokens=8192,  # max for Anthropic
-                temperature=0,
-                system=system_instruction,
-                messages=filtered_messages,
+                **AnthropicModel._structured_args(messages, model_override)
             ) as stream:
                 for event in stream.text_stream:
                     try:
@@ -320,18 +551,46 @@ class AnthropicModel(AIModel):
                         content += delta
                     except Exception as e:
                         print("Error in streaming:", e)
+                final = stream.get_final_message()
+                record_usage("anthropic", final.model, final.usage)
+
+            return AnthropicModel._parse_structured(content)
+
+        except Exception as e:
+            print("Error in get_structured:", e)
+            return InvestigationStep()
+
+    @staticmethod
+    @traced("llm.structured", record_args=("model_override",), provider="anthropic")
+    async def aget_structured(
+        messages: list[ChatMessage],
+        step: type[InvestigationStep],
+        model_override: Optional[str] = None,
+    ) -> InvestigationStep:
+        content = ""
+        try:
+            async with AnthropicModel._async_client.get().messages.stream(
+                **AnthropicModel._structured_args(messages, model_override)
+            ) as stream:
+                async for event in stream.text_stream:
+                    try:
+                        delta = clean(event)
+                        content += delta
+                    except Exception as e:
+                        print("Error in streaming:", e)
+                final = await stream.get_final_message()
+                record_usage("anthropic", final.model, final.usage)
 
-            content = fix_multiline_strings(content)
-            if content == "":
-                print("Empty response from Anthropic")
-                return InvestigationStep()
-            data = json.loads(content, object_hook=fix_nulls_and_convert_rows)
-            return InvestigationStep(**data)
+            return AnthropicModel._parse_structured(content)
 
         except Exception as e:
             print("Error in get_structured:", e)
             return InvestigationStep()
 
+    @staticmethod
+    async def aclose():
+        await AnthropicModel._async_client.aclose()
+
     @staticmethod
     def _build_prompt(messages: list[dict]) -> str:
         """Builds a Claude-compatible prompt from a list of role-based messages."""
@@ -349,3 +608,9 @@ class AnthropicModel(AIModel):
                 raise ValueError(f"Unsupported role: {role}")
         parts.append("\n\nAssistant:")
         return "".join(parts)
+
+
+async def close_models():
+    """Closes the pooled async clients; called once when a worker process exits."""
+    for model in (OpenAIModel, DeepSeekModel, GeminiModel, AnthropicModel):
+        await model.aclose()
@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC
 from typing import Optional
 
@@ -5,6 +6,7 @@ from pydantic import BaseModel, Field
 
 from fm_app.api.model import QueryMetadata, IntentAnalysis
 from fm_app.config import Settings
+from fm_app.tracing import span
 
 
 class InvestigationStep(BaseModel):
@@ -117,3 +119,30 @@ class AIModel(BaseModel, ABC):
     ) -> InvestigationStep | QueryMetadata | IntentAnalysis:
         """Must be implemented by subclasses."""
         pass
+
+    @classmethod
+    async def aget_response(cls, messages) -> str:
+        """Async variant of get_response. Models with a native async client
+        override this; the default runs the sync call on a thread."""
+        with span("llm.response", provider=cls.get_name()):
+            return await asyncio.to_thread(cls.get_response, messages)
+
+    @classmethod
+    async def aget_structured(
+        cls,
+        messages: list[ChatMessage],
+        step: type[InvestigationStep | QueryMetadata | IntentAnalysis],
+        model_override: Optional[str] = None,
+    ) -> InvestigationStep | QueryMetadata | IntentAnalysis:
+        """Async variant of get_structured, see aget_response."""
+        with span(
+            "llm.structured", provider=cls.get_name(), model_override=model_override
+        ):
+            return await asyncio.to_thread(
+                cls.get_structured, messages, step, model_override
+            )
+
+    @staticmethod
+    async def aclose():
+        """Releases the async client's pooled connections, if any."""
+        pass
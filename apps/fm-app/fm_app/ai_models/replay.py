@@ -0,0 +1,323 @@
+"""
+Record/replay stand-in for the LLM providers, so flows can be run and
+benchmarked without provider keys.
+
+With `llm_replay_mode=record` every call goes to the real provider and the
+answer, together with how long it took, is appended to the JSONL cassette at
+`llm_replay_file`. With `llm_replay_mode=replay` the answers are served from
+the cassette after a delay drawn from `llm_replay_latency`:
+
+    recorded                  the latency measured when the call was captured
+    empirical                 any latency captured for the same kind of call
+    none                      no delay
+    fixed:<ms>
+    uniform:<low_ms>,<high_ms>
+    lognormal:<median_ms>,<sigma>
+
+Calls are matched on a hash of the provider, call kind, response type, model
+override and messages. Prompts carry timestamps and fresh ids, so a call
+without an exact match gets the next capture of the same kind and response
+type, round robin, unless `llm_replay_strict` is set.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Any, ClassVar, Optional
+
+from pydantic import BaseModel
+
+from fm_app.ai_models.model import AIModel, ChatMessage, InvestigationStep
+from fm_app.api.model import IntentAnalysis, QueryMetadata
+from fm_app.config import Settings
+from fm_app.tracing import span
+
+REPLAY_MODES = ("off", "record", "replay")
+
+
+@dataclass
+class Capture:
+    key: str
+    provider: str
+    kind: str  # "response" or "structured"
+    step: Optional[str]  # response type of structured calls
+    latency_ms: float
+    output: Any
+
+    @property
+    def group(self) -> tuple[str, Optional[str]]:
+        return self.kind, self.step
+
+
+def _jsonable(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def capture_key(
+    provider: str,
+    kind: str,
+    step: Optional[str],
+    model_override: Optional[str],
+    messages,
+) -> str:
+    payload = json.dumps(
+        [provider, kind, step, model_override, messages],
+        sort_keys=True,
+        default=_jsonable,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Captured calls, appended to and read from one JSONL file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_key: dict[str, list[Capture]] = defaultdict(list)
+        self._by_group: dict[tuple, list[Capture]] = defaultdict(list)
+        self._served: dict[Any, int] = defaultdict(int)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._index(Capture(**json.loads(line)))
+
+    def _index(self, capture: Capture):
+        self._by_key[capture.key].append(capture)
+        self._by_group[capture.group].append(capture)
+
+    def __len__(self) -> int:
+        return sum(len(captures) for captures in self._by_group.values())
+
+    def append(self, capture: Capture):
+        line = json.dumps(asdict(capture), default=_jsonable)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._index(capture)
+
+    def find(self, key: str, group: tuple, strict: bool) -> Capture:
+        with self._lock:
+            if self._by_key.get(key):
+                captures, served = self._by_key[key], key
+            elif not strict and self._by_group.get(group):
+                captures, served = self._by_group[group], group
+            else:
+                raise LookupError(f"No captured LLM call for {group} in {self.path}")
+            # repeated prompts walk through their captures in recorded order
+            i = self._served[served]
+            self._served[served] = i + 1
+            return captures[i % len(captures)]
+
+    def latencies(self, group: tuple) -> list[float]:
+        with self._lock:
+            return [c.latency_ms for c in self._by_group.get(group, [])]
+
+
+def parse_latency(spec: str) -> tuple[str, tuple[float, ...]]:
+    """'lognormal:800,0.5' -> ('lognormal', (800.0, 0.5)); validates the arity."""
+    name, _, args = spec.partition(":")
+    params = tuple(float(a) for a in args.split(",") if a.strip())
+    arity = {
+        "recorded": 0,
+        "empirical": 0,
+        "none": 0,
+        "fixed": 1,
+        "uniform": 2,
+        "lognormal": 2,
+    }
+    if arity.get(name) != len(params):
+        raise ValueError(f"Invalid llm_replay_latency: {spec!r}")
+    return name, params
+
+
+class ReplayModel(AIModel):
+    """
+    Base of the per-provider replay models built by `replay_model`. Reports
+    the wrapped provider's name, since flows format prompts by it.
+    """
+
+    target: ClassVar[type[AIModel]] = AIModel
+    mode: ClassVar[str] = "replay"
+    cassette: ClassVar[Optional[Cassette]] = None
+    strict: ClassVar[bool] = False
+    latency: ClassVar[tuple[str, tuple[float, ...]]] = ("recorded", ())
+    rng: ClassVar[random.Random] = random.Random()
+
+    @classmethod
+    def get_name(cls) -> str:
+        return cls.target.get_name()
+
+    @classmethod
+    def get_specific_instructions(cls) -> str:
+        return cls.target.get_specific_instructions()
+
+    @classmethod
+    def _record(
+        cls,
+        kind: str,
+        step: Optional[type],
+        model_override: Optional[str],
+        messages,
+        started: float,
+        output,
+    ):
+        step_name = step.__name__ if step else None
+        cls.cassette.append(
+            Capture(
+                key=capture_key(
+                    cls.get_name(), kind, step_name, model_override, messages
+                ),
+                provider=cls.get_name(),
+                kind=kind,
+                step=step_name,
+                latency_ms=round((time.perf_counter() - started) * 1000, 3),
+                output=output,
+            )
+        )
+
+    @classmethod
+    def _find(
+        cls,
+        kind: str,
+        step: Optional[type],
+        model_override: Optional[str],
+        messages,
+    ) -> Capture:
+        step_name = step.__name__ if step else None
+        key = capture_key(cls.get_name(), kind, step_name, model_override, messages)
+        return cls.cassette.find(key, (kind, step_name), cls.strict)
+
+    @classmethod
+    def _delay(cls, capture: Capture) -> float:
+        """Seconds to wait before serving `capture`."""
+        name, params = cls.latency
+        if name == "recorded":
+            ms = capture.latency_ms
+        elif name == "empirical":
+            ms = cls.rng.choice(cls.cassette.latencies(capture.group))
+        elif name == "fixed":
+            ms = params[0]
+        elif name == "uniform":
+            ms = cls.rng.uniform(*params)
+        elif name == "lognormal":
+            ms = cls.rng.lognormvariate(math.log(params[0]), params[1])
+        else:
+            ms = 0.0
+        return max(0.0, ms) / 1000.0
+
+    @classmethod
+    def get_response(cls, messages) -> str:
+        if cls.mode == "record":
+            started = time.perf_counter()
+            output = cls.target.get_response(messages)
+            cls._record("response", None, None, messages, started, output)
+            return output
+        capture = cls._find("response", None, None, messages)
+        time.sleep(cls._delay(capture))
+        return capture.output
+
+    @classmethod
+    def get_structured(
+        cls,
+        messages: list[ChatMessage],
+        step: type[InvestigationStep | QueryMetadata | IntentAnalysis],
+        model_override: Optional[str] = None,
+    ) -> InvestigationStep | QueryMetadata | IntentAnalysis:
+        if cls.mode == "record":
+            started = time.perf_counter()
+            output = cls.target.get_structured(messages, step, model_override)
+            cls._record("structured", step, model_override, messages, started, output)
+            return output
+        capture = cls._find("structured", step, model_override, messages)
+        time.sleep(cls._delay(capture))
+        return step(**capture.output)
+
+    @classmethod
+    async def aget_response(cls, messages) -> str:
+        if cls.mode == "record":
+            started = time.perf_counter()
+            output = await cls.target.aget_response(messages)
+            cls._record("response", None, None, messages, started, output)
+            return output
+        with span("llm.response", provider=cls.get_name(), replay=True):
+            capture = cls._find("response", None, None, messages)
+            await asyncio.sleep(cls._delay(capture))
+            return capture.output
+
+    @classmethod
+    async def aget_structured(
+        cls,
+        messages: list[ChatMessage],
+        step: type[InvestigationStep | QueryMetadata | IntentAnalysis],
+        model_override: Optional[str] = None,
+    ) -> InvestigationStep | QueryMetadata | IntentAnalysis:
+        if cls.mode == "record":
+            started = time.perf_counter()
+            output = await cls.target.aget_structured(messages, step, model_override)
+            cls._record("structured", step, model_override, messages, started, output)
+            return output
+        with span(
+            "llm.structured",
+            provider=cls.get_name(),
+            model_override=model_override,
+            replay=True,
+        ):
+            capture = cls._find("structured", step, model_override, messages)
+            await asyncio.sleep(cls._delay(capture))
+            return step(**capture.output)
+
+
+_cassettes: dict[str, Cassette] = {}
+_replay_models: dict[type[AIModel], type[ReplayModel]] = {}
+_lock = threading.Lock()
+
+
+def replay_model(settings: Settings, target: type[AIModel]) -> type[AIModel]:
+    """
+    `target` itself when llm_replay_mode is off, otherwise the replay model
+    recording or replaying its calls. Built once per provider and process.
+    """
+    mode = settings.llm_replay_mode
+    if mode not in REPLAY_MODES:
+        raise ValueError(f"Invalid llm_replay_mode: {mode!r}")
+    if mode == "off":
+        return target
+    with _lock:
+        if target not in _replay_models:
+            path = settings.llm_replay_file
+            if path not in _cassettes:
+                _cassettes[path] = Cassette(path)
+                logging.info(
+                    "LLM replay cassette loaded",
+                    extra={
+                        "mode": mode,
+                        "path": path,
+                        "captures": len(_cassettes[path]),
+                    },
+                )
+            _replay_models[target] = type(
+                f"Replay{target.__name__}",
+                (ReplayModel,),
+                {
+                    "__module__": __name__,
+                    "target": target,
+                    "mode": mode,
+                    "cassette": _cassettes[path],
+                    "strict": settings.llm_replay_strict,
+                    "latency": parse_latency(settings.llm_replay_latency),
+                    "rng": random.Random(settings.llm_replay_seed),
+                },
+            )
+        return _replay_models[target]
@@ -0,0 +1,165 @@
+import time
+from datetime import datetime
+from typing import ClassVar
+
+import numpy as np
+import pytest
+
+from fm_app.ai_models import cache
+from fm_app.ai_models.model import AIModel
+from fm_app.api.model import IntentAnalysis
+from fm_app.config import get_settings
+from fm_app.prompt_assembler.prompt_packs import SlotMaterial
+
+VECTORS = {
+    "top traders": [1.0, 0.0, 0.0],
+    "top traders please": [0.99, 0.05, 0.0],
+    "top traders, please": [0.99, 0.04, 0.0],
+    "volume by day": [0.0, 1.0, 0.0],
+}
+
+
+class FakeModel(AIModel):
+    calls: ClassVar[int] = 0
+
+    @classmethod
+    def get_name(cls) -> str:
+        return "fake"
+
+    @classmethod
+    async def aget_structured(cls, messages, step, model_override=None):
+        cls.calls += 1
+        return IntentAnalysis(intent=messages[-1]["content"])
+
+
+FakeModel.llm_name = "fake-1"
+
+
+async def embed(self, text: str) -> np.ndarray:
+    vector = np.asarray(VECTORS[text], dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def model(monkeypatch):
+    settings = get_settings().model_copy(
+        update={
+            "llm_cache_slots": "planner,linked_query:60",
+            "llm_cache_semantic_slots": "planner",
+        }
+    )
+    monkeypatch.setattr(cache, "get_settings", lambda: settings)
+    monkeypatch.setattr(cache.ResponseCache, "embed", embed)
+    monkeypatch.setattr(
+        cache.CachedModel, "cache", cache.ResponseCache(settings, cache.MemoryStore(64))
+    )
+    FakeModel.calls = 0
+    return cache.cached_model(settings, FakeModel)
+
+
+def slot(name: str, version: str = "1.0.0") -> SlotMaterial:
+    return SlotMaterial(
+        slot=name, prompt_text="", extras={}, lineage={"system_pack": version}
+    )
+
+
+def messages(request: str, now: datetime, query_id: str = "q-1"):
+    system = f"Now is {now}. QueryMetadata ID (new): {query_id}"
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": request},
+    ]
+
+
+async def ask(model, name, request, now, query_id="q-1", **kwargs):
+    volatile = {str(now): now.date().isoformat(), query_id: "<new>"}
+    with cache.cache_slot(slot(name), volatile=volatile, **kwargs) as cached:
+        await model.aget_structured(
+            messages(request, now, query_id), IntentAnalysis, "x"
+        )
+    return cached.result
+
+
+def test_parse_slots():
+    assert cache.parse_slots(" planner, linked_query:600,", 30) == {
+        "planner": 30,
+        "linked_query": 600,
+    }
+
+
+def test_memory_store_expires():
+    store = cache.MemoryStore(2)
+    store.set("a", "1", ttl=60)
+    store.set("b", "2", ttl=-1)
+    assert store.get("a") == "1"
+    assert store.get("b") is None
+
+
+def test_disk_store_round_trip(tmp_path):
+    store = cache.DiskStore(str(tmp_path))
+    store.set("fm:llm:a", "1", ttl=60)
+    assert store.get("fm:llm:a") == "1"
+    store.delete("fm:llm:a")
+    assert store.get("fm:llm:a") is None
+
+
+def test_slot_not_opted_in_yields_none(model):
+    with cache.cache_slot(slot("data_analysis")) as cached:
+        assert cached is None
+
+
+@pytest.mark.asyncio
+async def test_exact_key_ignores_volatile_values(model):
+    morning = datetime(2026, 10, 18, 9, 0, 1)
+    evening = datetime(2026, 10, 18, 21, 30, 0)
+    assert await ask(model, "linked_query", "same", morning, "q-1") == "miss"
+    assert await ask(model, "linked_query", "same", evening, "q-2") == "exact"
+    # the day is kept, so relative dates aren't answered from yesterday
+    tomorrow = datetime(2026, 10, 19, 9, 0, 1)
+    assert await ask(model, "linked_query", "same", tomorrow, "q-3") == "miss"
+    assert FakeModel.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_semantic_tier_is_scoped(model):
+    now = datetime(2026, 10, 18, 9, 0, 0)
+    fingerprint = {"value": "schema-1"}
+
+    async def schema():
+        return fingerprint["value"]
+
+    def scoped(request, **scope):
+        return ask(model, "planner", request, now, semantic_text=request, **scope)
+
+    assert await scoped("top traders", schema=schema, db="v2") == "miss"
+    assert await scoped("top traders please", schema=schema, db="v2") == "semantic"
+    assert await scoped("volume by day", schema=schema, db="v2") == "miss"
+    # another warehouse profile or schema has an index of its own
+    assert await scoped("top traders, please", schema=schema, db="v1") == "miss"
+    fingerprint["value"] = "schema-2"
+    assert await scoped("top traders please", schema=schema, db="v2") == "miss"
+    assert FakeModel.calls == 4
+
+
+@pytest.mark.asyncio
+async def test_semantic_tier_skipped_without_fingerprint(model):
+    now = datetime(2026, 10, 18, 9, 0, 0)
+
+    async def broken():
+        raise ConnectionError("db-meta down")
+
+    kwargs = {"semantic_text": "top traders", "schema": broken}
+    assert await ask(model, "planner", "top traders", now, **kwargs) == "miss"
+    # an identical prompt is still served from the exact tier
+    assert await ask(model, "planner", "top traders", now, **kwargs) == "exact"
+    kwargs["semantic_text"] = "top traders please"
+    assert await ask(model, "planner", "top traders please", now, **kwargs) == "miss"
+
+
+@pytest.mark.asyncio
+async def test_entries_expire(model, monkeypatch):
+    now = datetime(2026, 10, 18, 9, 0, 0)
+    assert await ask(model, "linked_query", "same", now) == "miss"
+    later = time.time() + 61
+    monkeypatch.setattr(cache.time, "time", lambda: later)
+    assert await ask(model, "linked_query", "same", now) == "miss"
@@ -0,0 +1,215 @@
+import io
+import re
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+import pyarrow as pa
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+@dataclass(frozen=True)
+class ColumnarResult:
+    """A result as the native driver returns it with columnar=True."""
+
+    columns: list[str]
+    types: list[str]
+    data: list[list[Any]]  # one value list per column
+
+    @property
+    def num_rows(self) -> int:
+        return len(self.data[0]) if self.data else 0
+
+    def row(self, index: int) -> dict[str, Any]:
+        return {name: values[index] for name, values in zip(self.columns, self.data)}
+
+    def to_dicts(self) -> list[dict[str, Any]]:
+        return [dict(zip(self.columns, values)) for values in zip(*self.data)]
+
+    def drop(self, names: set[str]) -> "ColumnarResult":
+        keep = [i for i, name in enumerate(self.columns) if name not in names]
+        return ColumnarResult(
+            columns=[self.columns[i] for i in keep],
+            types=[self.types[i] for i in keep],
+            data=[self.data[i] for i in keep],
+        )
+
+
+_WRAPPER_RE = re.compile(r"^(Nullable|LowCardinality)\((.*)\)$")
+_DECIMAL_RE = re.compile(r"^Decimal(?:\d+)?\((\d+),\s*(\d+)\)$")
+_DATETIME64_RE = re.compile(r"^DateTime64\((\d)(?:,\s*'([^']*)')?\)$")
+_DATETIME_RE = re.compile(r"^DateTime(?:\('([^']*)'\))?$")
+
+_SIMPLE_TYPES = {
+    "Int8": pa.int8(),
+    "Int16": pa.int16(),
+    "Int32": pa.int32(),
+    "Int64": pa.int64(),
+    "UInt8": pa.uint8(),
+    "UInt16": pa.uint16(),
+    "UInt32": pa.uint32(),
+    "UInt64": pa.uint64(),
+    "Float32": pa.float32(),
+    "Float64": pa.float64(),
+    "Bool": pa.bool_(),
+    "String": pa.string(),
+    "Date": pa.date32(),
+    "Date32": pa.date32(),
+}
+
+
+def arrow_type(ch_type: Optional[str]) -> pa.DataType:
+    """
+    Arrow type for a ClickHouse column type as reported by the native driver.
+    Anything without a lossless mapping (UUID, Enum, Int128, arrays, maps...)
+    is exported as a string.
+    """
+    if not ch_type:
+        return pa.string()
+    while m := _WRAPPER_RE.match(ch_type):
+        ch_type = m.group(2)
+    if ch_type in _SIMPLE_TYPES:
+        return _SIMPLE_TYPES[ch_type]
+    if m := _DECIMAL_RE.match(ch_type):
+        precision, scale = int(m.group(1)), int(m.group(2))
+        if precision <= 38:
+            return pa.decimal128(precision, scale)
+        return pa.decimal256(precision, scale)
+    if m := _DATETIME64_RE.match(ch_type):
+        precision = int(m.group(1))
+        unit = "s" if precision == 0 else "ms" if precision <= 3 else "us"
+        return pa.timestamp(unit, tz=m.group(2))
+    if m := _DATETIME_RE.match(ch_type):
+        return pa.timestamp("s", tz=m.group(1))
+    return pa.string()
+
+
+def arrow_schema(
+    columns: Sequence[str], ch_types: Sequence[Optional[str]]
+) -> pa.Schema:
+    return pa.schema(
+        [pa.field(name, arrow_type(t)) for name, t in zip(columns, ch_types)]
+    )
+
+
+def cursor_types(result) -> list[Optional[str]]:
+    """ClickHouse type names from a SQLAlchemy result's DBAPI description."""
+    description = getattr(getattr(result, "cursor", None), "description", None)
+    return [d[1] for d in description] if description else []
+
+
+def _column_array(values: Sequence[Any], type_: pa.DataType) -> pa.Array:
+    if pa.types.is_string(type_):
+        values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+    return pa.array(values, type=type_)
+
+
+def record_batch_from_columns(
+    schema: pa.Schema, columns: Sequence[Sequence[Any]]
+) -> pa.RecordBatch:
+    """Record batch straight from per-column value lists (no per-row dicts)."""
+    return pa.record_batch(
+        [_column_array(values, field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def record_batch_from_rows(
+    schema: pa.Schema, rows: Sequence[Sequence[Any]]
+) -> pa.RecordBatch:
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    return record_batch_from_columns(schema, columns)
+
+
+def arrow_ipc_stream(result: ColumnarResult) -> bytes:
+    """Serialize a result as a single-batch Arrow IPC stream."""
+    schema = arrow_schema(result.columns, result.types)
+    batch = record_batch_from_columns(schema, result.data)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue()
+
+
+def _synthetic_page(num_rows: int) -> ColumnarResult:
+    import datetime
+    import decimal
+
+    start = datetime.datetime(2025, 1, 1)
+    columns = {
+        "block_time": (
+            "DateTime",
+            [start + datetime.timedelta(seconds=i) for i in range(num_rows)],
+        ),
+        "slot": ("UInt64", [300_000_000 + i for i in range(num_rows)]),
+        "wallet": ("String", [f"{i:044x}" for i in range(num_rows)]),
+        "token": (
+            "LowCardinality(String)",
+            [("SOL", "USDC", "MOBILE")[i % 3] for i in range(num_rows)],
+        ),
+        "amount": ("Float64", [i * 1.25 for i in range(num_rows)]),
+        "amount_usd": (
+            "Decimal(38, 6)",
+            [
+                (decimal.Decimal(i) / 7).quantize(decimal.Decimal("0.000001"))
+                for i in range(num_rows)
+            ],
+        ),
+        "fee": (
+            "Nullable(UInt32)",
+            [None if i % 5 == 0 else i for i in range(num_rows)],
+        ),
+        "is_buy": ("Bool", [i % 2 == 0 for i in range(num_rows)]),
+    }
+    return ColumnarResult(
+        columns=list(columns),
+        types=[t for t, _ in columns.values()],
+        data=[[*values] for _, values in columns.values()],
+    )
+
+
+def benchmark_page_encoding(
+    sizes: Sequence[int] = (100, 1_000, 10_000), iterations: int = 20
+) -> dict[int, tuple[float, int, float, int]]:
+    """
+    Microbenchmark for /data page bodies on a synthetic trades-like page:
+    {rows: (json ms, json bytes, arrow ms, arrow bytes)}. JSON goes through
+    the same GetDataResponse path as the route.
+    """
+    import time
+    import uuid
+
+    from fm_app.api.model import GetDataResponse
+
+    out = {}
+    for size in sizes:
+        page = _synthetic_page(size)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            body = GetDataResponse(
+                query_id=uuid.uuid4(),
+                limit=size,
+                offset=0,
+                rows=page.to_dicts(),
+                total_rows=size,
+            ).model_dump_json()
+        json_ms = (time.perf_counter() - start) * 1000.0 / iterations
+        json_bytes = len(body)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            arrow_body = arrow_ipc_stream(page)
+        arrow_ms = (time.perf_counter() - start) * 1000.0 / iterations
+
+        out[size] = (json_ms, json_bytes, arrow_ms, len(arrow_body))
+    return out
+
+
+if __name__ == "__main__":
+    print(
+        f"{'rows':>8s} {'json ms':>9s} {'json KB':>9s} "
+        f"{'arrow ms':>9s} {'arrow KB':>9s}"
+    )
+    for rows, (j_ms, j_b, a_ms, a_b) in benchmark_page_encoding().items():
+        print(f"{rows:8d} {j_ms:9.2f} {j_b / 1024:9.1f} {a_ms:9.2f} {a_b / 1024:9.1f}")
@@ -0,0 +1,89 @@
+import threading
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from cachetools import TTLCache
+
+from fm_app.api.columnar import ColumnarResult
+from fm_app.config import get_settings
+from fm_app.metrics import DATA_CACHE_BYTES, DATA_CACHE_LOOKUPS
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    data: ColumnarResult  # kept columnar so Arrow responses skip row dicts
+    rows_fp: str  # first/last row fingerprint the ETag is built from
+    nbytes: int  # size of the serialized page, used for eviction
+    next_cursor: Optional[str] = None
+
+
+class DataPageCache:
+    """
+    Byte-bounded LRU of /data pages keyed by (sql hash, sort_by, sort_order,
+    limit, offset or cursor). Entries expire with the s-maxage we advertise,
+    so a shared cache and this one agree on freshness.
+    """
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self._pages: TTLCache = TTLCache(
+            maxsize=max_bytes, ttl=ttl, getsizeof=lambda page: page.nbytes
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(
+        sql_hash: str,
+        sort_by: Optional[str],
+        sort_order: Optional[str],
+        limit: int,
+        offset: int,
+        cursor: Optional[str] = None,
+    ) -> tuple:
+        position = ("cursor", cursor) if cursor is not None else offset
+        return sql_hash, sort_by or "", (sort_order or "").lower(), limit, position
+
+    def get(self, key: tuple) -> Optional[CachedPage]:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                self.misses += 1
+                DATA_CACHE_LOOKUPS.labels("miss").inc()
+            else:
+                self.hits += 1
+                DATA_CACHE_LOOKUPS.labels("hit").inc()
+            # lookups also drop expired pages
+            DATA_CACHE_BYTES.set(self._pages.currsize)
+            return page
+
+    def set(self, key: tuple, page: CachedPage):
+        if page.nbytes > self._pages.maxsize:
+            return  # a single oversized page would evict everything else
+        with self._lock:
+            self._pages[key] = page
+            DATA_CACHE_BYTES.set(self._pages.currsize)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            DATA_CACHE_BYTES.set(0)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+                "entries": len(self._pages),
+                "bytes": self._pages.currsize,
+                "max_bytes": self._pages.maxsize,
+            }
+
+
+data_page_cache = DataPageCache(
+    max_bytes=settings.data_cache_max_bytes, ttl=settings.data_cache_ttl
+)
@@ -3,12 +3,18 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 
 from fm_app.config import get_settings
+from fm_app.metrics import TimedAsyncQueuePool
 
 settings = get_settings()
 DATABASE_URL = f"postgresql+asyncpg://{settings.database_user}:{settings.database_pass}@{settings.database_server}:{settings.database_port}/{settings.database_db}"
 
 engine = create_async_engine(
-    DATABASE_URL, pool_size=20, max_overflow=30, pool_pre_ping=True, pool_recycle=360
+    DATABASE_URL,
+    poolclass=TimedAsyncQueuePool,
+    pool_size=20,
+    max_overflow=30,
+    pool_pre_ping=True,
+    pool_recycle=360,
 )
 
 SESSION = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
@@ -0,0 +1,203 @@
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import zlib
+from typing import Any, AsyncIterator, Iterable, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import zstandard
+from sqlalchemy import text
+
+from fm_app.api.columnar import arrow_schema, cursor_types, record_batch_from_rows
+from fm_app.api.db_session import wh_engine
+from fm_app.api.wh_exec import kill_query, tag_query, wh_executor
+from fm_app.config import get_settings
+
+settings = get_settings()
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+EXPORT_COMPRESSIONS = {
+    "gzip": ("application/gzip", "gz"),
+    "zstd": ("application/zstd", "zst"),
+}
+
+
+class _CsvEncoder:
+    def __init__(self, columns: list[str], ch_types: list[Optional[str]]):
+        self.columns = columns
+
+    def header(self) -> bytes:
+        return self._encode([self.columns])
+
+    def encode(self, rows: Iterable[tuple]) -> bytes:
+        return self._encode(rows)
+
+    def finish(self) -> bytes:
+        return b""
+
+    @staticmethod
+    def _encode(rows: Iterable[Iterable[Any]]) -> bytes:
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        return buf.getvalue().encode("utf-8")
+
+
+class _NdjsonEncoder:
+    def __init__(self, columns: list[str], ch_types: list[Optional[str]]):
+        self.columns = columns
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: Iterable[tuple]) -> bytes:
+        return "".join(
+            json.dumps(dict(zip(self.columns, row)), default=str) + "\n" for row in rows
+        ).encode("utf-8")
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file for ParquetWriter that hands bytes out as they come
+    while keeping tell() absolute, which the footer offsets depend on."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+class _ParquetEncoder:
+    """One row group per block, typed from the ClickHouse column types."""
+
+    def __init__(self, columns: list[str], ch_types: list[Optional[str]]):
+        self.schema = arrow_schema(columns, ch_types or [None] * len(columns))
+        self._sink = _DrainableSink()
+        self._writer = pq.ParquetWriter(
+            pa.PythonFile(self._sink, mode="w"), self.schema
+        )
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: list[tuple]) -> bytes:
+        self._writer.write_batch(record_batch_from_rows(self.schema, rows))
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+_ENCODERS = {"csv": _CsvEncoder, "ndjson": _NdjsonEncoder, "parquet": _ParquetEncoder}
+
+
+def _compressor(compression: Optional[str]):
+    if compression == "gzip":
+        return zlib.compressobj(wbits=31)  # gzip container
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compressobj()
+    return None
+
+
+def _open_stream(sql: str, block_rows: int):
+    conn = wh_engine.connect()
+    try:
+        result = conn.execution_options(
+            stream_results=True,
+            max_row_buffer=block_rows,
+            settings={"max_execution_time": settings.export_timeout},
+        ).execute(text(sql))
+        return conn, result
+    except Exception:
+        conn.close()
+        raise
+
+
+def _abort(conn, tag: str):
+    kill_query(tag)
+    conn.invalidate()
+
+
+async def stream_export(
+    sql: str,
+    fmt: str,
+    compression: Optional[str] = None,
+    exit_stack: Optional[contextlib.AsyncExitStack] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Stream the full result of `sql` in `fmt`, block by block, so memory stays
+    bounded by EXPORT_BLOCK_ROWS regardless of result size. ClickHouse reads
+    run on the warehouse pool; if the client goes away mid-stream the query
+    is killed and its connection discarded rather than drained.
+
+    `exit_stack` is closed when the stream ends (used to hold the caller's
+    concurrency slot for the duration of the download).
+    """
+    loop = asyncio.get_running_loop()
+    block_rows = settings.export_block_rows
+    tag, tagged_sql = tag_query(sql)
+    compressor = _compressor(compression)
+    conn = None
+    finished = False
+
+    def emit(chunk: bytes) -> bytes:
+        return compressor.compress(chunk) if compressor and chunk else chunk
+
+    try:
+        conn, result = await loop.run_in_executor(
+            wh_executor, _open_stream, tagged_sql, block_rows
+        )
+        encoder = _ENCODERS[fmt](list(result.keys()), cursor_types(result))
+        if chunk := emit(encoder.header()):
+            yield chunk
+        while True:
+            rows = await loop.run_in_executor(wh_executor, result.fetchmany, block_rows)
+            if not rows:
+                break
+            # encoding and compression are CPU work; keep them off the loop
+            chunk = await loop.run_in_executor(
+                wh_executor, lambda: emit(encoder.encode(rows))
+            )
+            if chunk:
+                yield chunk
+        tail = emit(encoder.finish())
+        if compressor:
+            tail += compressor.flush()
+        if tail:
+            yield tail
+        finished = True
+    finally:
+        if conn is not None:
+            if finished:
+                loop.run_in_executor(wh_executor, conn.close)
+            else:
+                # client disconnected or encoding failed: stop the server side
+                # and drop the half-read connection instead of pooling it
+                loop.run_in_executor(None, _abort, conn, tag)
+        if exit_stack is not None:
+            await exit_stack.aclose()
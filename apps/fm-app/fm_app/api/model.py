@@ -279,6 +279,7 @@ class GetRequestModel(BaseModel):
     linked_session_id: Optional[UUID] = None
     query: Optional[GetQueryModel] = None
     view: Optional[View] = None
+    timings: Optional[dict[str, Any]] = None  # per-stage trace summary
 
 
 class UpdateRequestStatusModel(BaseModel):
@@ -352,6 +353,8 @@ class GetDataResponse(BaseModel):
         dict[str, Any]
     ]  # List of dictionaries representing the rows returned by the query
     total_rows: int  # Total number of rows available for the query (for pagination)
+    total_rows_exact: bool = True  # False while the count is still running
+    next_cursor: Optional[str] = None  # set in cursor paging while more rows remain
 
 
 ### Worker Request Models
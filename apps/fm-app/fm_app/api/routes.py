@@ -1,22 +1,41 @@
+import asyncio
 import base64
+import contextlib
+import datetime
+import decimal
 import hashlib
 import json
 import logging
 import os
 import uuid
+from dataclasses import replace
 from uuid import UUID
 
 # TODO: do we need these imports here?
 import plotly.graph_objects as go
-from fastapi import APIRouter, Depends, HTTPException, Query, Security
-from fastapi.responses import FileResponse, JSONResponse, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Security
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.security import HTTPBearer
-from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
+from starlette.background import BackgroundTask
 
 from fm_app.api.auth0 import VerifyGuestToken, VerifyToken
-from fm_app.api.db_session import get_db, wh_session
+from fm_app.api.columnar import ARROW_STREAM_MEDIA_TYPE, arrow_ipc_stream
+from fm_app.api.data_cache import CachedPage, data_page_cache
+from fm_app.api.db_session import get_db
+from fm_app.api.row_counts import (
+    cached_row_count,
+    remember_row_count,
+    start_row_count,
+)
+from fm_app.api.export import EXPORT_COMPRESSIONS, EXPORT_FORMATS, stream_export
+from fm_app.api.wh_exec import caller_key, run_wh_query, user_limiter
 from fm_app.api.model import (
     AddRequestModel,
     ChartRequest,
@@ -58,9 +77,11 @@ from fm_app.db.db import (
     update_request,
     get_queries,
 )
-from fm_app.stopwatch import stopwatch
+from fm_app.config import get_settings
+from fm_app.tracing import trace_headers
 from fm_app.workers.worker import wrk_add_request
 
+settings = get_settings()
 token_auth_scheme = HTTPBearer()
 auth = VerifyToken()
 guest_auth = VerifyGuestToken()
@@ -119,7 +140,7 @@ def replace_order_by(sql: str, new_order_by: Optional[str]) -> str:
         return sql[: last.start()] + " " + sql[last.end():]
 
 import re
-from typing import Optional, Tuple
+from typing import Any, Optional, Tuple
 
 # Trailing clauses we want to remove from the *inner* query:
 # - final ORDER BY (up to LIMIT/OFFSET/FETCH or end)
@@ -202,6 +223,129 @@ def build_sorted_paginated_sql(
     base += "\nLIMIT :limit\nOFFSET :offset"
     return base
 
+
+def build_export_sql(
+    user_sql: str, *, sort_by: Optional[str], sort_order: str
+) -> str:
+    """Full result, optionally re-sorted on the outer query; no paging."""
+    col = _sanitize_sort_by(sort_by)
+    if not col:
+        return user_sql.strip().rstrip(";")
+    body = _strip_final_order_by_and_trailing(user_sql)
+    direction = "ASC" if sort_order.lower() == "asc" else "DESC"
+    return f"SELECT t.* FROM (\n{body}\n) AS t\nORDER BY t.{col} {direction}"
+
+
+def build_count_sql(user_sql: str) -> str:
+    body = _strip_final_order_by_and_trailing(user_sql)
+    return f"SELECT COUNT(*) AS count FROM (\n{body}\n) AS t"
+
+
+ROW_KEY = "_row_key"
+
+
+def build_keyset_paginated_sql(
+    user_sql: str,
+    *,
+    sort_by: str,
+    sort_order: str,  # 'asc' | 'desc'
+    tiebreak: Optional[str] = None,
+    after_cursor: bool = False,
+    include_total_count: bool = False,
+) -> Optional[str]:
+    """
+    Keyset variant of build_sorted_paginated_sql: pages with
+    `WHERE (sort_col, row_key) > (:cursor_value, :cursor_key)` instead of
+    OFFSET, so deep pages cost the same as the first one.
+
+    `row_key` is the `tiebreak` column, which must be unique: rows with equal
+    keys on a page boundary would be skipped by the strict seek. Returns None
+    when the sort or tiebreak column is missing or not usable, in which case
+    the caller falls back to offset paging.
+    """
+    col = _sanitize_sort_by(sort_by)
+    tb = _sanitize_sort_by(tiebreak) if tiebreak else None
+    if not col or not tb:
+        return None
+
+    body = _strip_final_order_by_and_trailing(user_sql)
+    row_key = f"t.{tb}"
+    total_count = ", COUNT(*) OVER () AS total_count" if include_total_count else ""
+    op, direction = (">", "ASC") if sort_order.lower() == "asc" else ("<", "DESC")
+
+    base = f"""
+        SELECT *
+        FROM (
+            SELECT t.*, {row_key} AS {ROW_KEY}{total_count}
+            FROM (
+            {body}
+            ) AS t
+        ) AS k
+    """
+    if after_cursor:
+        base += f"\nWHERE (k.{col}, k.{ROW_KEY}) {op} (:cursor_value, :cursor_key)"
+    base += f"\nORDER BY k.{col} {direction}, k.{ROW_KEY} {direction}"
+    base += "\nLIMIT :limit"
+    return base
+
+
+# values JSON can't carry as-is travel as [type tag, text] and are rebuilt on
+# decode, so the seek predicate binds a Decimal/DateTime, not a string
+_CURSOR_TYPES = {
+    "decimal": (decimal.Decimal, str, decimal.Decimal),
+    "datetime": (
+        datetime.datetime,
+        datetime.datetime.isoformat,
+        datetime.datetime.fromisoformat,
+    ),
+    "date": (datetime.date, datetime.date.isoformat, datetime.date.fromisoformat),
+    "uuid": (UUID, str, UUID),
+}
+
+
+def _encode_cursor_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    # datetime before date: it is a date subclass
+    for tag, (type_, dump, _) in _CURSOR_TYPES.items():
+        if isinstance(value, type_):
+            return [tag, dump(value)]
+    return ["str", str(value)]
+
+
+def _decode_cursor_value(value: Any) -> Any:
+    if not isinstance(value, list):
+        return value
+    tag, text = value
+    if tag == "str":
+        return text
+    return _CURSOR_TYPES[tag][2](text)
+
+
+def encode_cursor(sort_by: str, sort_order: str, row: dict) -> str:
+    """Opaque cursor: the last row's sort value and row key, base64url JSON."""
+    values = [
+        _encode_cursor_value(row.get(sort_by)),
+        _encode_cursor_value(row.get(ROW_KEY)),
+    ]
+    raw = json.dumps({"s": sort_by, "o": sort_order, "v": values})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> Tuple[Any, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded))
+        value, key = (_decode_cursor_value(v) for v in data["v"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Malformed cursor")
+    if data.get("s") != sort_by or data.get("o") != sort_order:
+        raise HTTPException(
+            status_code=400, detail="Cursor does not match the current sort"
+        )
+    return value, key
+
+
 async def verify_any_token(
     guest: dict = Depends(guest_auth.verify), user: dict = Depends(auth.verify)
 ):
@@ -237,6 +381,24 @@ def compute_etag(payload: dict) -> str:
     raw = json.dumps(payload, sort_keys=True, default=str)
     return f'W/"{hashlib.sha256(raw.encode()).hexdigest()}"'
 
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check with weak comparison, as RFC 9110 asks for GET."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def estimate_nbytes(page: CachedPage) -> int:
+    return len(json.dumps(page.data.data, default=str))
+
+
 @api_router.post("/session")
 async def create_session(
     session: CreateSessionModel,
@@ -334,9 +496,6 @@ async def create_request(
         user_owner=user_owner, session_id=session_id, add_req=user_request, db=db
     )
 
-    stopwatch.reset()
-    print(">>> API CALL", stopwatch.lap())
-
     wrk_req = WorkerRequest(
         session_id=session_id,
         request_id=response.request_id,
@@ -351,7 +510,9 @@ async def create_request(
         refs=user_request.refs,
     )
     wrk_arg = wrk_req.model_dump()
-    task = wrk_add_request.apply_async(args=[wrk_arg], task_id=task_id)
+    task = wrk_add_request.apply_async(
+        args=[wrk_arg], task_id=task_id, headers=trace_headers()
+    )
     logging.info("Send task", extra={"action": "send_task", "task_id": task})
 
     return response
@@ -396,7 +557,9 @@ async def create_request_for_query(
         query=query,
     )
     wrk_arg = wrk_req.model_dump()
-    task = wrk_add_request.apply_async(args=[wrk_arg], task_id=task_id)
+    task = wrk_add_request.apply_async(
+        args=[wrk_arg], task_id=task_id, headers=trace_headers()
+    )
     logging.info("Send task", extra={"action": "send_task", "task_id": task})
 
     return response
@@ -506,7 +669,9 @@ async def create_request_from_query(
     )
 
     wrk_arg = wrk_req.model_dump()
-    task = wrk_add_request.apply_async(args=[wrk_arg], task_id=task_id)
+    task = wrk_add_request.apply_async(
+        args=[wrk_arg], task_id=task_id, headers=trace_headers()
+    )
     logging.info("Send task for request from query", extra={"action": "send_task", "task_id": task, "query_id": query_id})
 
     return response
@@ -568,7 +733,9 @@ async def create_linked_session_request(
             refs=linked_request.refs,
         )
         wrk_arg = wrk_req.model_dump()
-        task = wrk_add_request.apply_async(args=[wrk_arg], task_id=task_id)
+        task = wrk_add_request.apply_async(
+            args=[wrk_arg], task_id=task_id, headers=trace_headers()
+        )
         logging.info("Send task", extra={"action": "send_task", "task_id": task})
         response.session = session_response
         return response
@@ -849,21 +1016,32 @@ async def get_all_queries(
 @api_router.get("/data/{query_id}")
 async def get_query_data(
     query_id: UUID,
+    request: Request,
     limit: int = 100,
     offset: int = 0,
     sort_by: Optional[str] = None,
     sort_order: str = Query("asc", regex="^(asc|desc)$"),
+    paging: str = Query("offset", regex="^(offset|cursor)$"),
+    cursor: Optional[str] = None,
+    tiebreak: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ) -> Response:
+    """
+    One grid page. `paging=cursor` (or passing a `cursor`) switches to keyset
+    paging on `sort_by` and the unique `tiebreak` column; each page then
+    returns `next_cursor`. Without both, queries fall back to LIMIT/OFFSET.
+    """
     original_sql = ""
     sql = ""
     current_view = View(sort_by=sort_by, sort_order=sort_order) if sort_by else None
 
     # Step 1: Fetch SQL from QueryMetadata store
+    stored_row_count = None
     query_response = await get_query_by_id(query_id=query_id, db=db)
     if query_response:
         sql = query_response.sql if query_response.sql else ""
         sql = sql.strip().rstrip(";")
+        stored_row_count = query_response.row_count
         # since we don't have any context except query_id, we don't store View
 
     else:
@@ -874,6 +1052,7 @@ async def get_query_data(
             if request_response.query:
                 sql = request_response.query.sql if request_response.query.sql else ""
                 sql = sql.strip().rstrip(";")
+                stored_row_count = request_response.query.row_count
                 current_view = (
                     request_response.view if request_response.view else current_view
                 )
@@ -907,6 +1086,7 @@ async def get_query_data(
                     )
 
                 sql = session_response.metadata.get("sql", "").strip().rstrip(";")
+                stored_row_count = session_response.metadata.get("row_count")
                 # Determine whether to update stored SQL
                 if sort_by:
                     saved_view = session_response.metadata.get("view")
@@ -947,7 +1127,45 @@ async def get_query_data(
     if not sql:
         raise HTTPException(status_code=400, detail="Query has no SQL attached")
 
-    # Step 3: Execute count and main query
+    keyset_sql = None
+    params = {"limit": limit, "offset": offset}
+    if paging == "cursor" or cursor:
+        keyset_sql = build_keyset_paginated_sql(
+            sql,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            tiebreak=tiebreak,
+            after_cursor=bool(cursor),
+        )
+    if keyset_sql:
+        sort_col = _sanitize_sort_by(sort_by)
+        if cursor:
+            value, key = decode_cursor(cursor, sort_col, sort_order)
+            params.update({"cursor_value": value, "cursor_key": key})
+    else:
+        cursor = None  # offset fallback for unsortable queries
+
+    # Step 2: Total rows come from the stored/cached count, never from the page
+    # query; when unknown, count once in the background
+    sql_hash = compute_sql_hash(sql)
+    remember_row_count(sql_hash, stored_row_count)
+    count_task = None
+    if cached_row_count(sql_hash) is None:
+        count_task = start_row_count(sql_hash, build_count_sql(sql))
+
+    # Step 3: Serve the page from the result cache when we can
+    cache_key = data_page_cache.key(
+        sql_hash,
+        sort_by,
+        sort_order,
+        limit,
+        offset,
+        cursor=f"{tiebreak or ''}:{cursor or ''}" if keyset_sql else None,
+    )
+    page = data_page_cache.get(cache_key)
+    cache_status = "HIT" if page else "MISS"
+
+    # Step 4: Execute the page query
     # count_sql = f"SELECT count(*) FROM ({sql}) AS subquery;"
     # query_sql = f"SELECT * FROM ({sql}) AS subquery LIMIT :limit OFFSET :offset"
     # combined_sql = f"""
@@ -958,70 +1176,202 @@ async def get_query_data(
     #    LIMIT :limit
     #    OFFSET :offset
     # """
-    combined_sql = build_sorted_paginated_sql(
-        sql,
-        sort_by=sort_by,
-        sort_order=sort_order,
-        include_total_count=True,     # or False if you don't need it
-    )
-    # print('SQL', combined_sql)
+    if page is None:
+        combined_sql = keyset_sql or build_sorted_paginated_sql(
+            sql,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            include_total_count=False,
+        )
+        # print('SQL', combined_sql)
 
-    with wh_session() as session:
         try:
-            result = session.execute(
-                text(combined_sql),
-                {
-                    "limit": limit,
-                    "offset": offset,
-                },
+            result = await run_wh_query(
+                combined_sql, params, request=request, columnar=True
             )
-            rows = result.mappings().fetchall()
-
-            if rows:
-                total_count = rows[0]["total_count"]
-            else:
-                total_count = 0
-
-            payload = GetDataResponse(
-                query_id=query_id,
-                limit=limit,
-                offset=offset,
-                rows=[{k: v for k, v in row.items() if k != "total_count"} for row in
-                      rows],
-                total_rows=total_count,
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Error executing query: {str(e)}"
             )
 
-            # Make a stable ETag
-            etag = compute_etag({
-                "query_id": str(query_id),
-                "limit": limit,
-                "offset": offset,
-                "total_rows": total_count,
-                # Fingerprint first/last row only to avoid huge hashes
-                "rows_fp": hashlib.sha256(
-                    json.dumps({
-                        "first": payload.rows[0] if payload.rows else None,
-                        "last": payload.rows[-1] if payload.rows else None,
-                    }, sort_keys=True, default=str).encode()
-                ).hexdigest(),
-            })
-
-            headers = {
-                "ETag": etag,
-                "Cache-Control": "public, max-age=0, s-maxage=600, stale-while-revalidate=1200",
-                "Vary": "Authorization, Accept, Accept-Encoding",
-            }
+        num_rows = result.num_rows
+        # a short offset page tells us the exact total for free; an empty page
+        # past the end only says the total is at most `offset`. Keyset pages
+        # ignore `offset` and don't know how many rows precede them.
+        if not keyset_sql and num_rows < limit and (num_rows > 0 or offset == 0):
+            remember_row_count(sql_hash, offset + num_rows)
+
+        next_cursor = None
+        if keyset_sql and num_rows == limit:
+            last_row = result.row(-1)
+            # a NULL sort value can't be compared past; paging ends there
+            if last_row[sort_col] is not None:
+                next_cursor = encode_cursor(sort_col, sort_order, last_row)
+
+        result = result.drop({ROW_KEY})
+        edge_rows = [result.row(0), result.row(-1)] if num_rows else []
+        page = CachedPage(
+            data=result,
+            # Fingerprint first/last row only to avoid huge hashes
+            rows_fp=compute_rows_fingerprint(edge_rows),
+            nbytes=0,
+            next_cursor=next_cursor,
+        )
 
-            return Response(
-                content=payload.model_dump_json(),  # v1: payload.json()
-                media_type="application/json",
-                headers=headers,
+    total_rows = cached_row_count(sql_hash)
+    if total_rows is None and count_task is not None:
+        try:
+            total_rows = await asyncio.wait_for(
+                asyncio.shield(count_task), settings.data_count_wait
             )
+        except asyncio.TimeoutError:
+            pass
+    total_rows_exact = total_rows is not None
+    if not total_rows_exact:
+        # lower bound until the count lands; a full page means there is more
+        num_rows = page.data.num_rows
+        skipped = 0 if keyset_sql else offset
+        total_rows = skipped + num_rows + (1 if num_rows == limit else 0)
+
+    # Make a stable ETag
+    etag_fields = {
+        "query_id": str(query_id),
+        "limit": limit,
+        "offset": offset,
+        "total_rows": total_rows,
+        "rows_fp": page.rows_fp,
+    }
+    if keyset_sql:
+        etag_fields["cursor"] = cursor
+    wants_arrow = ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", "")
+    if wants_arrow:
+        etag_fields["format"] = "arrow"
+    etag = compute_etag(etag_fields)
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=0, s-maxage=600, stale-while-revalidate=1200",
+        "Vary": "Authorization, Accept, Accept-Encoding",
+        "X-Cache": cache_status,
+    }
+    if not total_rows_exact:
+        # don't let shared caches pin the estimated total
+        headers["Cache-Control"] = "no-cache"
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        if cache_status == "MISS":
+            data_page_cache.set(cache_key, replace(page, nbytes=estimate_nbytes(page)))
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if wants_arrow:
+        # columnar body; the pagination fields travel in headers instead
+        content = arrow_ipc_stream(page.data)
+        media_type = ARROW_STREAM_MEDIA_TYPE
+        headers["X-Total-Rows"] = str(total_rows)
+        headers["X-Total-Rows-Exact"] = "true" if total_rows_exact else "false"
+        if page.next_cursor:
+            headers["X-Next-Cursor"] = page.next_cursor
+    else:
+        payload = GetDataResponse(
+            query_id=query_id,
+            limit=limit,
+            offset=offset,
+            rows=page.data.to_dicts(),
+            total_rows=total_rows,
+            total_rows_exact=total_rows_exact,
+            next_cursor=page.next_cursor,
+        )
+        content = payload.model_dump_json()  # v1: payload.json()
+        media_type = "application/json"
+    if cache_status == "MISS":
+        data_page_cache.set(cache_key, replace(page, nbytes=len(content)))
+
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers=headers,
+    )
 
-        except Exception as e:
-            raise HTTPException(
-                status_code=500, detail=f"Error executing query: {str(e)}"
-            )
+
+async def resolve_query_sql(query_id: UUID, db: AsyncSession) -> str:
+    """SQL behind a query, request or session id (same lookup order as /data)."""
+    query_response = await get_query_by_id(query_id=query_id, db=db)
+    if query_response:
+        sql = query_response.sql or ""
+    else:
+        request_response = await get_request_by_id(
+            request_id=query_id, db=db, user_owner=""
+        )
+        if request_response:
+            if not request_response.query:
+                raise HTTPException(
+                    status_code=400, detail="Query not found in request"
+                )
+            sql = request_response.query.sql or ""
+        else:
+            session_response = await get_session_by_id(session_id=query_id, db=db)
+            if not session_response:
+                raise HTTPException(status_code=404, detail="Query not found")
+            if not session_response.metadata:
+                raise HTTPException(
+                    status_code=400, detail="No metadata found in session"
+                )
+            sql = session_response.metadata.get("sql", "")
+
+    sql = sql.strip().rstrip(";")
+    if not sql:
+        raise HTTPException(status_code=400, detail="Query has no SQL attached")
+    return sql
+
+
+@api_router.get("/data/{query_id}/export")
+async def export_query_data(
+    query_id: UUID,
+    request: Request,
+    format: str = Query("csv", regex="^(csv|ndjson|parquet)$"),
+    compression: Optional[str] = Query(None, regex="^(gzip|zstd)$"),
+    sort_by: Optional[str] = None,
+    sort_order: str = Query("asc", regex="^(asc|desc)$"),
+    db: AsyncSession = Depends(get_db),
+) -> StreamingResponse:
+    """
+    Stream the whole result set of a query as CSV, NDJSON or Parquet,
+    optionally gzip/zstd compressed. Memory use is bounded by the block size,
+    not the result size.
+    """
+    sql = await resolve_query_sql(query_id, db)
+    export_sql = build_export_sql(sql, sort_by=sort_by, sort_order=sort_order)
+
+    media_type, extension = EXPORT_FORMATS[format]
+    if compression:
+        media_type, suffix = EXPORT_COMPRESSIONS[compression]
+        extension = f"{extension}.{suffix}"
+
+    # the download holds one of the caller's warehouse slots until it ends.
+    # The stream releases it when it finishes; the background task covers a
+    # client that went away before the body started, when the generator never
+    # runs (closing the stack twice is a no-op).
+    exit_stack = contextlib.AsyncExitStack()
+    await exit_stack.enter_async_context(user_limiter.slot(caller_key(request)))
+
+    return StreamingResponse(
+        stream_export(export_sql, format, compression, exit_stack=exit_stack),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{query_id}.{extension}"',
+            "Cache-Control": "no-store",
+        },
+        background=BackgroundTask(exit_stack.aclose),
+    )
+
+
+@api_router.get("/stats/data_cache")
+async def get_data_cache_stats(
+    auth_result: dict = Depends(verify_any_token),
+) -> dict:
+    return data_page_cache.stats()
 
 
 @api_router.get("/query/{query_id}")
@@ -0,0 +1,50 @@
+import asyncio
+import logging
+from typing import Optional
+
+from cachetools import TTLCache
+
+from fm_app.api.wh_exec import run_wh_query
+from fm_app.config import get_settings
+
+settings = get_settings()
+
+# sql hash -> total rows, shared by every page and sort order of that SQL
+_counts: TTLCache = TTLCache(
+    maxsize=settings.data_count_cache_size, ttl=settings.data_cache_ttl
+)
+_pending: dict[str, asyncio.Task] = {}
+
+
+def cached_row_count(sql_hash: str) -> Optional[int]:
+    return _counts.get(sql_hash)
+
+
+def remember_row_count(sql_hash: str, count: Optional[int]):
+    if count is not None:
+        _counts[sql_hash] = count
+
+
+async def _count(sql_hash: str, count_sql: str) -> Optional[int]:
+    try:
+        rows = await run_wh_query(count_sql, {}, request=None)
+        count = rows[0]["count"] if rows else 0
+        remember_row_count(sql_hash, count)
+        return count
+    except Exception as e:
+        logging.warning("Row count failed", extra={"error": str(e)})
+        return None
+    finally:
+        _pending.pop(sql_hash, None)
+
+
+def start_row_count(sql_hash: str, count_sql: str) -> asyncio.Task:
+    """
+    Count rows in the background, once per SQL hash: concurrent pages of the
+    same query join the task that is already running.
+    """
+    task = _pending.get(sql_hash)
+    if task is None:
+        task = asyncio.create_task(_count(sql_hash, count_sql))
+        _pending[sql_hash] = task
+    return task
@@ -0,0 +1,74 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from fm_app.api.columnar import ColumnarResult
+from fm_app.api.data_cache import CachedPage, DataPageCache
+
+
+def page(nbytes: int, next_cursor=None) -> CachedPage:
+    data = ColumnarResult(columns=["id"], types=["Int64"], data=[[1, 2]])
+    return CachedPage(data=data, rows_fp="fp", nbytes=nbytes, next_cursor=next_cursor)
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture
+def cache():
+    cache = DataPageCache(max_bytes=100, ttl=60)
+    yield cache
+    cache.clear()
+
+
+def test_key_normalizes_sort_and_separates_paging():
+    key = DataPageCache.key
+    assert key("h", "id", "ASC", 100, 0) == key("h", "id", "asc", 100, 0)
+    assert key("h", None, None, 100, 0) == key("h", "", "", 100, 0)
+    assert key("h", "id", "asc", 100, 0) != key("h", "id", "asc", 100, 100)
+    assert key("h", "id", "asc", 100, 0) != key("h", "id", "asc", 50, 0)
+    # a cursor page never collides with an offset page
+    assert key("h", "id", "asc", 100, 0, cursor="id:") != key("h", "id", "asc", 100, 0)
+    assert key("h", "id", "asc", 100, 0, cursor="id:a") != key(
+        "h", "id", "asc", 100, 0, cursor="id:b"
+    )
+
+
+def test_hits_misses_and_bytes(cache):
+    assert cache.get(("a",)) is None
+    cache.set(("a",), page(30))
+    cache.set(("b",), page(20))
+    assert cache.get(("a",)).nbytes == 30
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+    assert (stats["entries"], stats["bytes"], stats["max_bytes"]) == (2, 50, 100)
+
+
+def test_least_recently_used_pages_are_evicted_by_bytes(cache):
+    cache.set(("a",), page(40))
+    cache.set(("b",), page(40))
+    cache.get(("a",))
+    cache.set(("c",), page(40))
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) is not None and cache.get(("c",)) is not None
+    assert cache.stats()["bytes"] == 80
+
+
+def test_oversized_page_is_not_cached(cache):
+    cache.set(("a",), page(40))
+    cache.set(("huge",), page(101))
+    assert cache.get(("huge",)) is None
+    assert cache.get(("a",)) is not None
+
+
+def test_metrics_follow_the_cache(cache):
+    hits = sample("fm_data_cache_lookups_total", result="hit")
+    misses = sample("fm_data_cache_lookups_total", result="miss")
+    cache.set(("a",), page(30))
+    cache.get(("a",))
+    cache.get(("b",))
+    assert sample("fm_data_cache_lookups_total", result="hit") == hits + 1
+    assert sample("fm_data_cache_lookups_total", result="miss") == misses + 1
+    assert sample("fm_data_cache_bytes") == 30
+    cache.clear()
+    assert sample("fm_data_cache_bytes") == 0
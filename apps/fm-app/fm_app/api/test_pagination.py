@@ -0,0 +1,266 @@
+import asyncio
+import datetime
+import decimal
+import json
+from types import SimpleNamespace
+from uuid import UUID, uuid4
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from fm_app.api import routes
+from fm_app.api.columnar import ColumnarResult
+from fm_app.api.data_cache import data_page_cache
+from fm_app.api.routes import (
+    ROW_KEY,
+    build_keyset_paginated_sql,
+    decode_cursor,
+    encode_cursor,
+    etag_matches,
+)
+
+TRADES = list(range(10))  # one `id` column, unique and sorted
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        None,
+        42,
+        1.5,
+        "abc",
+        decimal.Decimal("12.3400"),
+        datetime.datetime(2026, 10, 18, 9, 30, 15, 120),
+        datetime.date(2026, 10, 18),
+        UUID("6f1c2b7e-3d4a-4f5b-8c9d-0e1f2a3b4c5d"),
+    ],
+)
+def test_cursor_round_trip_keeps_the_type(value):
+    cursor = encode_cursor("price", "desc", {"price": value, ROW_KEY: 7})
+    decoded, key = decode_cursor(cursor, "price", "desc")
+    assert decoded == value
+    assert type(decoded) is type(value)
+    assert key == 7
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor("name", "asc", {"name": "ä/+?" * 10, ROW_KEY: 1})
+    assert "=" not in cursor
+    assert "/" not in cursor and "+" not in cursor
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(HTTPException) as e:
+        decode_cursor("not a cursor", "price", "asc")
+    assert e.value.status_code == 400
+
+
+def test_cursor_of_another_sort_is_rejected():
+    cursor = encode_cursor("price", "asc", {"price": 1, ROW_KEY: 1})
+    for sort_by, sort_order in [("volume", "asc"), ("price", "desc")]:
+        with pytest.raises(HTTPException) as e:
+            decode_cursor(cursor, sort_by, sort_order)
+        assert e.value.status_code == 400
+
+
+def test_keyset_sql_needs_a_tiebreak():
+    sql = "SELECT id, price FROM trades ORDER BY price"
+    assert build_keyset_paginated_sql(sql, sort_by="price", sort_order="asc") is None
+    assert (
+        build_keyset_paginated_sql(
+            sql, sort_by="price", sort_order="asc", tiebreak="1; DROP TABLE x"
+        )
+        is None
+    )
+
+
+@pytest.mark.parametrize(
+    "sort_order, op, direction", [("asc", ">", "ASC"), ("desc", "<", "DESC")]
+)
+def test_keyset_sql_seeks_past_the_cursor(sort_order, op, direction):
+    sql = build_keyset_paginated_sql(
+        "SELECT id, price FROM trades ORDER BY price;",
+        sort_by="price",
+        sort_order=sort_order,
+        tiebreak="id",
+        after_cursor=True,
+    )
+    assert f"t.id AS {ROW_KEY}" in sql
+    assert f"(k.price, k.{ROW_KEY}) {op} (:cursor_value, :cursor_key)" in sql
+    assert f"ORDER BY k.price {direction}, k.{ROW_KEY} {direction}" in sql
+    assert "OFFSET" not in sql
+    # the user's own ORDER BY is replaced, not nested
+    assert "ORDER BY price" not in sql
+
+
+def test_first_keyset_page_has_no_seek():
+    sql = build_keyset_paginated_sql(
+        "SELECT id FROM trades", sort_by="id", sort_order="asc", tiebreak="id"
+    )
+    assert ":cursor_value" not in sql
+
+
+@pytest.mark.parametrize(
+    "if_none_match, matches",
+    [
+        (None, False),
+        ("", False),
+        ("*", True),
+        ('W/"abc"', True),
+        ('"abc"', True),  # weak comparison ignores the W/ prefix
+        ('"xyz", W/"abc"', True),
+        ('"xyz"', False),
+        ('"ab"', False),
+    ],
+)
+def test_etag_matches(if_none_match, matches):
+    assert etag_matches(if_none_match, 'W/"abc"') is matches
+
+
+@pytest.fixture
+def warehouse(monkeypatch):
+    """get_query_data over TRADES, with the count never landing."""
+    counts = {}
+
+    async def get_query_by_id(query_id, db):
+        return SimpleNamespace(sql="SELECT id FROM trades", row_count=None)
+
+    async def run_wh_query(sql, params, request=None, columnar=False):
+        if "cursor_value" in params:
+            rows = [r for r in TRADES if r > params["cursor_value"]]
+        elif ROW_KEY in sql:
+            rows = TRADES
+        else:
+            rows = TRADES[params["offset"] :]
+        rows = rows[: params["limit"]]
+        if ROW_KEY in sql:
+            return ColumnarResult(["id", ROW_KEY], ["Int64", "Int64"], [rows, rows])
+        return ColumnarResult(["id"], ["Int64"], [rows])
+
+    def remember_row_count(sql_hash, count):
+        if count is not None:
+            counts[sql_hash] = count
+
+    def start_row_count(sql_hash, count_sql):
+        pending = asyncio.get_running_loop().create_future()
+        pending.set_result(None)
+        return pending
+
+    monkeypatch.setattr(routes, "get_query_by_id", get_query_by_id)
+    monkeypatch.setattr(routes, "run_wh_query", run_wh_query)
+    monkeypatch.setattr(routes, "start_row_count", start_row_count)
+    monkeypatch.setattr(routes, "cached_row_count", counts.get)
+    monkeypatch.setattr(routes, "remember_row_count", remember_row_count)
+    data_page_cache.clear()
+    yield SimpleNamespace(counts=counts)
+    data_page_cache.clear()
+
+
+# the module-level name is taken by the /query/{query_id} handler
+get_query_data = next(
+    route.endpoint
+    for route in routes.api_router.routes
+    if route.path.endswith("/data/{query_id}")
+)
+
+
+def request(**headers) -> Request:
+    raw = [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+async def get_page(query_id, limit=3, offset=0, cursor=None, paging="offset", **h):
+    return await get_query_data(
+        query_id=query_id,
+        request=request(**h),
+        limit=limit,
+        offset=offset,
+        sort_by="id",
+        sort_order="asc",
+        paging=paging,
+        cursor=cursor,
+        tiebreak="id",
+        db=None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_short_offset_page_gives_the_exact_total(warehouse):
+    body = json.loads((await get_page(uuid4(), limit=4, offset=8)).body)
+    assert [row["id"] for row in body["rows"]] == [8, 9]
+    assert (body["total_rows"], body["total_rows_exact"]) == (10, True)
+
+
+@pytest.mark.asyncio
+async def test_empty_page_past_the_end_is_not_a_total(warehouse):
+    body = json.loads((await get_page(uuid4(), limit=4, offset=40)).body)
+    assert body["rows"] == []
+    assert warehouse.counts == {}
+    assert body["total_rows_exact"] is False
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_ignore_offset(warehouse):
+    query_id = uuid4()
+    # a stray offset next to paging=cursor must not shift the estimate
+    body = json.loads((await get_page(query_id, offset=6, paging="cursor")).body)
+    assert [row["id"] for row in body["rows"]] == [0, 1, 2]
+    assert (body["total_rows"], body["total_rows_exact"]) == (4, False)
+
+    cursor, seen = body["next_cursor"], [0, 1, 2]
+    while cursor:
+        response = await get_page(query_id, offset=6, cursor=cursor, paging="cursor")
+        body = json.loads(response.body)
+        seen += [row["id"] for row in body["rows"]]
+        cursor = body["next_cursor"]
+    assert seen == TRADES
+    # the short last page doesn't know how many rows came before it
+    assert body["total_rows"] == 1
+    assert warehouse.counts == {}
+
+
+@pytest.mark.asyncio
+async def test_matching_etag_gets_not_modified(warehouse):
+    query_id = uuid4()
+    first = await get_page(query_id, limit=4, offset=8)
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+
+    again = await get_page(query_id, limit=4, offset=8, if_none_match=etag)
+    assert again.status_code == 304
+    assert again.body == b""
+    assert (again.headers["etag"], again.headers["x-cache"]) == (etag, "HIT")
+
+    stale = await get_page(query_id, limit=4, offset=8, if_none_match='W/"old"')
+    assert stale.status_code == 200 and stale.body == first.body
+
+
+@pytest.mark.asyncio
+async def test_etag_differs_per_page_and_format(warehouse):
+    query_id = uuid4()
+    page_1 = await get_page(query_id, limit=4, offset=0)
+    page_2 = await get_page(query_id, limit=4, offset=4)
+    assert page_1.headers["etag"] != page_2.headers["etag"]
+    # the JSON validator must not revalidate an Arrow body, or the reverse
+    arrow = await get_page(
+        query_id,
+        limit=4,
+        offset=0,
+        accept=routes.ARROW_STREAM_MEDIA_TYPE,
+        if_none_match=page_1.headers["etag"],
+    )
+    assert arrow.status_code == 200
+    assert arrow.headers["etag"] != page_1.headers["etag"]
+
+
+@pytest.mark.asyncio
+async def test_not_modified_on_a_miss_still_fills_the_cache(warehouse):
+    query_id = uuid4()
+    etag = (await get_page(query_id, limit=4, offset=8)).headers["etag"]
+    data_page_cache.clear()
+
+    revalidated = await get_page(query_id, limit=4, offset=8, if_none_match=etag)
+    assert (revalidated.status_code, revalidated.headers["x-cache"]) == (304, "MISS")
+    hit = await get_page(query_id, limit=4, offset=8)
+    assert (hit.status_code, hit.headers["x-cache"]) == (200, "HIT")
@@ -0,0 +1,197 @@
+import asyncio
+import contextlib
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+import jwt
+from fastapi import HTTPException, Request
+from sqlalchemy import text
+
+from fm_app.api.columnar import ColumnarResult, cursor_types
+from fm_app.api.db_session import wh_engine, wh_session
+from fm_app.config import get_settings
+from fm_app.metrics import observe_wh_rows
+from fm_app.tracing import traced
+
+settings = get_settings()
+
+# Warehouse queries for API routes run here, never on the event loop. Keep it
+# below the wh_engine pool size so threads never queue on connection checkout.
+wh_executor = ThreadPoolExecutor(
+    max_workers=settings.wh_query_workers, thread_name_prefix="wh-query"
+)
+
+
+class UserConcurrencyLimiter:
+    """Caps in-flight warehouse queries per caller so one dashboard can't take
+    the whole pool. Semaphores are dropped once a caller goes idle."""
+
+    def __init__(self, limit: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._users: dict[str, int] = {}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, key: str):
+        semaphore = self._semaphores.setdefault(key, asyncio.Semaphore(self.limit))
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise HTTPException(
+                    status_code=429, detail="Too many concurrent queries"
+                )
+            try:
+                yield
+            finally:
+                semaphore.release()
+        finally:
+            self._users[key] -= 1
+            if self._users[key] == 0:
+                del self._users[key]
+                del self._semaphores[key]
+
+
+user_limiter = UserConcurrencyLimiter(
+    limit=settings.wh_user_concurrency,
+    queue_timeout=settings.wh_user_queue_timeout,
+)
+
+
+def caller_key(request: Request) -> str:
+    """
+    Fairness key for the per-user limit: the token subject when a bearer token
+    is present, else the client address. The token is not verified here; it is
+    only used to bucket load, never to grant access.
+    """
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            claims = jwt.decode(authorization[7:], options={"verify_signature": False})
+            if claims.get("sub"):
+                return f"sub:{claims['sub']}"
+        except jwt.exceptions.PyJWTError:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def tag_query(sql: str) -> tuple[str, str]:
+    """Prefix `sql` with a unique comment that `kill_query` can find."""
+    tag = f"fm_app:{uuid.uuid4().hex}"
+    return tag, f"/* {tag} */ {sql}"
+
+
+def _execute(sql: str, params: dict[str, Any], timeout: int) -> list[dict]:
+    with wh_session() as session:
+        result = session.execute(
+            text(sql),
+            params,
+            # ClickHouse aborts the query server-side past the deadline too
+            execution_options={"settings": {"max_execution_time": timeout}},
+        )
+        return [dict(row) for row in result.mappings().fetchall()]
+
+
+def _execute_columnar(sql: str, params: dict[str, Any], timeout: int) -> ColumnarResult:
+    # straight to clickhouse_driver: columnar blocks come back as-is, without
+    # building a Row per record
+    statement = str(text(sql).compile(dialect=wh_engine.dialect))
+    with wh_engine.connect() as conn:
+        # the native client isn't part of the DBAPI, so any other driver
+        # (HTTP, a local DuckDB) or driver version takes the row path
+        client = getattr(conn.connection.dbapi_connection, "transport", None)
+        if not callable(getattr(client, "execute", None)):
+            result = conn.execute(
+                text(sql),
+                params,
+                execution_options={"settings": {"max_execution_time": timeout}},
+            )
+            columns = list(result.keys())
+            # only ClickHouse type names carry over; others map to strings
+            types = [t if isinstance(t, str) else None for t in cursor_types(result)]
+            types = types or [None] * len(columns)
+            rows = result.fetchall()
+            values = [list(col) for col in zip(*rows)] if rows else []
+            return ColumnarResult(
+                columns=columns, types=types, data=values or [[] for _ in columns]
+            )
+        data, columns_with_types = client.execute(
+            statement,
+            params,
+            with_column_types=True,
+            columnar=True,
+            settings={"max_execution_time": timeout},
+        )
+    columns = [name for name, _ in columns_with_types]
+    types = [type_ for _, type_ in columns_with_types]
+    values = [list(col) for col in data] if data else [[] for _ in columns]
+    return ColumnarResult(columns=columns, types=types, data=values)
+
+
+def kill_query(tag: str):
+    try:
+        with wh_session() as session:
+            session.execute(
+                text("KILL QUERY WHERE query LIKE :pattern ASYNC"),
+                # anchored at the start so the KILL statement can't match itself
+                {"pattern": f"/* {tag} */%"},
+            )
+    except Exception as e:
+        logging.warning("Failed to cancel warehouse query", extra={"error": str(e)})
+
+
+def _abandon(future: asyncio.Future, tag: str):
+    # the worker thread finishes (with an error) once the kill lands; consume
+    # its result so asyncio doesn't log it as never retrieved
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    # default executor: the query pool may be saturated, the kill must not wait
+    asyncio.get_running_loop().run_in_executor(None, kill_query, tag)
+
+
+@traced("wh.api_query")
+async def run_wh_query(
+    sql: str,
+    params: dict[str, Any],
+    *,
+    request: Optional[Request],
+    timeout: Optional[int] = None,
+    columnar: bool = False,
+) -> list[dict] | ColumnarResult:
+    """
+    Execute `sql` on the warehouse pool without blocking the event loop.
+
+    The query is tagged with a unique comment so it can be found in
+    system.processes and killed when the client disconnects or the deadline
+    passes; both surface as HTTP errors (499 / 504). Background work passes
+    `request=None` and skips the per-user limit and disconnect checks.
+    `columnar=True` returns a ColumnarResult instead of row dicts.
+    """
+    timeout = timeout or settings.wh_query_timeout
+    tag, tagged_sql = tag_query(sql)
+    loop = asyncio.get_running_loop()
+
+    limit = (
+        user_limiter.slot(caller_key(request))
+        if request is not None
+        else contextlib.nullcontext()
+    )
+    async with limit:
+        execute = _execute_columnar if columnar else _execute
+        future = loop.run_in_executor(wh_executor, execute, tagged_sql, params, timeout)
+        deadline = loop.time() + timeout
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=0.5)
+            if done:
+                result = future.result()
+                observe_wh_rows(result.num_rows if columnar else len(result))
+                return result
+            if request is not None and await request.is_disconnected():
+                _abandon(future, tag)
+                raise HTTPException(status_code=499, detail="Client disconnected")
+            if loop.time() > deadline:
+                _abandon(future, tag)
+                raise HTTPException(status_code=504, detail="Query timed out")
@@ -2,6 +2,7 @@
 import os
 from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 
 from dotenv import load_dotenv, find_dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -47,8 +48,20 @@ class Settings(BaseSettings):
     auth0_algorithms: str
     log_level: str = "INFO"
     wrk_broker_connection: str = "pyamqp://guest@localhost//"
+    wrk_flow_concurrency: int = 1  # flows per worker process; >1 needs --pool threads
+    wrk_wh_max_overflow: int = 2  # warehouse connections beyond one per flow
+    wrk_metrics_port: int = 9100  # Prometheus exporter of the worker; 0 disables
+    api_metrics_port: int = 9101  # Prometheus exporter of the API; 0 disables
     dbmeta: str
+    dbmeta_mcp_max_sessions: int = 8
+    dbmeta_mcp_keepalive: float = 30.0  # ping sessions idle longer than this
+    dbmeta_mcp_call_timeout: float = 120.0
     dbref: str
+    dbref_connect_timeout: float = 5.0
+    dbref_read_timeout: float = 30.0
+    dbref_max_connections: int = 20
+    dbref_cache_size: int = 1024
+    dbref_cache_ttl: int = 3600
     irl_slots: str
     google_project_id: str
     google_cred_file: str
@@ -68,6 +81,45 @@ class Settings(BaseSettings):
     env: str = "prod"
     system_version: str = "v1.0.0"
     packs_resources_dir: str = "/app/packages"
+    wh_query_workers: int = 32
+    wh_query_timeout: int = 60
+    wh_user_concurrency: int = 4
+    wh_user_queue_timeout: float = 10.0
+    data_cache_max_bytes: int = 256 * 1024 * 1024
+    data_cache_ttl: int = 600  # matches the s-maxage on /data responses
+    data_count_cache_size: int = 4096
+    data_count_wait: float = 1.0  # how long a page waits for a pending count
+    export_block_rows: int = 10_000
+    export_timeout: int = 1800
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry: float = 120.0
+    llm_timeout: float = 600.0
+    llm_http2: bool = True  # only used when the h2 package is installed
+    llm_replay_mode: str = "off"  # off | record | replay, see ai_models/replay.py
+    llm_replay_file: str = "llm_cassette.jsonl"
+    llm_replay_latency: str = "recorded"  # e.g. none, fixed:800, lognormal:800,0.5
+    llm_replay_seed: Optional[int] = None
+    llm_replay_strict: bool = False  # no fallback to other captures of the same kind
+    llm_cache_slots: str = ""  # cached prompt slots, e.g. "planner,linked_query:600"
+    llm_cache_semantic_slots: str = ""  # slots also served for similar requests
+    llm_cache_ttl: int = 86400  # seconds, for slots listed without one
+    llm_cache_store: str = "memory"  # memory | disk | redis
+    llm_cache_max_entries: int = 10_000  # memory store
+    llm_cache_dir: str = "/tmp/fm_llm_cache"  # disk store
+    llm_cache_redis_url: str = "redis://localhost:6379/0"  # redis store
+    llm_cache_semantic_threshold: float = 0.95  # cosine similarity
+    llm_cache_semantic_max_entries: int = 500  # per slot and scope
+    llm_cache_schema_ttl: int = 60  # seconds a db-meta schema fingerprint is reused
+    llm_cache_embedding_model: str = "text-embedding-3-small"
+    llm_cache_embedding_dimensions: int = 256
+    dbmeta_local: bool = False  # in-process db-meta over the local warehouse
+    wh_local_path: Optional[str] = None  # DuckDB file standing in for ClickHouse
+    wh_local_data_dir: Optional[str] = None  # CSV/Parquet files loaded as tables
+    trace_service_name: str = "fm-app"
+    trace_export_file: Optional[str] = None  # OTLP/JSON lines, one trace per line
+    # e.g. http://otel-collector:4318/v1/traces
+    trace_otlp_endpoint: Optional[str] = None
 
 
 @lru_cache()
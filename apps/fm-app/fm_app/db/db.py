@@ -23,6 +23,9 @@ from fm_app.api.model import (
     GetQueryModel,
     UpdateQueryModel,
 )
+from fm_app.db.local_wh import execute_native, is_local
+from fm_app.metrics import observe_wh_rows
+from fm_app.tracing import traced
 
 
 async def add_new_session(
@@ -66,6 +69,7 @@ async def add_new_session(
     return result
 
 
+@traced("pg.get_session_by_id")
 async def get_session_by_id(session_id: UUID, db: AsyncSession) -> GetSessionModel:
     logging.debug(
         "Get session for user",
@@ -181,6 +185,7 @@ async def update_session(
     return result
 
 
+@traced("pg.update_session_name")
 async def update_session_name(
     session_id: UUID, user_owner: str, name: str, db: AsyncSession
 ) -> GetSessionModel:
@@ -216,6 +221,7 @@ async def update_session_name(
     return result
 
 
+@traced("pg.update_query_metadata")
 async def update_query_metadata(
     session_id: UUID, user_owner: str, metadata: dict[str, Any], db: AsyncSession
 ) -> GetSessionModel:
@@ -273,6 +279,7 @@ async def check_session_ownership(session_id: UUID, user_owner: str, db: AsyncSe
         raise HTTPException(status_code=404, detail="Session not found")
 
 
+@traced("pg.add_request")
 async def add_request(
     session_id: UUID, user_owner: str, add_req: AddRequestModel, db: AsyncSession
 ) -> tuple[GetRequestModel, str]:
@@ -597,6 +604,7 @@ async def update_request_failure(
         logging.error(f"SQL execution error {e}")
 
 
+@traced("pg.update_request")
 async def update_request(db: AsyncSession, update: UpdateRequestModel):
     try:
         labels = json.dumps(update.raw_data_labels) if update.raw_data_labels else None
@@ -664,6 +672,7 @@ async def update_request(db: AsyncSession, update: UpdateRequestModel):
         logging.error(f"SQL execution error {e}")
 
 
+@traced("pg.update_request_status")
 async def update_request_status(
     status: RequestStatus,
     err: Optional[str],
@@ -694,6 +703,27 @@ async def update_request_status(
         logging.error(f"SQL execution error {e}")
 
 
+async def update_request_timings(
+    db: AsyncSession, request_id: UUID, timings: dict[str, Any]
+) -> None:
+    try:
+        update_sql = text(
+            """
+            UPDATE request
+            SET timings=:timings
+            WHERE request_id=:request_id;
+        """
+        )
+        await db.execute(
+            update_sql,
+            params={"request_id": request_id, "timings": json.dumps(timings)},
+        )
+        await db.commit()
+
+    except SQLAlchemyError as e:
+        logging.error(f"SQL execution error {e}")
+
+
 async def update_review(
     rating: int, review: str, db: AsyncSession, request_id: UUID, user_owner: str
 ):
@@ -790,11 +820,13 @@ async def delete_request_revert_session(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@traced("wh.query")
 def run_wh_request(request: str, db: Session):
     # try:
     result = db.execute(text(request))
     data = result.mappings().fetchall()
     rows = [dict(row) for row in data]
+    observe_wh_rows(len(rows))
     if len(rows) == 0:
         return None
     output = StringIO()
@@ -812,7 +844,11 @@ def run_wh_request(request: str, db: Session):
 #     logging.error(f"SQL execution error {e}")
 
 
-def run_structured_wh_request_dataframe(request: str, db: Session):
+def _execute_native(request: str, db: Session):
+    """Rows and (name, type) columns, bypassing SQLAlchemy on ClickHouse."""
+    if is_local(db):
+        return execute_native(request, db)
+
     # Extract from SQLAlchemy engine
     url = db.bind.url
 
@@ -830,29 +866,20 @@ def run_structured_wh_request_dataframe(request: str, db: Session):
         },
     )
 
-    rows, columns = client.execute(request, with_column_types=True)
-    return rows, columns
+    return client.execute(request, with_column_types=True)
 
 
-def run_structured_wh_request_native(request: str, db: Session):
-    # Extract from SQLAlchemy engine
-    url = db.bind.url
+@traced("wh.query")
+def run_structured_wh_request_dataframe(request: str, db: Session):
+    rows, columns = _execute_native(request, db)
+    observe_wh_rows(len(rows))
+    return rows, columns
 
-    # Use clickhouse-driver directly
-    client = Client(
-        host=url.host,
-        port=url.port or 9000,
-        user=url.username,
-        password=url.password,
-        database=url.database,
-        settings={
-            "max_execution_time": 300,
-            "max_bytes_before_external_group_by": 1_000_000_000,
-            "max_bytes_before_external_sort": 1_000_000_000,
-        },
-    )
 
-    rows, columns = client.execute(request, with_column_types=True)
+@traced("wh.query")
+def run_structured_wh_request_native(request: str, db: Session):
+    rows, columns = _execute_native(request, db)
+    observe_wh_rows(len(rows))
     if not rows:
         return {"csv": None, "rows": 0}
 
@@ -870,20 +897,26 @@ def run_structured_wh_request_native(request: str, db: Session):
     return {"csv": output.getvalue(), "rows": len(rows)}
 
 
+@traced("wh.query")
 def run_structured_wh_request_raw(request: str, db: Session):
-    # Get raw ClickHouse driver connection from SQLAlchemy session
-    raw_conn = db.connection().connection  # clickhouse_driver.Connection
-    cursor = raw_conn.cursor()
-
-    # Execute the query directly
-    cursor.execute(request)
-
-    # Fetch rows and column names
-    rows = cursor.fetchall()
+    if is_local(db):
+        rows, description = execute_native(request, db)
+    else:
+        # Get raw ClickHouse driver connection from SQLAlchemy session
+        raw_conn = db.connection().connection  # clickhouse_driver.Connection
+        cursor = raw_conn.cursor()
+
+        # Execute the query directly
+        cursor.execute(request)
+
+        # Fetch rows and column names
+        rows = cursor.fetchall()
+        description = cursor.description
+    observe_wh_rows(len(rows))
     if not rows:
         return {"csv": None, "rows": 0}
 
-    column_names = [desc[0] for desc in cursor.description]
+    column_names = [desc[0] for desc in description]
     if len(rows) > 1000:
         logging.error(
             "Too many rows in the result",
@@ -905,11 +938,13 @@ def run_structured_wh_request_raw(request: str, db: Session):
     return {"csv": csv_result, "rows": len(rows)}
 
 
+@traced("wh.query")
 def run_structured_wh_request(request: str, db: Session):
     # try:
     result = db.execute(text(request))
     data = result.mappings().fetchall()
     rows = [dict(row) for row in data]
+    observe_wh_rows(len(rows))
     if len(rows) == 0:
         return {"csv": None, "rows": 0}
     if len(rows) > 1000:
@@ -936,6 +971,7 @@ import logging
 from typing import Optional
 
 
+@traced("wh.count")
 def count_wh_request(request: str, db: Session) -> Optional[int]:
     try:
         # Strip trailing semicolon if present
@@ -955,6 +991,8 @@ def count_wh_request(request: str, db: Session) -> Optional[int]:
 
     except SQLAlchemyError as e:
         logging.error(f"SQL execution error: {e}")
+        # the local warehouse aborts the session's transaction on errors
+        db.rollback()
         return None
 
 
@@ -962,6 +1000,7 @@ def count_wh_request(request: str, db: Session) -> Optional[int]:
 #     logging.error(f"SQL execution error {e}")
 
 
+@traced("pg.get_history")
 async def get_history(
     db: AsyncSession, session_id: UUID, include_responses: bool = False
 ):
@@ -992,6 +1031,7 @@ async def get_history(
         logging.error(f"SQL execution error {e}")
 
 
+@traced("pg.create_query")
 async def create_query(
     db: AsyncSession,
     init: CreateQueryModel,
@@ -1048,6 +1088,7 @@ async def create_query(
     return result
 
 
+@traced("pg.update_query")
 async def update_query(
     db: AsyncSession,
     update: UpdateQueryModel,
@@ -1090,6 +1131,7 @@ async def update_query(
     return result
 
 
+@traced("pg.get_query_by_id")
 async def get_query_by_id(
     db: AsyncSession,
     query_id: UUID,
@@ -0,0 +1,150 @@
+"""
+DuckDB stand-in for the ClickHouse warehouse, for running flows offline.
+
+`prepare_local_warehouse` loads one table per CSV/Parquet/JSON file of
+`wh_local_data_dir` into the DuckDB file at `wh_local_path` and defines
+macros for ClickHouse functions sqlglot leaves as they are. Engines then
+open the file read-only, so every worker process can share it, and translate
+each statement from ClickHouse SQL, so the `run_*wh_request*` and
+`count_wh_request` helpers work on it unchanged.
+"""
+
+import logging
+import pathlib
+from typing import Any, Optional
+
+import duckdb
+import sqlglot
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.orm import Session
+
+LOCAL_DIALECT = "duckdb"
+
+_READERS = {
+    ".csv": "read_csv_auto",
+    ".parquet": "read_parquet",
+    ".json": "read_json_auto",
+}
+
+# DuckDB resolves function names case-insensitively, so one macro covers the
+# upper-cased names sqlglot emits for functions it doesn't know
+_CLICKHOUSE_MACROS = {
+    "toDate(x)": "CAST(x AS DATE)",
+    "toDateTime(x)": "CAST(x AS TIMESTAMP)",
+    "toString(x)": "CAST(x AS VARCHAR)",
+    "toUnixTimestamp(x)": "epoch(x)",
+    "toStartOfMinute(x)": "date_trunc('minute', x)",
+    "toStartOfHour(x)": "date_trunc('hour', x)",
+    "toStartOfDay(x)": "date_trunc('day', x)",
+    "toStartOfWeek(x)": "date_trunc('week', x)",
+    "toStartOfMonth(x)": "date_trunc('month', x)",
+    "toStartOfYear(x)": "date_trunc('year', x)",
+    "uniqExact(x)": "count(DISTINCT x)",
+    "sumIf(x, cond)": "sum(CASE WHEN cond THEN x END)",
+    "avgIf(x, cond)": "avg(CASE WHEN cond THEN x END)",
+}
+
+
+def local_wh_url(path: str) -> str:
+    return f"duckdb:///{path}?access_mode=read_only"
+
+
+def to_duckdb_sql(sql: str) -> str:
+    try:
+        return ";\n".join(sqlglot.transpile(sql, read="clickhouse", write="duckdb"))
+    except sqlglot.errors.SqlglotError:
+        # leave it to DuckDB to report what it can't run
+        return sql
+
+
+def translate_clickhouse_sql(engine: Engine):
+    """Rewrite statements on `engine` from ClickHouse SQL to DuckDB's."""
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def _translate(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and not context.execution_options.get(
+            "clickhouse_sql", True
+        ):
+            return statement, parameters
+        return to_duckdb_sql(statement), parameters
+
+
+def create_local_engine(path: str, **kwargs) -> Engine:
+    engine = create_engine(local_wh_url(path), **kwargs)
+    translate_clickhouse_sql(engine)
+    return engine
+
+
+def is_local(db: Session) -> bool:
+    return db.get_bind().dialect.name == LOCAL_DIALECT
+
+
+def execute_native(
+    request: str, db: Session
+) -> tuple[list[tuple], list[tuple[str, str]]]:
+    """Rows and (name, type) columns, as clickhouse_driver returns them."""
+    result = db.connection().exec_driver_sql(request)
+    columns = [(d[0], str(d[1])) for d in result.cursor.description]
+    return [tuple(row) for row in result.fetchall()], columns
+
+
+def prepare_local_warehouse(path: str, data_dir: Optional[str] = None) -> list[str]:
+    """
+    Load `data_dir` into the DuckDB file at `path`, replacing tables of the
+    same name, and (re)define the ClickHouse macros. Runs before any engine
+    opens the file, since DuckDB allows a single writer. Returns the tables.
+    """
+    con = duckdb.connect(path)
+    try:
+        for file in sorted(pathlib.Path(data_dir).iterdir()) if data_dir else []:
+            reader = _READERS.get(file.suffix.lower())
+            if reader is None:
+                continue
+            con.execute(
+                f'CREATE OR REPLACE TABLE "{file.stem}" AS SELECT * FROM {reader}(?)',
+                [str(file)],
+            )
+        for signature, body in _CLICKHOUSE_MACROS.items():
+            con.execute(f"CREATE OR REPLACE MACRO {signature} AS {body}")
+        tables = [
+            row[0]
+            for row in con.execute(
+                "SELECT table_name FROM duckdb_tables() ORDER BY table_name"
+            ).fetchall()
+        ]
+    finally:
+        con.close()
+    logging.info(
+        "Local warehouse ready",
+        extra={"path": path, "data_dir": data_dir, "tables": tables},
+    )
+    return tables
+
+
+def describe_tables(engine: Engine, sample_rows: int = 3) -> dict[str, Any]:
+    """{table: {columns: [(name, type)], samples: [row, ...]}} of the local DuckDB."""
+    out: dict[str, Any] = {}
+    with engine.connect().execution_options(clickhouse_sql=False) as conn:
+        columns = conn.exec_driver_sql(
+            "SELECT table_name, column_name, data_type FROM duckdb_columns() "
+            "WHERE NOT internal ORDER BY table_name, column_index"
+        ).fetchall()
+        for table, column, data_type in columns:
+            out.setdefault(table, {"columns": [], "samples": []})
+            out[table]["columns"].append((column, data_type))
+        for table, info in out.items():
+            info["samples"] = [
+                tuple(row)
+                for row in conn.exec_driver_sql(
+                    f'SELECT * FROM "{table}" LIMIT {int(sample_rows)}'
+                ).fetchall()
+            ]
+    return out
+
+
+def explain(engine: Engine, sql: str) -> list[dict[str, Any]]:
+    """EXPLAIN of a ClickHouse statement on the local warehouse; raises if invalid."""
+    with engine.connect().execution_options(clickhouse_sql=False) as conn:
+        result = conn.exec_driver_sql(f"EXPLAIN {to_duckdb_sql(sql)}")
+        keys = list(result.keys())
+        return [dict(zip(keys, row)) for row in result.fetchall()]
@@ -1,5 +1,8 @@
 import json
+import threading
+from typing import Optional
 
+from cachetools import TTLCache
 from fastmcp import Client
 
 from fm_app.api.model import (
@@ -8,6 +11,39 @@ from fm_app.api.model import (
     WorkerRequest,
     McpServerRequest,
 )
+from fm_app.mcp_servers.mcp_pool import McpSessionPool
+
+_pools: dict[str, McpSessionPool] = {}
+
+# fingerprints scope cached LLM answers; reused for llm_cache_schema_ttl so
+# a cached call doesn't cost a db-meta round trip
+_fingerprints: Optional[TTLCache] = None
+_fingerprints_lock = threading.Lock()
+
+
+def get_db_meta_pool(settings) -> McpSessionPool:
+    """Process-wide session pool for the db-meta MCP server."""
+    if settings.dbmeta_local:
+        from fm_app.mcp_servers.local_db_meta import mcp
+
+        url, server = "local", mcp
+    else:
+        url = f"""{settings.dbmeta}sse"""
+        server = url
+    if url not in _pools:
+        _pools[url] = McpSessionPool(
+            lambda: Client(server),
+            max_sessions=settings.dbmeta_mcp_max_sessions,
+            keepalive=settings.dbmeta_mcp_keepalive,
+            call_timeout=settings.dbmeta_mcp_call_timeout,
+            name="db-meta",
+        )
+    return _pools[url]
+
+
+async def close_db_meta_pools():
+    for pool in _pools.values():
+        await pool.close()
 
 
 def get_db_name(req: WorkerRequest):
@@ -36,58 +72,71 @@ async def get_db_meta_mcp_prompt_items(
     req: McpServerRequest, flow_step_num, settings, logger
 ):
     db = get_db_name(req)
-    client = Client(f"""{settings.dbmeta}sse""")
-    async with client:
-        try:
-            prompts = await client.call_tool(
-                "prompt_items",
-                {
-                    "req": {
-                        "user_request": req.request,
-                        "db": db,
-                    }
-                },
-            )
-            # print("prompts", prompts[0].text)
-            print("prompts", db, bool(prompts[0].text))
-
-        except Exception as e:
-            logger.error(
-                "Error reading MCP resource",
-                flow_stage="error",
-                flow_step_num=flow_step_num,
-                error=str(e),
-            )
-            raise e
+    try:
+        prompts = await get_db_meta_pool(settings).call_tool(
+            "prompt_items",
+            {
+                "req": {
+                    "user_request": req.request,
+                    "db": db,
+                }
+            },
+        )
+        # print("prompts", prompts[0].text)
+        print("prompts", db, bool(prompts[0].text))
+
+    except Exception as e:
+        logger.error(
+            "Error reading MCP resource",
+            flow_stage="error",
+            flow_step_num=flow_step_num,
+            error=str(e),
+        )
+        raise e
 
     return prompts[0].text
 
 
+async def db_meta_schema_fingerprint(req: McpServerRequest, settings) -> str:
+    """Hash of the db-meta schema prompt for the request's warehouse."""
+    global _fingerprints
+    db = get_db_name(req)
+    with _fingerprints_lock:
+        if _fingerprints is None:
+            _fingerprints = TTLCache(maxsize=64, ttl=settings.llm_cache_schema_ttl)
+        if (cached := _fingerprints.get(db)) is not None:
+            return cached
+    result = await get_db_meta_pool(settings).call_tool(
+        "schema_fingerprint", {"req": {"db": db}}
+    )
+    with _fingerprints_lock:
+        _fingerprints[db] = result[0].text
+    return result[0].text
+
+
 async def db_meta_mcp_analyze_query(
     req: McpServerRequest, sql: str, flow_step_num, settings, logger
 ):
     db = get_db_name(req)
-    client = Client(f"""{settings.dbmeta}sse""")
-    async with client:
-        try:
-            prompts = await client.call_tool(
-                "preflight_query",
-                {
-                    "req": {
-                        "sql": sql,
-                        "db": db,
-                    }
-                },
-            )
-            print("preflight", db, bool(prompts[0].text))
-
-        except Exception as e:
-            logger.error(
-                "Error reading MCP resource",
-                flow_stage="error",
-                flow_step_num=flow_step_num,
-                error=str(e),
-            )
-            raise e
+    try:
+        prompts = await get_db_meta_pool(settings).call_tool(
+            "preflight_query",
+            {
+                "req": {
+                    "sql": sql,
+                    "db": db,
+                }
+            },
+        )
+        print("preflight", db, bool(prompts[0].text))
+
+    except Exception as e:
+        logger.error(
+            "Error reading MCP resource",
+            flow_stage="error",
+            flow_step_num=flow_step_num,
+            error=str(e),
+        )
+        raise e
 
     return json.loads(prompts[0].text)
@@ -1,16 +1,106 @@
-import requests
+import asyncio
+import threading
+from typing import Optional
+
+import httpx
+from cachetools import TTLCache
 
 from fm_app.api.model import GetPromptModel, PromptsSetModel, McpServerRequest
+from fm_app.tracing import traced
+
+# db-ref prompt items are deterministic per request and pack version, so
+# answers are cached; the TTL bounds staleness across db-ref redeploys
+_cache: Optional[TTLCache] = None
+_cache_lock = threading.Lock()
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop = None
+
+
+def _get_client(settings) -> httpx.AsyncClient:
+    """Keep-alive client shared by the process (rebuilt if the loop changes)."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.dbref_read_timeout, connect=settings.dbref_connect_timeout
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.dbref_max_connections,
+                max_keepalive_connections=settings.dbref_max_connections,
+            ),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_db_ref_client():
+    global _client
+    client, _client = _client, None
+    if client is not None and _client_loop is asyncio.get_running_loop():
+        await client.aclose()
+
+
+def _cache_key(req: McpServerRequest, settings) -> tuple:
+    normalized = " ".join(req.request.split())
+    return settings.dbref, settings.system_version, normalized
+
+
+def _cache_get(key: tuple) -> Optional[str]:
+    with _cache_lock:
+        return _cache.get(key) if _cache is not None else None
 
 
-def get_db_ref_prompt_items(
+def _cache_set(key: tuple, value: str, settings):
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TTLCache(
+                maxsize=settings.dbref_cache_size, ttl=settings.dbref_cache_ttl
+            )
+        _cache[key] = value
+
+
+def _prompt_items_text(dbref_prompts, flow_step_num: int, logger) -> str:
+    logger.info(
+        "Got dbref prompts",
+        flow_stage="got_dbref_prompts",
+        flow_step_num=flow_step_num + 1,
+        prompts=dbref_prompts,
+    )
+    dbref_prompts = PromptsSetModel.model_validate(dbref_prompts)
+    dbref = [el.text for el in dbref_prompts.prompt_items]
+    dbref = "\n".join(dbref)
+
+    return dbref
+
+
+@traced("dbref.prompt_items")
+async def aget_db_ref_prompt_items(
     req: McpServerRequest, flow_step_num: int, settings, logger
 ):
     # Getting context from DBref service
+    key = _cache_key(req, settings)
+    if (cached := _cache_get(key)) is not None:
+        return cached
+
     headers = {"Content-Type": "application/json", "Request-Id": str(req.request_id)}
     dbref_request = GetPromptModel(user_request=req.request)
     url = f"{settings.dbref}/api/v1/get_prompt_items"
-    response = requests.post(url, headers=headers, json=dbref_request.model_dump())
+    try:
+        response = await _get_client(settings).post(
+            url, headers=headers, json=dbref_request.model_dump()
+        )
+    except httpx.HTTPError as e:
+        # a slow or down db-ref degrades the prompt, it doesn't fail the flow
+        logger.error(
+            "Filed to call dbref service",
+            flow_stage="error",
+            flow_step_num=flow_step_num,
+            error=str(e),
+        )
+        return ""
     if response.status_code != 200:
         logger.error(
             "Filed to call dbref service",
@@ -19,15 +109,6 @@ def get_db_ref_prompt_items(
         )
         return ""
 
-    dbref_prompts = response.json()
-    logger.info(
-        "Got dbref prompts",
-        flow_stage="got_dbref_prompts",
-        flow_step_num=flow_step_num + 1,
-        prompts=dbref_prompts,
-    )
-    dbref_prompts = PromptsSetModel.model_validate(dbref_prompts)
-    dbref = [el.text for el in dbref_prompts.prompt_items]
-    dbref = "\n".join(dbref)
-
+    dbref = _prompt_items_text(response.json(), flow_step_num, logger)
+    _cache_set(key, dbref, settings)
     return dbref
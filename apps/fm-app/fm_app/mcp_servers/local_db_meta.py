@@ -0,0 +1,107 @@
+"""
+In-process stand-in for the db-meta MCP server (dbmeta_local=true).
+
+Serves `prompt_items`, `schema_fingerprint` and `preflight_query` with
+db-meta's argument and result shapes, answered from the local DuckDB
+warehouse (fm_app.db.local_wh).
+McpSessionPool reaches it through fastmcp's in-memory transport, so the
+flows and the pool run exactly as they do against the real server.
+"""
+
+import asyncio
+import hashlib
+import threading
+from typing import Any, Optional
+
+from fastmcp import FastMCP
+from pydantic import BaseModel
+from sqlalchemy import Engine
+
+from fm_app.config import get_settings
+from fm_app.db.local_wh import create_local_engine, describe_tables, explain
+
+mcp = FastMCP(name="Local DB Metadata MCP Server")
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+_schema_prompt: Optional[str] = None
+
+
+class GetPromptModel(BaseModel):
+    user_request: str
+    db: Optional[str] = None
+
+
+class GetSchemaModel(BaseModel):
+    db: Optional[str] = None
+
+
+class TestSqlModel(BaseModel):
+    sql: str
+    db: Optional[str] = None
+
+
+class PreflightResult(BaseModel):
+    explanation: Optional[list[dict[str, Any]]] = None
+    error: Optional[str] = None
+
+
+def _get_engine() -> Engine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            settings = get_settings()
+            if not settings.wh_local_path:
+                raise ValueError("dbmeta_local needs wh_local_path to be set")
+            _engine = create_local_engine(
+                settings.wh_local_path, pool_size=2, max_overflow=4
+            )
+        return _engine
+
+
+def _build_schema_prompt() -> str:
+    lines = ["Database schema (tables, columns with types, sample rows):"]
+    for table, info in describe_tables(_get_engine()).items():
+        lines.append(f"\nTable {table}")
+        lines.extend(f"  - {name} ({data_type})" for name, data_type in info["columns"])
+        if info["samples"]:
+            lines.append("  Sample rows:")
+            lines.extend(f"  {row}" for row in info["samples"])
+    lines.append("\nSQL dialect: ClickHouse.")
+    return "\n".join(lines)
+
+
+def schema_prompt() -> str:
+    # the local warehouse is read-only, so the prompt is built once
+    global _schema_prompt
+    if _schema_prompt is None:
+        _schema_prompt = _build_schema_prompt()
+    return _schema_prompt
+
+
+def preflight(sql: str) -> PreflightResult:
+    try:
+        return PreflightResult(explanation=explain(_get_engine(), sql))
+    except Exception as e:
+        # flows extract the message with ClickHouse's exception framing
+        return PreflightResult(error=f"SQL error: DB::Exception: {e} Stack trace: -")
+
+
+@mcp.tool()
+async def prompt_items(req: GetPromptModel) -> str:
+    return await asyncio.to_thread(schema_prompt)
+
+
+@mcp.tool()
+async def schema_fingerprint(req: GetSchemaModel) -> str:
+    text = await asyncio.to_thread(schema_prompt)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@mcp.tool()
+async def preflight_query(req: TestSqlModel) -> PreflightResult:
+    """
+    Check if the query is valid and can be executed.
+    Returns an object which could contain **explanation** or **error** fields.
+    """
+    return await asyncio.to_thread(preflight, req.sql)
@@ -1,11 +1,14 @@
 # mcp_async_providers.py
 from typing import Dict, Any
 
+import structlog
+from celery.utils.log import get_task_logger
+
 from fm_app.mcp_servers.db_meta import (
     get_db_meta_mcp_prompt_items,
     db_meta_mcp_analyze_query,
 )
-from fm_app.mcp_servers.db_ref import get_db_ref_prompt_items
+from fm_app.mcp_servers.db_ref import aget_db_ref_prompt_items
 
 
 class DbMetaAsyncProvider:
@@ -60,10 +63,21 @@ class DbRefAsyncProvider:
         flow_step_num = req_ctx.get("flow_step_num", 0)
 
         # Call your existing function
-        text = get_db_ref_prompt_items(
+        text = await aget_db_ref_prompt_items(
             req=req,
             flow_step_num=flow_step_num,
             settings=self.settings,
             logger=self.logger,
         )
         return {"db_ref_prompt_items": text}
+
+
+def fm_app_mcp_providers(settings) -> list:
+    """
+    db-meta and db-ref providers for `get_prompt_assembler(mcp_providers=...)`.
+    They are registered once per built assembler and shared by every flow, so
+    they log through a module logger; request ids come from the bound
+    structlog contextvars.
+    """
+    logger = structlog.wrap_logger(get_task_logger(__name__))
+    return [DbMetaAsyncProvider(settings, logger), DbRefAsyncProvider(settings, logger)]
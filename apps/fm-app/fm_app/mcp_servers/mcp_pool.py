@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Optional
+
+from fastmcp import Client
+from fastmcp.exceptions import ClientError
+from mcp.shared.exceptions import McpError
+
+from fm_app.tracing import span
+
+
+class _PooledSession:
+    """
+    One connected MCP client. The transport (SSE stream, stdio pipes) lives in
+    an owner task of its own: anyio scopes must be exited by the task that
+    entered them, and the flows that borrow the session come and go.
+    """
+
+    def __init__(self, client: Client):
+        self.client = client
+        self.last_used = time.monotonic()
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def open(self, timeout: float):
+        started = asyncio.get_running_loop().create_future()
+
+        async def own():
+            try:
+                async with self.client:
+                    if started.done():  # open() gave up waiting
+                        return
+                    started.set_result(None)
+                    await self._closing.wait()
+            except Exception as e:
+                if not started.done():
+                    started.set_exception(e)
+                else:
+                    logging.warning("MCP session dropped", extra={"error": str(e)})
+
+        self._task = asyncio.create_task(own())
+        try:
+            await asyncio.wait_for(started, timeout)
+        except BaseException:
+            # a handshake that never finished must not keep its transport
+            self._task.cancel()
+            raise
+
+    @property
+    def alive(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def close(self):
+        self._closing.set()
+        if self._task is not None and not self._task.done():
+            done, _ = await asyncio.wait({self._task}, timeout=5)
+            if not done:
+                self._task.cancel()
+
+
+class McpSessionPool:
+    """
+    Per-process pool of initialized MCP sessions to one server, so a tool call
+    costs a round trip instead of a connect + initialize handshake.
+
+    At most `max_sessions` sessions exist (and so at most that many calls are
+    in flight); further callers wait for one to come back. A session idle
+    for longer than `keepalive` is pinged before reuse, and a transport
+    failure drops the session and retries the call once on a fresh one.
+    `call_timeout` bounds the whole call, retry included, and a call that
+    timed out is not retried. Tool errors reported by the server leave the
+    session in the pool.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Client],
+        max_sessions: int = 8,
+        keepalive: float = 30.0,
+        call_timeout: float = 120.0,
+        name: str = "mcp",
+    ):
+        self.name = name
+        self.max_sessions = max_sessions
+        self.keepalive = keepalive
+        self.call_timeout = call_timeout
+        self._client_factory = client_factory
+        self._idle: list[_PooledSession] = []
+        self._open = 0
+        self._loop = None
+        self._slots = None
+        # metrics
+        self.calls = 0
+        self.handshakes = 0
+        self.reconnects = 0
+        self.errors = 0
+
+    def _bind_loop(self):
+        # sessions are tied to the loop that opened them; a new loop (tests,
+        # scripts using asyncio.run) starts from an empty pool
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_sessions)
+            self._idle = []
+            self._open = 0
+
+    async def _connect(self, timeout: float) -> _PooledSession:
+        session = _PooledSession(self._client_factory())
+        self.handshakes += 1
+        await session.open(timeout)
+        self._open += 1
+        return session
+
+    async def _discard(self, session: _PooledSession):
+        self._open -= 1
+        await session.close()
+
+    async def _checkout(self, deadline: float) -> _PooledSession:
+        loop = asyncio.get_running_loop()
+        while self._idle:
+            session = self._idle.pop()
+            if not session.alive:
+                await self._discard(session)
+                continue
+            if time.monotonic() - session.last_used > self.keepalive:
+                try:
+                    await asyncio.wait_for(
+                        session.client.ping(), max(0.0, deadline - loop.time())
+                    )
+                except Exception:
+                    await self._discard(session)
+                    continue
+            return session
+        return await self._connect(max(0.0, deadline - loop.time()))
+
+    async def _call_once(self, name: str, arguments: dict[str, Any], deadline: float):
+        loop = asyncio.get_running_loop()
+        session = await self._checkout(deadline)
+        try:
+            result = await asyncio.wait_for(
+                session.client.call_tool(name, arguments),
+                max(0.0, deadline - loop.time()),
+            )
+        except (ClientError, McpError):
+            # the server answered; the session itself is fine
+            session.last_used = time.monotonic()
+            self._idle.append(session)
+            raise
+        except BaseException:
+            await self._discard(session)
+            raise
+        session.last_used = time.monotonic()
+        self._idle.append(session)
+        return result
+
+    async def call_tool(self, name: str, arguments: Optional[dict[str, Any]] = None):
+        self._bind_loop()
+        arguments = arguments or {}
+        with span(f"mcp.{name}", pool=self.name) as s:
+            async with self._slots:
+                self.calls += 1
+                # one budget for the call and its retry, so a stuck server
+                # costs call_timeout, not twice that
+                deadline = asyncio.get_running_loop().time() + self.call_timeout
+                try:
+                    try:
+                        return await self._call_once(name, arguments, deadline)
+                    except (ClientError, McpError, asyncio.TimeoutError):
+                        raise
+                    except Exception as e:
+                        logging.warning(
+                            "MCP call failed, reconnecting",
+                            extra={"pool": self.name, "tool": name, "error": str(e)},
+                        )
+                        self.reconnects += 1
+                        if s is not None:
+                            s.set(reconnected=True)
+                        return await self._call_once(name, arguments, deadline)
+                except Exception:
+                    self.errors += 1
+                    raise
+
+    async def close(self):
+        if self._loop is not asyncio.get_running_loop():
+            return
+        idle, self._idle = self._idle, []
+        for session in idle:
+            await self._discard(session)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "calls": self.calls,
+            "handshakes": self.handshakes,
+            "reconnects": self.reconnects,
+            "errors": self.errors,
+            "open_sessions": self._open,
+            "idle_sessions": len(self._idle),
+        }
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+
+from fm_app.mcp_servers.mcp_pool import McpSessionPool
+
+
+class FakeClient:
+    """Stands in for fastmcp.Client: `stall` hangs the handshake or the call."""
+
+    def __init__(self, stall_open=False, stall_call=False, failures=0):
+        self.stall_open = stall_open
+        self.stall_call = stall_call
+        self.failures = failures
+        self.exited = False
+
+    async def __aenter__(self):
+        if self.stall_open:
+            await asyncio.Event().wait()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.exited = True
+
+    async def ping(self):
+        return True
+
+    async def call_tool(self, name, arguments):
+        if self.stall_call:
+            await asyncio.Event().wait()
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("stream closed")
+        return [name, arguments]
+
+
+def pool_of(clients, **kwargs) -> McpSessionPool:
+    clients = iter(clients)
+    return McpSessionPool(lambda: next(clients), name="test", **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_stalled_handshake_is_bounded_by_call_timeout():
+    pool = pool_of(
+        [FakeClient(stall_open=True), FakeClient()], max_sessions=1, call_timeout=0.2
+    )
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        await pool.call_tool("prompt_items")
+    assert time.monotonic() - started < 1.0
+    # the slot came back and no half-open session is counted
+    assert pool.stats()["open_sessions"] == 0
+    assert await pool.call_tool("prompt_items", {"a": 1}) == ["prompt_items", {"a": 1}]
+    assert pool.stats()["handshakes"] == 2
+
+
+@pytest.mark.asyncio
+async def test_stalled_call_times_out_without_retry():
+    pool = pool_of([FakeClient(stall_call=True), FakeClient()], call_timeout=0.2)
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        await pool.call_tool("prompt_items")
+    assert time.monotonic() - started < 0.4
+    assert pool.stats()["reconnects"] == 0
+    assert pool.stats()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_transport_failure_retries_once_on_a_fresh_session():
+    first = FakeClient(failures=1)
+    pool = pool_of([first, FakeClient()], call_timeout=1.0)
+    assert await pool.call_tool("preflight_query") == ["preflight_query", {}]
+    stats = pool.stats()
+    assert (stats["reconnects"], stats["handshakes"], stats["errors"]) == (1, 2, 0)
+    await asyncio.sleep(0)
+    assert first.exited
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_reused():
+    pool = pool_of([FakeClient()], call_timeout=1.0)
+    for _ in range(3):
+        await pool.call_tool("prompt_items")
+    assert pool.stats()["handshakes"] == 1
+    assert pool.stats()["idle_sessions"] == 1
+    await pool.close()
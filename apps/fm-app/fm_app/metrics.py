@@ -0,0 +1,208 @@
+"""
+Prometheus metrics for the API and the workers.
+
+The API runs several uvicorn workers and the Celery worker may fork pool
+children, so when PROMETHEUS_MULTIPROC_DIR is set every process writes its
+samples there and whichever process serves the scrape aggregates them
+(run.sh and celery_run.sh reset the directory on start).
+
+Stage, LLM, MCP and warehouse timings come from finished tracing spans, so
+anything wrapped in `span()`/`@traced` is measured without extra code.
+"""
+
+import logging
+import os
+import time
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from fm_app.tracing import Span, on_span_end
+
+_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+_ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "fm_http_request_duration_seconds",
+    "API request latency by route template",
+    ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+FLOW_DURATION = Histogram(
+    "fm_flow_duration_seconds",
+    "End-to-end worker flow duration",
+    ["flow", "model", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+FLOW_STAGE_DURATION = Histogram(
+    "fm_flow_stage_duration_seconds",
+    "Duration of traced stages (span names)",
+    ["stage"],
+    buckets=_LATENCY_BUCKETS,
+)
+FLOWS_IN_FLIGHT = Gauge(
+    "fm_flows_in_flight",
+    "Flows currently running in this worker",
+    multiprocess_mode="livesum",
+)
+LLM_CALL_DURATION = Histogram(
+    "fm_llm_call_duration_seconds",
+    "LLM call latency",
+    ["provider", "kind", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "fm_llm_tokens",
+    "LLM tokens used",
+    ["provider", "model", "type"],
+)
+LLM_CACHE_LOOKUPS = Counter(
+    "fm_llm_cache_lookups",
+    "LLM response cache lookups by slot and result (exact, semantic, miss, error)",
+    ["slot", "result"],
+)
+DATA_CACHE_LOOKUPS = Counter(
+    "fm_data_cache_lookups",
+    "/data page cache lookups by result (hit, miss)",
+    ["result"],
+)
+DATA_CACHE_BYTES = Gauge(
+    "fm_data_cache_bytes",
+    "Serialized bytes of the /data pages held in this process",
+    multiprocess_mode="livesum",
+)
+MCP_CALL_DURATION = Histogram(
+    "fm_mcp_call_duration_seconds",
+    "MCP tool call latency",
+    ["pool", "tool", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+WH_QUERY_DURATION = Histogram(
+    "fm_wh_query_duration_seconds",
+    "ClickHouse query time",
+    ["op", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+WH_ROWS_RETURNED = Histogram(
+    "fm_wh_rows_returned",
+    "Rows returned by ClickHouse queries",
+    buckets=_ROW_BUCKETS,
+)
+PG_POOL_WAIT = Histogram(
+    "fm_pg_pool_wait_seconds",
+    "Time spent waiting for a Postgres connection from the pool",
+    buckets=_LATENCY_BUCKETS,
+)
+
+
+def _observe_span(s: Span):
+    seconds = s.duration_ms / 1000.0
+    outcome = "error" if s.error else "ok"
+    kind, _, name = s.name.partition(".")
+    if kind == "llm":
+        provider = s.attributes.get("provider", "unknown")
+        LLM_CALL_DURATION.labels(provider, name, outcome).observe(seconds)
+    elif kind == "mcp":
+        pool = s.attributes.get("pool", "mcp")
+        MCP_CALL_DURATION.labels(pool, name, outcome).observe(seconds)
+    elif kind == "wh":
+        WH_QUERY_DURATION.labels(name, outcome).observe(seconds)
+    FLOW_STAGE_DURATION.labels(s.name).observe(seconds)
+
+
+on_span_end(_observe_span)
+
+
+def observe_llm_tokens(
+    provider: str, model: str, prompt_tokens: int, completion_tokens: int
+):
+    LLM_TOKENS.labels(provider, model, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(provider, model, "completion").inc(completion_tokens)
+
+
+def observe_wh_rows(rows: int):
+    WH_ROWS_RETURNED.observe(rows)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long callers waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            PG_POOL_WAIT.observe(time.perf_counter() - start)
+
+
+class QueueDepthCollector:
+    """Messages waiting on the broker for the worker's queue, read at scrape time."""
+
+    def __init__(self, celery_app):
+        self.celery_app = celery_app
+
+    def collect(self):
+        depth = GaugeMetricFamily(
+            "fm_celery_queue_depth",
+            "Messages waiting in the broker queue",
+            labels=["queue"],
+        )
+        queue = self.celery_app.conf.task_default_queue
+        try:
+            with self.celery_app.connection_for_read() as conn:
+                declared = conn.default_channel.queue_declare(queue=queue, passive=True)
+            depth.add_metric([queue], declared.message_count)
+        except Exception as e:
+            logging.warning("Failed to read queue depth", extra={"error": str(e)})
+        yield depth
+
+
+def _multiprocess() -> bool:
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def _registry(*collectors) -> CollectorRegistry:
+    if _multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    for collector in collectors:
+        registry.register(collector)
+    return registry
+
+
+def start_exporter(port: int, *collectors):
+    """Serve /metrics on `port` from a background thread."""
+    start_http_server(port, registry=_registry(*collectors))
+
+
+def mark_process_dead(pid: int):
+    # drops the live gauges of an exited pool child from the aggregate
+    if _multiprocess():
+        multiprocess.mark_process_dead(pid)
@@ -1,16 +1,23 @@
 # from __future__ import annotations
 
+import asyncio
 import copy
 import hashlib
+import logging
 import os
 import pathlib
 import re
+import shutil
 import tempfile
+import threading
+import time
+import weakref
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
 
 import yaml
+from cachetools import LRUCache
 from jinja2 import Environment, StrictUndefined, BaseLoader
 from jsonschema import validate, Draft202012Validator, exceptions as jsonschema_ex
 
@@ -41,9 +48,10 @@ def _apply_default_decorators(
     wrapper_src = _get_effective_text(effective_tree, wrapper_rel)
     if wrapper_src:
         try:
-            # Render wrapper via Jinja too, with {{ content }} available
-            # Make a one-off template from string (keeps your existing loader)
-            tmpl = env.from_string(wrapper_src)
+            # Render wrapper via Jinja too, with {{ content }} available.
+            # Loaded by name so the env's template cache keeps it compiled;
+            # the merged root comes first, so this is the effective content.
+            tmpl = env.get_template(wrapper_rel)
             return tmpl.render(content=prompt_text)
         except Exception:
             pass  # fall back to pre/post
@@ -368,13 +376,19 @@ class MultiRootLoader(BaseLoader):
         raise FileNotFoundError(template)
 
 
-def build_jinja_env(search_roots: List[pathlib.Path]) -> Environment:
+def build_jinja_env(
+    search_roots: List[pathlib.Path],
+    cache_size: int = 400,
+    auto_reload: bool = True,
+) -> Environment:
     env = Environment(
         loader=MultiRootLoader(search_roots),
         undefined=StrictUndefined,
         autoescape=False,
         trim_blocks=True,
         lstrip_blocks=True,
+        cache_size=cache_size,
+        auto_reload=auto_reload,
     )
     return env
 
@@ -392,6 +406,17 @@ def _slot_paths(slot: str) -> Dict[str, str]:
     return {"prompt": base + "prompt.md"}
 
 
+def _slot_extras(effective_tree: Dict[str, bytes], slot: str) -> Dict[str, str]:
+    """Non-prompt files in the slot dir, from the *effective* (overlayed) view."""
+    prompt_rel = _slot_paths(slot)["prompt"]
+    extras: Dict[str, str] = {}
+    slot_dir_prefix = f"slots/{slot}/"
+    for rel, data in effective_tree.items():
+        if rel.startswith(slot_dir_prefix) and rel != prompt_rel:
+            extras[rel.split("/")[-1]] = data.decode("utf-8", errors="ignore")
+    return extras
+
+
 def materialize_slot(
     component_root: pathlib.Path,
     effective_tree: Dict[str, bytes],
@@ -399,6 +424,8 @@ def materialize_slot(
     search_roots_for_includes: List[pathlib.Path],
     variables: Dict[str, Any],
     lineage_base: Dict[str, Any],
+    jinja_env: Optional[Environment] = None,
+    slot_extras: Optional[Tuple[Dict[str, str], Dict[str, str]]] = None,
 ) -> SlotMaterial:
     paths = _slot_paths(slot)
     prompt_rel = paths["prompt"]
@@ -407,7 +434,9 @@ def materialize_slot(
 
     # Write effective tree to a temp dir for Jinja includes to work across roots
     # Optimization: we let Jinja read from search_roots (system + overlays) to resolve {% include %} pieces.
-    env = build_jinja_env(search_roots_for_includes)
+    # Callers holding a long-lived env (PromptAssembler) pass it in so compiled
+    # templates are reused instead of re-read and recompiled on every render.
+    env = jinja_env or build_jinja_env(search_roots_for_includes)
 
     # Render main prompt
     prompt_template_rel = prompt_rel  # relative path usable by MultiRootLoader
@@ -428,25 +457,23 @@ def materialize_slot(
         raise RenderError(f"Failed to render slot '{slot}': {e}") from e
 
     # Load extras (non-prompt files in the slot dir) from the *effective* view (overlayed)
-    extras: Dict[str, str] = {}
-    slot_dir_prefix = f"slots/{slot}/"
-    for rel, data in effective_tree.items():
-        if rel.startswith(slot_dir_prefix) and rel != prompt_rel:
-            extras[rel.split("/")[-1]] = data.decode("utf-8", errors="ignore")
+    if slot_extras is None:
+        extras = _slot_extras(effective_tree, slot)
+        extras_hashes = {k: sha256_bytes(v.encode("utf-8")) for k, v in extras.items()}
+    else:
+        extras, extras_hashes = slot_extras
 
     lineage = dict(lineage_base)
     lineage.update(
         {
             "slot": slot,
             "prompt_sha256": sha256_bytes(prompt_text.encode("utf-8")),
-            "extras_sha256": {
-                k: sha256_bytes(v.encode("utf-8")) for k, v in extras.items()
-            },
+            "extras_sha256": dict(extras_hashes),
         }
     )
 
     return SlotMaterial(
-        slot=slot, prompt_text=prompt_text, extras=extras, lineage=lineage
+        slot=slot, prompt_text=prompt_text, extras=dict(extras), lineage=lineage
     )
 
 
@@ -494,6 +521,11 @@ class PromptAssembler:
             return tmpdir
 
         self._merged_root = _write_effective_tree_to_tmp(self.tree)
+        # flows may still render with this instance after the registry swapped
+        # it out, so the temp dir goes when the last of them lets go of it
+        self._cleanup = weakref.finalize(
+            self, shutil.rmtree, self._merged_root, ignore_errors=True
+        )
 
         # 5) Set include roots — merged first
         self._include_roots = [
@@ -514,8 +546,46 @@ class PromptAssembler:
             ],
         }
 
+        # One long-lived env per assembler: the effective tree is immutable for
+        # the assembler's lifetime (the registry rebuilds it on pack changes),
+        # so templates are compiled once and never re-stat'ed.
+        self._jinja_env = build_jinja_env(self._include_roots, auto_reload=False)
+        self._extras_by_slot: Dict[str, Tuple[Dict[str, str], Dict[str, str]]] = {}
+        self._precompile()
+
         self.async_mcp_registry = {}  # name -> async provider
-        self._amcp_cache_vars = {}  # (name, slot, frozen_ctx) -> dict
+        # (name, slot, frozen_ctx) -> dict; bounded, since assemblers are shared
+        # across requests via get_prompt_assembler()
+        self._amcp_cache_vars = LRUCache(maxsize=256)
+
+    def _precompile(self):
+        """
+        Compile every slot prompt (and the default wrapper) up front. A slot
+        that doesn't compile is skipped and fails on its first render, so it
+        can't take the other slots down with it.
+        """
+        for slot in self.available_slots():
+            try:
+                self._jinja_env.get_template(_slot_paths(slot)["prompt"])
+            except Exception as e:
+                logging.warning(
+                    "Prompt slot failed to compile",
+                    extra={"slot": slot, "error": str(e)},
+                )
+            extras = _slot_extras(self.tree, slot)
+            self._extras_by_slot[slot] = (
+                extras,
+                {k: sha256_bytes(v.encode("utf-8")) for k, v in extras.items()},
+            )
+        if "slots/__default/wrapper.md" in self.tree:
+            try:
+                self._jinja_env.get_template("slots/__default/wrapper.md")
+            except Exception:
+                pass  # rendering falls back to prefix/postfix
+
+    def close(self):
+        """Remove the temp dir holding the materialized effective tree."""
+        self._cleanup()
 
     def register_async_mcp(self, provider):
         self.async_mcp_registry[provider.name] = provider
@@ -563,36 +633,42 @@ class PromptAssembler:
             search_roots_for_includes=self._include_roots,
             variables=merged_vars,
             lineage_base=self.lineage_base,
+            jinja_env=self._jinja_env,
+            slot_extras=self._extras_by_slot.get(slot),
         )
 
-    async def render_async(
-        self,
-        slot: str,
-        variables: Dict[str, Any],
-        req_ctx: Dict[str, Any],
-        mcp_caps: Optional[Dict[str, Any]] = None,
-    ):
-        merged_vars = dict(variables)
-        if mcp_caps:
-            merged_vars["capabilities"] = mcp_caps
-        # merged_vars.setdefault("today", os.getenv("PROMPT_TODAY") or "")
-
-        # Fetch MCP vars declared in manifest
-        mcp_lineage = []
+    async def _provider_vars(self, name: str, prov, slot: str, req_ctx, frozen_ctx):
+        cache_key = (name, slot, frozen_ctx)
+        if cache_key in self._amcp_cache_vars:
+            return self._amcp_cache_vars[cache_key]
+        vars_from_mcp = await prov.vars_for_slot(slot, req_ctx)
+        self._amcp_cache_vars[cache_key] = vars_from_mcp
+        return vars_from_mcp
+
+    async def mcp_vars_async(
+        self, slot: str, req_ctx: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Fetch the MCP vars a slot declares in the manifest, all providers at
+        once. Returns (vars, lineage); callers can start this early and hand
+        the result to render_async(mcp_vars=...).
+        """
         frozen_ctx = _freeze(copy.deepcopy(req_ctx))
-        for need in self._slot_mcp_requirements(slot):
-            name = need["name"]
-            prov = self.async_mcp_registry.get(name)
-            if not prov:
-                continue  # or raise if strictly required
-
-            cache_key = (name, slot, frozen_ctx)
-            if cache_key in self._amcp_cache_vars:
-                vars_from_mcp = self._amcp_cache_vars[cache_key]
-            else:
-                vars_from_mcp = await prov.vars_for_slot(slot, req_ctx)
-                self._amcp_cache_vars[cache_key] = vars_from_mcp
+        needs = [
+            (need, self.async_mcp_registry.get(need["name"]))
+            for need in self._slot_mcp_requirements(slot)
+        ]
+        needs = [(need, prov) for need, prov in needs if prov]  # or raise if required
+        fetched = await asyncio.gather(
+            *(
+                self._provider_vars(need["name"], prov, slot, req_ctx, frozen_ctx)
+                for need, prov in needs
+            )
+        )
 
+        merged_vars: Dict[str, Any] = {}
+        mcp_lineage = []
+        for (need, _), vars_from_mcp in zip(needs, fetched):
             # If manifest lists specific keys, keep only those
             wanted_keys = [v["key"] if isinstance(v, dict) else v for v in need["vars"]]
             if wanted_keys:
@@ -603,11 +679,31 @@ class PromptAssembler:
             merged_vars.update(vars_from_mcp)
             mcp_lineage.append(
                 {
-                    "provider": name,
+                    "provider": need["name"],
                     "vars": sorted(vars_from_mcp.keys()),
                     "resources": [],
                 }
             )
+        return merged_vars, mcp_lineage
+
+    async def render_async(
+        self,
+        slot: str,
+        variables: Dict[str, Any],
+        req_ctx: Dict[str, Any],
+        mcp_caps: Optional[Dict[str, Any]] = None,
+        mcp_vars: Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]] = None,
+    ):
+        merged_vars = dict(variables)
+        if mcp_caps:
+            merged_vars["capabilities"] = mcp_caps
+        # merged_vars.setdefault("today", os.getenv("PROMPT_TODAY") or "")
+
+        # Fetch MCP vars declared in manifest, unless the caller prefetched them
+        if mcp_vars is None:
+            mcp_vars = await self.mcp_vars_async(slot, req_ctx)
+        vars_from_mcp, mcp_lineage = mcp_vars
+        merged_vars.update(vars_from_mcp)
 
         # Render with existing sync machinery
         slot_mat = materialize_slot(
@@ -617,11 +713,139 @@ class PromptAssembler:
             search_roots_for_includes=self._include_roots,
             variables=merged_vars,
             lineage_base=self.lineage_base,
+            jinja_env=self._jinja_env,
+            slot_extras=self._extras_by_slot.get(slot),
         )
         slot_mat.lineage["mcp"] = mcp_lineage
         return slot_mat
 
 
+# ---------- Process-wide registry
+
+# (repo_root, component, client, env, system_version) -> (signature, assembler)
+_ASSEMBLERS: Dict[Tuple, Tuple[Tuple, PromptAssembler]] = {}
+_ASSEMBLERS_LOCK = threading.Lock()
+_ASSEMBLERS_CHECKED_AT: Dict[Tuple, float] = {}
+
+
+def _dirs_signature(roots: List[pathlib.Path]) -> Tuple:
+    """
+    Cheap change detector for pack dirs: stat() only, no file reads.
+    Any added/removed/replaced/touched file changes the signature.
+    """
+    sig = []
+    for root in roots:
+        for p in sorted(root.rglob("*")):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            if p.is_file():
+                sig.append((str(p), st.st_ino, st.st_size, st.st_mtime_ns))
+    return tuple(sig)
+
+
+def _assembler_roots(assembler: PromptAssembler) -> List[pathlib.Path]:
+    return [assembler.system_pack.root, *assembler.overlay_dirs]
+
+
+def get_prompt_assembler(
+    repo_root: str | pathlib.Path,
+    component: str,
+    client: Optional[str] = None,
+    env: Optional[str] = None,
+    system_version: Optional[str] = None,
+    check_interval: float = 5.0,
+    mcp_providers: Optional[Callable[[], Iterable[Any]]] = None,
+) -> PromptAssembler:
+    """
+    Return the process-wide PromptAssembler for the given pack coordinates,
+    building it on first use. Pack dirs are re-stat'ed at most once per
+    `check_interval` seconds; the assembler is rebuilt only if they changed.
+    The replaced instance keeps its temp dir until no flow references it.
+
+    `mcp_providers` is called when an assembler is built, and the async MCP
+    providers it returns are registered on it; the shared instance is never
+    re-registered per request.
+    """
+    key = (str(pathlib.Path(repo_root)), component, client, env, system_version)
+    with _ASSEMBLERS_LOCK:
+        now = time.monotonic()
+        entry = _ASSEMBLERS.get(key)
+        if entry is not None:
+            sig, assembler = entry
+            if now - _ASSEMBLERS_CHECKED_AT.get(key, 0.0) < check_interval:
+                return assembler
+            _ASSEMBLERS_CHECKED_AT[key] = now
+            if _dirs_signature(_assembler_roots(assembler)) == sig:
+                return assembler
+
+        fresh = PromptAssembler(
+            repo_root=repo_root,
+            component=component,
+            client=client,
+            env=env,
+            system_version=system_version,
+        )
+        if mcp_providers is not None:
+            for provider in mcp_providers():
+                fresh.register_async_mcp(provider)
+        elif entry is not None:
+            # keep providers registered on the old instance
+            fresh.async_mcp_registry.update(entry[1].async_mcp_registry)
+        _ASSEMBLERS[key] = (_dirs_signature(_assembler_roots(fresh)), fresh)
+        _ASSEMBLERS_CHECKED_AT[key] = now
+        return fresh
+
+
+def reload_prompt_assemblers():
+    """
+    Explicit reload hook: drop all cached assemblers. Their temp dirs are
+    removed once in-flight flows release them, or at interpreter exit.
+    """
+    with _ASSEMBLERS_LOCK:
+        _ASSEMBLERS.clear()
+        _ASSEMBLERS_CHECKED_AT.clear()
+
+
+def benchmark_render(
+    assembler: PromptAssembler, variables: Dict[str, Any], iterations: int = 200
+) -> Dict[str, Tuple[float, float]]:
+    """
+    Microbenchmark: per-slot render time in ms, (fresh env per render, cached env).
+    The first number is what materialize_slot cost before the assembler kept a
+    long-lived env; missing manifest inputs are filled with empty strings.
+    """
+    slots_meta = assembler.system_pack.manifest.get("slots", {}) or {}
+    out: Dict[str, Tuple[float, float]] = {}
+    for slot in assembler.available_slots():
+        slot_vars = {k: "" for k in (slots_meta.get(slot, {}) or {}).get("inputs", [])}
+        slot_vars.update(variables)
+        slot_vars.setdefault("db_meta_prompt_items", "")
+        slot_vars.setdefault("db_ref_prompt_items", "")
+        try:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                materialize_slot(
+                    component_root=assembler.system_pack.root,
+                    effective_tree=assembler.tree,
+                    slot=slot,
+                    search_roots_for_includes=assembler._include_roots,
+                    variables=slot_vars,
+                    lineage_base=assembler.lineage_base,
+                )
+            uncached = (time.perf_counter() - start) * 1000.0 / iterations
+            start = time.perf_counter()
+            for _ in range(iterations):
+                assembler.render(slot, slot_vars)
+            cached = (time.perf_counter() - start) * 1000.0 / iterations
+        except RenderError as e:
+            print(f"skip {slot}: {e}")
+            continue
+        out[slot] = (uncached, cached)
+    return out
+
+
 async def try_mcp(req: Dict[str, Any]) -> None:
     req_ctx = {
         "req": req,
@@ -691,3 +915,9 @@ if __name__ == "__main__":
     print(slot.prompt_text)
     print("--- EXTRAS ---", list(slot.extras.keys()))
     print("--- LINEAGE ---", slot.lineage)
+
+    print("--- RENDER TIME PER SLOT (ms: fresh env -> cached env) ---")
+    for slot_name, (uncached_ms, cached_ms) in benchmark_render(
+        assembler, planner_vars
+    ).items():
+        print(f"{slot_name:28s} {uncached_ms:8.3f} -> {cached_ms:8.3f}")
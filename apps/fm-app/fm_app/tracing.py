@@ -0,0 +1,307 @@
+"""
+Per-request tracing.
+
+A trace is started per API request and per worker task; `span()` opens a
+child of whatever span is current in the context, so spans nest correctly
+across awaits, asyncio.gather and asyncio.to_thread. The API hands the trace
+to the worker through a W3C `traceparent` Celery header, so both halves of a
+request share one trace id. Finished traces are exported as OTLP/JSON (file
+and/or collector) and summarized per stage for the request row.
+"""
+
+import contextlib
+import functools
+import inspect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str] = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    events: list[tuple[str, int]] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+
+@dataclass
+class Trace:
+    trace_id: str
+    root: Optional[Span] = None
+    spans: list[Span] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, span: Span):
+        # spans finish on the loop and on to_thread workers alike
+        with self._lock:
+            self.spans.append(span)
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("fm_trace", default=None)
+_span: ContextVar[Optional[Span]] = ContextVar("fm_span", default=None)
+_span_listeners: list[Callable[[Span], None]] = []
+
+
+def on_span_end(listener: Callable[[Span], None]):
+    """Call `listener` with every finished child span (e.g. to feed metrics)."""
+    _span_listeners.append(listener)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def parse_traceparent(value: Optional[str]) -> tuple[Optional[str], Optional[str]]:
+    m = _TRACEPARENT_RE.match(value or "")
+    return (m.group(1), m.group(2)) if m else (None, None)
+
+
+def current_traceparent() -> Optional[str]:
+    span = _span.get()
+    if span is None:
+        return None
+    return f"00-{span.trace_id}-{span.span_id}-01"
+
+
+def trace_headers() -> dict[str, str]:
+    """Celery headers that continue the current trace in the worker."""
+    traceparent = current_traceparent()
+    return {TRACEPARENT_HEADER: traceparent} if traceparent else {}
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+@contextlib.contextmanager
+def start_trace(
+    name: str, traceparent: Optional[str] = None, **attributes
+) -> Iterator[Trace]:
+    """Root span for one unit of work; exported when the block exits."""
+    trace_id, parent_span_id = parse_traceparent(traceparent)
+    trace = Trace(trace_id=trace_id or _new_id(16))
+    root = Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=_new_id(8),
+        parent_span_id=parent_span_id,
+        attributes=attributes,
+    )
+    trace.root = root
+    trace_token = _trace.set(trace)
+    span_token = _span.set(root)
+    try:
+        yield trace
+    except BaseException as e:
+        root.error = repr(e)
+        raise
+    finally:
+        root.end_ns = time.time_ns()
+        trace.add(root)
+        _span.reset(span_token)
+        _trace.reset(trace_token)
+        export_trace(trace)
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Child span of the current one; a no-op outside of a trace."""
+    trace = _trace.get()
+    parent = _span.get()
+    if trace is None or parent is None:
+        yield None
+        return
+    s = Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=_new_id(8),
+        parent_span_id=parent.span_id,
+        attributes=attributes,
+    )
+    token = _span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = repr(e)
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _span.reset(token)
+        trace.add(s)
+        for listener in _span_listeners:
+            try:
+                listener(s)
+            except Exception as e:
+                logging.warning("Span listener failed", extra={"error": str(e)})
+
+
+def add_event(name: str):
+    """Timestamped marker on the current span (e.g. 'pre_intent')."""
+    s = _span.get()
+    if s is not None:
+        s.events.append((name, time.time_ns()))
+
+
+def traced(name: str, record_args: tuple[str, ...] = (), **attributes):
+    """
+    Decorator running the function (sync or async) in a span. Arguments
+    named in `record_args` are added as span attributes.
+    """
+
+    def decorate(fn):
+        signature = inspect.signature(fn) if record_args else None
+
+        def span_attributes(args, kwargs) -> dict[str, Any]:
+            if signature is None:
+                return attributes
+            bound = signature.bind_partial(*args, **kwargs).arguments
+            recorded = {k: bound[k] for k in record_args if bound.get(k) is not None}
+            return {**attributes, **recorded}
+
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **span_attributes(args, kwargs)):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **span_attributes(args, kwargs)):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def summarize(trace: Trace) -> dict[str, Any]:
+    """Per-stage totals for the request row: {stage: {count, ms}}."""
+    stages: dict[str, dict[str, Any]] = {}
+    for s in trace.spans:
+        if s is trace.root:
+            continue
+        stage = stages.setdefault(s.name, {"count": 0, "ms": 0.0})
+        stage["count"] += 1
+        stage["ms"] = round(stage["ms"] + s.duration_ms, 3)
+    return {
+        "trace_id": trace.trace_id,
+        "total_ms": round(trace.root.duration_ms, 3) if trace.root else None,
+        "stages": stages,
+    }
+
+
+# ---------- OTLP/JSON export
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    return [
+        {"key": k, "value": _otlp_value(v)}
+        for k, v in attributes.items()
+        if v is not None
+    ]
+
+
+def _otlp_span(s: Span) -> dict[str, Any]:
+    out = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns or s.start_ns),
+        "attributes": _otlp_attributes(s.attributes),
+        "events": [{"name": name, "timeUnixNano": str(ts)} for name, ts in s.events],
+        "status": (
+            {"code": 2, "message": s.error} if s.error else {"code": 1}  # ERROR / OK
+        ),
+    }
+    if s.parent_span_id:
+        out["parentSpanId"] = s.parent_span_id
+    return out
+
+
+def otlp_json(trace: Trace, service_name: str) -> dict[str, Any]:
+    """ExportTraceServiceRequest in the OTLP/JSON encoding."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": _otlp_attributes({"service.name": service_name})
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "fm_app.tracing"},
+                        "spans": [_otlp_span(s) for s in trace.spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+# exports never run on the request path
+_exporter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-export")
+_file_lock = threading.Lock()
+
+
+def _write(payload: dict[str, Any], path: Optional[str], endpoint: Optional[str]):
+    try:
+        if path:
+            line = json.dumps(payload, default=str)
+            with _file_lock, open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        if endpoint:
+            import httpx
+
+            httpx.post(endpoint, json=payload, timeout=5.0)
+    except Exception as e:
+        logging.warning("Failed to export trace", extra={"error": str(e)})
+
+
+def export_trace(trace: Trace):
+    from fm_app.config import get_settings
+
+    settings = get_settings()
+    if not (settings.trace_export_file or settings.trace_otlp_endpoint):
+        return
+    payload = otlp_json(trace, settings.trace_service_name)
+    _exporter.submit(
+        _write, payload, settings.trace_export_file, settings.trace_otlp_endpoint
+    )
@@ -1,7 +1,9 @@
+import asyncio
 import itertools
 import pathlib
 import re
 from datetime import datetime
+from functools import partial
 from typing import Type
 
 import sqlglot
@@ -19,11 +21,8 @@ from fm_app.api.model import (
 )
 from fm_app.config import get_settings
 from fm_app.db.db import run_structured_wh_request, update_request_status
-from fm_app.mcp_servers.mcp_async_providers import (
-    DbMetaAsyncProvider,
-    DbRefAsyncProvider,
-)
-from fm_app.prompt_assembler.prompt_packs import PromptAssembler
+from fm_app.mcp_servers.mcp_async_providers import fm_app_mcp_providers
+from fm_app.prompt_assembler.prompt_packs import get_prompt_assembler
 
 
 async def data_only_flow(
@@ -38,18 +37,15 @@ async def data_only_flow(
     )
 
     repo_root = pathlib.Path(settings.packs_resources_dir).resolve()  # adjust depth
-    assembler = PromptAssembler(
+    assembler = get_prompt_assembler(
         repo_root=repo_root,  # containing /prompts and /client-configs
         component="fm_app",
         client=settings.client_id,
         env=settings.env,
         system_version=settings.system_version,  # pick latest
+        mcp_providers=partial(fm_app_mcp_providers, settings),
     )
 
-    # Register async MCP providers for db-meta and db-ref
-    assembler.register_async_mcp(DbMetaAsyncProvider(settings, logger))
-    assembler.register_async_mcp(DbRefAsyncProvider(settings, logger))
-
     logger.info(
         "Starting flow",
         flow_stage="start",
@@ -104,7 +100,7 @@ async def data_only_flow(
         flow_step_num=next(flow_step),
         ai_request=messages,
     )
-    sql_request = ai_model.get_response(messages)
+    sql_request = await ai_model.aget_response(messages)
     if ai_model.get_name() != "gemini":
         messages.append({"role": "assistant", "content": sql_request})
     else:
@@ -154,7 +150,9 @@ async def data_only_flow(
 
         await update_request_status(RequestStatus.data, None, db, req.request_id)
         try:
-            wh_result = run_structured_wh_request(extracted_sql, db_wh)
+            wh_result = await asyncio.to_thread(
+                run_structured_wh_request, extracted_sql, db_wh
+            )
         except Exception as e:
             error_pattern = r"(DB::Exception.*?)Stack trace"
             error_match = re.search(error_pattern, str(e), re.DOTALL)
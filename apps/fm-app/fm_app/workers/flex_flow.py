@@ -1,3 +1,4 @@
+import asyncio
 import csv
 import io
 import itertools
@@ -5,6 +6,7 @@ import json
 import pathlib
 import re
 from datetime import datetime
+from functools import partial
 from typing import Optional, Type
 
 import duckdb
@@ -31,11 +33,8 @@ from fm_app.db.db import (
 from fm_app.mcp_servers.db_meta import (
     db_meta_mcp_analyze_query,
 )
-from fm_app.mcp_servers.mcp_async_providers import (
-    DbMetaAsyncProvider,
-    DbRefAsyncProvider,
-)
-from fm_app.prompt_assembler.prompt_packs import PromptAssembler
+from fm_app.mcp_servers.mcp_async_providers import fm_app_mcp_providers
+from fm_app.prompt_assembler.prompt_packs import get_prompt_assembler
 
 
 async def flex_flow(
@@ -50,18 +49,15 @@ async def flex_flow(
     )
 
     repo_root = pathlib.Path(settings.packs_resources_dir).resolve()  # adjust depth
-    assembler = PromptAssembler(
+    assembler = get_prompt_assembler(
         repo_root=repo_root,  # containing /prompts and /client-configs
         component="fm_app",
         client=settings.client_id,
         env=settings.env,
         system_version=settings.system_version,  # pick latest
+        mcp_providers=partial(fm_app_mcp_providers, settings),
     )
 
-    # Register async MCP providers for db-meta and db-ref
-    assembler.register_async_mcp(DbMetaAsyncProvider(settings, logger))
-    assembler.register_async_mcp(DbRefAsyncProvider(settings, logger))
-
     logger.info(
         "Starting flow",
         flow_stage="start",
@@ -120,7 +116,7 @@ async def flex_flow(
         flow_step_num=next(flow_step),
         ai_request=messages,
     )
-    sql_request = ai_model.get_response(messages)
+    sql_request = await ai_model.aget_response(messages)
     if ai_model.get_name() != "gemini":
         messages.append({"role": "assistant", "content": sql_request})
     else:
@@ -180,7 +176,7 @@ async def flex_flow(
                     {"role": "system", "content": prompt},
                     {"role": "user", "content": extracted_sql},
                 ]
-                pipeline_str = ai_model.get_response(messages)
+                pipeline_str = await ai_model.aget_response(messages)
                 pipeline = json.loads(pipeline_str)
                 con = duckdb.connect()
                 df = None
@@ -202,8 +198,8 @@ async def flex_flow(
                                 step_outputs[stage] = result.fetchdf()
 
                         else:
-                            rows, columns = run_structured_wh_request_dataframe(
-                                step_sql, db_wh
+                            rows, columns = await asyncio.to_thread(
+                                run_structured_wh_request_dataframe, step_sql, db_wh
                             )
                             df = pd.DataFrame(rows, columns=[col[0] for col in columns])
                             df_name = step.get("output_table", "df")
@@ -280,7 +276,7 @@ async def flex_flow(
                     flow_step_num=next(flow_step),
                     ai_request=messages,
                 )
-                ai_response = ai_model.get_response(messages)
+                ai_response = await ai_model.aget_response(messages)
 
                 logger.info(
                     "Got response",
@@ -324,7 +320,9 @@ async def flex_flow(
 
         await update_request_status(RequestStatus.data, None, db, req.request_id)
         try:
-            wh_result = run_structured_wh_request_native(extracted_sql, db_wh)
+            wh_result = await asyncio.to_thread(
+                run_structured_wh_request_native, extracted_sql, db_wh
+            )
             # wh_result = run_structured_wh_request_raw(extracted_sql, db_wh)
             # wh_result = run_structured_wh_request(extracted_sql, db_wh)
         except Exception as e:
@@ -402,7 +400,7 @@ async def flex_flow(
         flow_step_num=next(flow_step),
         ai_request=messages,
     )
-    ai_response = ai_model.get_response(messages)
+    ai_response = await ai_model.aget_response(messages)
 
     logger.info(
         "Got response",
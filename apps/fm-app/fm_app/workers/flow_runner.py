@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from typing import Any, Coroutine
+
+
+class FlowRunner:
+    """
+    Runs worker flows on the process's event loop.
+
+    With concurrency 1 (prefork pool) each task drives the loop itself, one
+    flow at a time, as before. With concurrency > 1 the loop runs forever in
+    its own thread and Celery's thread pool hands it flows, so up to
+    `concurrency` flows overlap their LLM, MCP and warehouse waits in one
+    process. Flows past the limit wait for a slot before they start; together
+    with a prefetch multiplier of 1 the backlog stays on the broker where
+    other pods can pick it up.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, concurrency: int):
+        self.loop = loop
+        self.concurrency = max(1, concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def concurrent(self) -> bool:
+        return self.concurrency > 1
+
+    def _ensure_loop_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self.loop.run_forever, name="flow-loop", daemon=True
+                )
+                self._thread.start()
+
+    async def _limited(self, coro: Coroutine) -> Any:
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            return await coro
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def run(self, coro: Coroutine) -> Any:
+        """Run `coro` on the flow loop and block the calling thread until it is done."""
+        if not self.concurrent:
+            return self.loop.run_until_complete(coro)
+        self._ensure_loop_thread()
+        future = asyncio.run_coroutine_threadsafe(self._limited(coro), self.loop)
+        return future.result()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            thread.join(timeout=10)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+        }
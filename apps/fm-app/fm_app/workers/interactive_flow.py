@@ -1,8 +1,10 @@
+import asyncio
 import itertools
 import pathlib
 import re
 import uuid
 from datetime import datetime
+from functools import partial
 from typing import Type
 
 import structlog
@@ -10,6 +12,7 @@ from celery.utils.log import get_task_logger
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.session import Session
 
+from fm_app.ai_models.cache import cache_slot
 from fm_app.ai_models.model import AIModel
 from fm_app.api.model import (
     StructuredResponse,
@@ -38,13 +41,22 @@ from fm_app.db.db import (
 )
 from fm_app.mcp_servers.db_meta import (
     db_meta_mcp_analyze_query,
+    db_meta_schema_fingerprint,
 )
-from fm_app.mcp_servers.mcp_async_providers import (
-    DbMetaAsyncProvider,
-    DbRefAsyncProvider,
-)
-from fm_app.prompt_assembler.prompt_packs import PromptAssembler
-from fm_app.stopwatch import stopwatch
+from fm_app.mcp_servers.mcp_async_providers import fm_app_mcp_providers
+from fm_app.prompt_assembler.prompt_packs import get_prompt_assembler
+from fm_app.tracing import add_event, span
+from fm_app.workers.db_session import SESSION
+
+
+async def _read(fn, **kwargs):
+    """Run a metadata read on a session of its own so it can overlap others."""
+    async with SESSION() as session:
+        return await fn(db=session, **kwargs)
+
+
+async def _none():
+    return None
 
 
 async def interactive_flow(
@@ -52,7 +64,7 @@ async def interactive_flow(
 ):
     logger = structlog.wrap_logger(get_task_logger(__name__))
     flow_step = itertools.count(1)  # start from 1
-    print(">>> FLOW START", stopwatch.lap())
+    add_event("flow_start")
 
     settings = get_settings()
     structlog.contextvars.bind_contextvars(
@@ -62,27 +74,64 @@ async def interactive_flow(
     # Initialize for fm-app with client overlays
     # repo_root = pathlib.Path(settings.packs_resources_dir).resolve()  # adjust depth
     repo_root = pathlib.Path(settings.packs_resources_dir)  # adjust depth
-    assembler = PromptAssembler(
+    assembler = get_prompt_assembler(
         repo_root=repo_root,  # containing /prompts and /client-configs
         component="fm_app",
         client=settings.client_id,
         env=settings.env,
         system_version=settings.system_version,  # pick latest
+        mcp_providers=partial(fm_app_mcp_providers, settings),
     )
 
-    # Register async MCP providers for db-meta and db-ref
-    assembler.register_async_mcp(DbMetaAsyncProvider(settings, logger))
-    assembler.register_async_mcp(DbRefAsyncProvider(settings, logger))
-
-    # Intent distillation step
-    request_session = await get_session_by_id(session_id=req.session_id, db=db)
-    parent_session = (
-        await get_session_by_id(session_id=req.parent_session_id, db=db)
-        if req.parent_session_id
-        else None
+    is_linked_query = req.request_type == InteractiveRequestType.linked_query
+    mcp_ctx = {
+        "req": McpServerRequest(
+            request_id=req.request_id,
+            db=req.db,
+            request=req.request,
+            session_id=req.session_id,
+            model=req.model,
+            flow=req.flow,
+        ),
+        "flow_step_num": next(flow_step),  # for logging purposes
+    }
+
+    # Everything the first prompt needs is independent: fetch the MCP vars
+    # (db-meta, db-ref) and the session/parent/history reads side by side.
+    # Reads get their own sessions since `db` can't run statements concurrently.
+    first_mcp_vars = asyncio.create_task(
+        assembler.mcp_vars_async(
+            "linked_query" if is_linked_query else "planner", mcp_ctx
+        )
     )
-
-    await update_request_status(RequestStatus.in_process, None, db, req.request_id)
+    try:
+        request_session, parent_session, history, _ = await asyncio.gather(
+            _read(get_session_by_id, session_id=req.session_id),
+            (
+                _read(get_session_by_id, session_id=req.parent_session_id)
+                if req.parent_session_id
+                else _none()
+            ),
+            # only completed requests count, so this stays valid for the flow
+            (
+                _read(get_history, session_id=req.session_id, include_responses=False)
+                if not is_linked_query
+                else _none()
+            ),
+            update_request_status(RequestStatus.in_process, None, db, req.request_id),
+        )
+        # the prompt is rendered right after, so nothing is lost by waiting
+        # here, and the task can't outlive a failure further down the flow
+        first_vars = await first_mcp_vars
+    finally:
+        first_mcp_vars.cancel()  # no-op once it finished
+
+    now = datetime.now().replace(microsecond=0)
+    new_query_id = uuid.uuid4()
+    # rendered into the first prompt, but don't change its answer: cached
+    # answers are keyed with the day and without the id
+    volatile = {str(now): now.date().isoformat(), str(new_query_id): "<new>"}
+    schema_fingerprint = partial(db_meta_schema_fingerprint, mcp_ctx["req"], settings)
 
     query_metadata_instruction = (
         f"Current QueryMetadata: {req.query.model_dump_json()}"
@@ -90,7 +139,7 @@ async def interactive_flow(
         else (
             f"Current QueryMetadata: {request_session.metadata}"
             if request_session.metadata is not None
-            else f"QueryMetadata ID (new): {uuid.uuid4()}"
+            else f"QueryMetadata ID (new): {new_query_id}"
         )
     )
 
@@ -131,13 +180,13 @@ async def interactive_flow(
 
     # Variables you inject at runtime
 
-    if req.request_type == InteractiveRequestType.linked_query:
+    if is_linked_query:
         ### LINKED SESSION ###
         linked_query_vars = {
             "client_id": settings.client_id,
             "intent_hint": intent_hint,
             "query_metadata": query_metadata_instruction,
-            "current_datetime": datetime.now().replace(microsecond=0),
+            "current_datetime": now,
         }
         await update_request_status(RequestStatus.new, None, db, req.request_id)
 
@@ -147,20 +196,12 @@ async def interactive_flow(
             # "cost_tier": "standard",
             # "max_result_rows": 5000,
         # }
-        mcp_ctx = {
-            "req": McpServerRequest(
-                request_id=req.request_id,
-                db=req.db,
-                request=req.request,
-                session_id=req.session_id,
-                model=req.model,
-                flow=req.flow,
-            ),
-            "flow_step_num": next(flow_step),  # for logging purposes
-        }
-
         slot = await assembler.render_async(
-            "linked_query", variables=linked_query_vars, req_ctx=mcp_ctx, mcp_caps=None
+            "linked_query",
+            variables=linked_query_vars,
+            req_ctx=mcp_ctx,
+            mcp_caps=None,
+            mcp_vars=first_vars,
         )
 
         linked_query_llm_system_prompt = slot.prompt_text
@@ -181,13 +222,17 @@ async def interactive_flow(
             ai_request=messages,
         )
 
-        print(">>> PRE LINKED QUERY", stopwatch.lap())
         await update_request_status(RequestStatus.intent, None, db, req.request_id)
 
         try:
-            llm_response = ai_model.get_structured(
-                messages, IntentAnalysis, "gpt-4.1-mini-2025-04-14" # "gpt-4.1-2025-04-14"
-            )
+            with span("interactive.linked_query"), cache_slot(
+                slot, volatile=volatile, db=req.db
+            ):
+                llm_response = await ai_model.aget_structured(
+                    messages,
+                    IntentAnalysis,
+                    "gpt-4.1-mini-2025-04-14",  # "gpt-4.1-2025-04-14"
+                )
 
         except Exception as e:
             logger.error(
@@ -202,7 +247,6 @@ async def interactive_flow(
                                         req.request_id)
             return req
 
-        print(">>> POST LINKED QUERY", stopwatch.lap())
         await update_request_status(RequestStatus.finalizing, None, db, req.request_id)
 
         if ai_model.get_name() != "gemini":
@@ -248,7 +292,7 @@ async def interactive_flow(
             refs=None,
         )
 
-        print(">>> DONE LINKED QUERY", stopwatch.lap())
+        add_event("done_linked_query")
 
         return req
 
@@ -264,7 +308,7 @@ async def interactive_flow(
             "parent_session_id": parent_instruction,
             "selected_row_data": rows_instruction,
             "selected_column_data": column_instruction,
-            "current_datetime": datetime.now().replace(microsecond=0),
+            "current_datetime": now,
         }
 
         # Capabilities coming from MCPs (db-meta/db-ref)
@@ -273,25 +317,16 @@ async def interactive_flow(
             # "cost_tier": "standard",
             # "max_result_rows": 5000,
         }
-        mcp_ctx = {
-            "req": McpServerRequest(
-                request_id=req.request_id,
-                db=req.db,
-                request=req.request,
-                session_id=req.session_id,
-                model=req.model,
-                flow=req.flow,
-            ),
-            "flow_step_num": next(flow_step),  # for logging purposes
-        }
-
         slot = await assembler.render_async(
-            "planner", variables=planner_vars, req_ctx=mcp_ctx, mcp_caps=db_meta_caps
+            "planner",
+            variables=planner_vars,
+            req_ctx=mcp_ctx,
+            mcp_caps=db_meta_caps,
+            mcp_vars=first_vars,
         )
 
         intent_llm_system_prompt = slot.prompt_text
 
-        history = await get_history(db, req.session_id, include_responses=False)
         if ai_model.get_name() != "gemini":
             messages = [{"role": "system", "content": intent_llm_system_prompt}]
             for item in history:
@@ -312,12 +347,30 @@ async def interactive_flow(
         )
 
         user_intent = None
-        print(">>> PRE INTENT", stopwatch.lap())
+
+        # only a prompt without session context may reuse the answer to a
+        # similar request
+        standalone = not (
+            history
+            or req.query
+            or req.refs
+            or request_session.metadata
+            or request_session.parent
+            or parent_session
+        )
 
         try:
-            llm_response = ai_model.get_structured(
-                messages, IntentAnalysis, "gpt-4.1-2025-04-14"
-            )
+            with span("interactive.intent"), cache_slot(
+                slot,
+                semantic_text=req.request if standalone else None,
+                volatile=volatile,
+                schema=schema_fingerprint,
+                db=req.db,
+                request_type=req.request_type,
+            ):
+                llm_response = await ai_model.aget_structured(
+                    messages, IntentAnalysis, "gpt-4.1-2025-04-14"
+                )
 
         except Exception as e:
             logger.error(
@@ -331,8 +384,6 @@ async def interactive_flow(
             await update_request_status(RequestStatus.error, req.err, db, req.request_id)
             return req
 
-        print(">>> POST INTENT", stopwatch.lap())
-
         if ai_model.get_name() != "gemini":
             messages.append({"role": "assistant", "content": llm_response})
         else:
@@ -395,8 +446,6 @@ async def interactive_flow(
     ### INTERACTIVE QUERY ###
     elif llm_response.request_type == InteractiveRequestType.interactive_query:
 
-        history = await get_history(db, req.session_id, include_responses=False)
-
         interactive_query_vars = {
             "client_id": settings.client_id,
             "intent_hint": intent_hint,
@@ -426,16 +475,13 @@ async def interactive_flow(
             "flow_step_num": next(flow_step),  # for logging purposes
         }
 
-        print(">>> PRE MCP", stopwatch.lap())
-
-        slot = await assembler.render_async(
-            "interactive_query",
-            variables=interactive_query_vars,
-            req_ctx=mcp_ctx,
-            mcp_caps=db_meta_caps,
-        )
-
-        print(">>> POST MCP", stopwatch.lap())
+        with span("interactive.prompt"):
+            slot = await assembler.render_async(
+                "interactive_query",
+                variables=interactive_query_vars,
+                req_ctx=mcp_ctx,
+                mcp_caps=db_meta_caps,
+            )
 
         query_llm_system_prompt = slot.prompt_text
 
@@ -462,10 +508,11 @@ async def interactive_flow(
                 ai_request=messages,
             )
 
-            print(">>> PRE QUERY", stopwatch.lap())
-
             try:
-                llm_response = ai_model.get_structured(messages, QueryMetadata)
+                with span("interactive.sql", attempt=attempt):
+                    llm_response = await ai_model.aget_structured(
+                        messages, QueryMetadata
+                    )
 
             except Exception as e:
                 logger.error(
@@ -481,8 +528,6 @@ async def interactive_flow(
                 )
                 return req
 
-            print(">>> POST QUERY", stopwatch.lap())
-
             if ai_model.get_name() != "gemini":
                 messages.append(
                     {"role": "assistant", "content": llm_response.model_dump_json()}
@@ -521,13 +566,10 @@ async def interactive_flow(
                     extracted_sql=extracted_sql,
                 )
 
-                print(">>> PRE ANALYZE", stopwatch.lap())
-
-                analyzed = await db_meta_mcp_analyze_query(
-                    req, extracted_sql, 5, settings, logger
-                )
-
-                print(">>> POST ANALYZE", stopwatch.lap())
+                with span("interactive.analyze", attempt=attempt):
+                    analyzed = await db_meta_mcp_analyze_query(
+                        req, extracted_sql, 5, settings, logger
+                    )
 
                 if analyzed.get("explanation"):
                     explanation = analyzed.get("explanation")[0]
@@ -572,14 +614,13 @@ async def interactive_flow(
 
                 # if we have a valid SQL, get the row count
 
-                print(">>> PRE ROW COUNT", stopwatch.lap())
-
                 try:
-                    row_count = count_wh_request(extracted_sql, db_wh)
+                    with span("interactive.row_count"):
+                        row_count = await asyncio.to_thread(
+                            count_wh_request, extracted_sql, db_wh
+                        )
                     new_metadata.update({"row_count": row_count})
 
-                    print(">>> POST ROW COUNT", stopwatch.lap())
-
                     await update_query_metadata(
                         session_id=req.session_id,
                         user_owner=req.user,
@@ -688,7 +729,7 @@ async def interactive_flow(
                 refs=req.refs,
             )
 
-            print(">>> DONE INTERACTIVE QUERY", stopwatch.lap())
+            add_event("done_interactive_query")
 
 
             return req
@@ -750,7 +791,6 @@ async def interactive_flow(
 
         analysis_llm_system_prompt = slot.prompt_text
 
-        history = await get_history(db, req.session_id, include_responses=False)
         if ai_model.get_name() != "gemini":
             messages = [{"role": "system", "content": analysis_llm_system_prompt}]
             for item in history:
@@ -772,7 +812,7 @@ async def interactive_flow(
         )
 
         try:
-            llm_response = ai_model.get_response(messages)
+            llm_response = await ai_model.aget_response(messages)
 
         except Exception as e:
             logger.error(
@@ -4,6 +4,7 @@ import json
 import pathlib
 import uuid
 from datetime import datetime
+from functools import partial
 from typing import Any, Callable, Dict, Optional, Type
 
 import structlog
@@ -31,11 +32,9 @@ from fm_app.api.model import (
 )
 from fm_app.config import Settings
 from fm_app.db.db import update_request_status
-from fm_app.mcp_servers.mcp_async_providers import (
-    DbMetaAsyncProvider,
-    DbRefAsyncProvider,
-)
-from fm_app.prompt_assembler.prompt_packs import PromptAssembler
+from fm_app.mcp_servers.mcp_async_providers import fm_app_mcp_providers
+from fm_app.mcp_servers.mcp_pool import McpSessionPool
+from fm_app.prompt_assembler.prompt_packs import get_prompt_assembler
 from fm_app.workers.model import ExecutionPipeline, QueryMetadata, Step
 
 load_dotenv(".env")
@@ -85,7 +84,10 @@ def resolve_step_sql(
 
 
 # db_client = Client(server_script, log_handler=log_handler)
-db_client = Client(server_script)
+# one stdio server process per worker, kept running between steps
+db_pool = McpSessionPool(
+    lambda: Client(server_script), max_sessions=1, name="solana-db"
+)
 
 llm = ChatOpenAI(
     temperature=0.0,
@@ -218,23 +220,22 @@ async def run_sql_query(sql: str, db: str) -> dict:
     # Replace with actual DB access
     print(f"Running SQL:\n{sql}")
 
-    async with db_client:
-        try:
-            result: list[TextContent] = await db_client.call_tool(
-                "fetch_data",
-                {
-                    "request": sql,
-                    "db": db,
-                    "settings": settings,
-                },
-            )
-            data = json.loads(result[0].text)
-            print(f"SQL result: {data}")
-            return data
+    try:
+        result: list[TextContent] = await db_pool.call_tool(
+            "fetch_data",
+            {
+                "request": sql,
+                "db": db,
+                "settings": settings,
+            },
+        )
+        data = json.loads(result[0].text)
+        print(f"SQL result: {data}")
+        return data
 
-        except Exception as e:
-            print(f"SQL call failed: {e}")
-            return {"error": str(e)}
+    except Exception as e:
+        print(f"SQL call failed: {e}")
+        return {"error": str(e)}
 
 
 async def execute_step(step: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
@@ -256,18 +257,15 @@ async def ask_llm_for_plan(query: str, db_name: str) -> ExecutionPipeline:
     )
     # Initialize for fm-app with client overlays
     repo_root = pathlib.Path(settings.packs_resources_dir)  # adjust depth
-    assembler = PromptAssembler(
+    assembler = get_prompt_assembler(
         repo_root=repo_root,  # containing /prompts and /client-configs
         component="fm_app",
         client=settings.client_id,
         env=settings.env,
         system_version=settings.system_version,  # pick latest
+        mcp_providers=partial(fm_app_mcp_providers, settings),
     )
 
-    # Register async MCP providers for db-meta and db-ref
-    assembler.register_async_mcp(DbMetaAsyncProvider(settings, logger))
-    assembler.register_async_mcp(DbRefAsyncProvider(settings, logger))
-
     planner_vars = {
         "client_id": settings.client_id,
         "current_datetime": datetime.now().replace(microsecond=0),
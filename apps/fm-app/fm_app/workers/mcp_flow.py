@@ -16,7 +16,7 @@ from fm_app.ai_models.model import AIModel
 from fm_app.api.model import RequestStatus, StructuredResponse, WorkerRequest
 from fm_app.config import get_settings
 from fm_app.mcp_servers.db_meta import get_db_name
-from fm_app.mcp_servers.db_ref import get_db_ref_prompt_items
+from fm_app.mcp_servers.db_ref import aget_db_ref_prompt_items
 from fm_app.workers.prompt_elements import (
     instruction_mcp,
     expertise_prefix,
@@ -52,7 +52,7 @@ async def mcp_flow(req: WorkerRequest, ai_model: Type[AIModel]):
     print("\n\nSTART:", req.request, "\n\n")
 
     # await get_db_meta_mcp_prompt_items(req, 0, settings, logger)
-    dbref_prompts = get_db_ref_prompt_items(req, 0, settings, logger)
+    dbref_prompts = await aget_db_ref_prompt_items(req, 0, settings, logger)
     db_name = get_db_name(req)
 
     ts1 = datetime.datetime.now()
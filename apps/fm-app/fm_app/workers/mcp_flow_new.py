@@ -17,7 +17,7 @@ from fm_app.ai_models.model import AIModel
 from fm_app.api.model import RequestStatus, StructuredResponse, WorkerRequest
 from fm_app.config import get_settings
 from fm_app.mcp_servers.db_meta import get_db_name
-from fm_app.mcp_servers.db_ref import get_db_ref_prompt_items
+from fm_app.mcp_servers.db_ref import aget_db_ref_prompt_items
 from fm_app.workers.agent import init_agent
 
 server_script = "fm_app/mcp_servers/solana_db.py"  # Path to a Python server file
@@ -50,7 +50,7 @@ async def mcp_flow(
     ts = datetime.datetime.now()
     print("\n\nSTART:", req.request, "\n\n")
 
-    dbref_prompts = get_db_ref_prompt_items(req, 0, settings, logger)
+    dbref_prompts = await aget_db_ref_prompt_items(req, 0, settings, logger)
     db_name = get_db_name(req)
 
     ts1 = datetime.datetime.now()
@@ -1,8 +1,10 @@
+import asyncio
 import itertools
 import json
 import pathlib
 import re
 from datetime import datetime
+from functools import partial
 from typing import Type
 
 import sqlglot
@@ -25,11 +27,8 @@ from fm_app.db.db import (
     update_request_status,
     update_session_name,
 )
-from fm_app.mcp_servers.mcp_async_providers import (
-    DbMetaAsyncProvider,
-    DbRefAsyncProvider,
-)
-from fm_app.prompt_assembler.prompt_packs import PromptAssembler
+from fm_app.mcp_servers.mcp_async_providers import fm_app_mcp_providers
+from fm_app.prompt_assembler.prompt_packs import get_prompt_assembler
 from fm_app.services.charts import generate_chart_code, generate_chart_html
 
 
@@ -49,18 +48,15 @@ async def multistep_flow(
     # Initialize for fm-app with client overlays
     # repo_root = pathlib.Path(__file__).resolve()  # adjust depth
     repo_root = pathlib.Path(settings.packs_resources_dir)  # adjust depth
-    assembler = PromptAssembler(
+    assembler = get_prompt_assembler(
         repo_root=repo_root,  # containing /prompts and /client-configs
         component="fm_app",
         client=settings.client_id,
         env=settings.env,
         system_version=settings.system_version,  # pick latest
+        mcp_providers=partial(fm_app_mcp_providers, settings),
     )
 
-    # Register async MCP providers for db-meta and db-ref
-    assembler.register_async_mcp(DbMetaAsyncProvider(settings, logger))
-    assembler.register_async_mcp(DbRefAsyncProvider(settings, logger))
-
     req.structured_response = StructuredResponse()
 
     logger.info(
@@ -115,7 +111,7 @@ async def multistep_flow(
         request=messages,
         flow_step_num=next(flow_step),
     )
-    ai_response = ai_model.get_structured(messages, InvestigationStep)
+    ai_response = await ai_model.aget_structured(messages, InvestigationStep)
     await update_session_name(req.session_id, req.user, ai_response.summary, db)
     req.structured_response.intent = ai_response.user_intent
 
@@ -196,7 +192,7 @@ async def multistep_flow(
             request=messages,
             flow_step_num=next(flow_step),
         )
-        ai_response = ai_model.get_structured(messages, InvestigationStep)
+        ai_response = await ai_model.aget_structured(messages, InvestigationStep)
         # only put assumptions if they are not empty; don't overwrite
         if ai_response.user_friendly_assumptions:
             req.structured_response.assumptions = ai_response.user_friendly_assumptions
@@ -242,7 +238,9 @@ async def multistep_flow(
             if code_match:
                 code = code_match.group(1).strip()
 
-                chart_url = generate_chart_code(code, next(flow_step), logger)
+                chart_url = await asyncio.to_thread(
+                    generate_chart_code, code, next(flow_step), logger
+                )
                 if chart_url:
                     result.response_to_user = f"""
                         {result.response_to_user}\n\n
@@ -272,8 +270,13 @@ async def multistep_flow(
                     flow_step_num=next(flow_step),
                     ai_response=result,
                 )
-                chart_url = generate_chart_html(
-                    result.rows, result.labels, chart_type, next(flow_step), logger
+                chart_url = await asyncio.to_thread(
+                    generate_chart_html,
+                    result.rows,
+                    result.labels,
+                    chart_type,
+                    next(flow_step),
+                    logger,
                 )
                 if chart_url:
                     req.response = f"""
@@ -348,7 +351,9 @@ async def multistep_flow(
             #     continue
 
             try:
-                wh_result = run_structured_wh_request(result.sql_request, db_wh)
+                wh_result = await asyncio.to_thread(
+                    run_structured_wh_request, result.sql_request, db_wh
+                )
 
             except Exception as e:
                 error_pattern = r"(DB::Exception.*?)Stack trace"
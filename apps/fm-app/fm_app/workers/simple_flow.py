@@ -1,9 +1,11 @@
+import asyncio
 import csv
 import io
 import itertools
 import pathlib
 import re
 from datetime import datetime
+from functools import partial
 from typing import Type
 
 import sqlglot
@@ -24,11 +26,8 @@ from fm_app.db.db import update_request_status, run_structured_wh_request
 from fm_app.mcp_servers.db_meta import (
     db_meta_mcp_analyze_query,
 )
-from fm_app.mcp_servers.mcp_async_providers import (
-    DbMetaAsyncProvider,
-    DbRefAsyncProvider,
-)
-from fm_app.prompt_assembler.prompt_packs import PromptAssembler
+from fm_app.mcp_servers.mcp_async_providers import fm_app_mcp_providers
+from fm_app.prompt_assembler.prompt_packs import get_prompt_assembler
 
 
 async def simple_flow(
@@ -51,18 +50,15 @@ async def simple_flow(
 
     # Initialize for fm-app with client overlays
     repo_root = pathlib.Path(settings.packs_resources_dir)  # adjust depth
-    assembler = PromptAssembler(
+    assembler = get_prompt_assembler(
         repo_root=repo_root,  # containing /prompts and /client-configs
         component="fm_app",
         client=settings.client_id,
         env=settings.env,
         system_version=settings.system_version,  # pick latest
+        mcp_providers=partial(fm_app_mcp_providers, settings),
     )
 
-    # Register async MCP providers for db-meta and db-ref
-    assembler.register_async_mcp(DbMetaAsyncProvider(settings, logger))
-    assembler.register_async_mcp(DbRefAsyncProvider(settings, logger))
-
     req.structured_response = StructuredResponse()
 
     slost_vars = {
@@ -115,7 +111,7 @@ async def simple_flow(
         flow_step_num=next(flow_step),
         ai_request=messages,
     )
-    sql_request = ai_model.get_response(messages)
+    sql_request = await ai_model.aget_response(messages)
     if ai_model.get_name() != "gemini":
         messages.append({"role": "assistant", "content": sql_request})
     else:
@@ -170,7 +166,9 @@ async def simple_flow(
         try:
             # wh_result = run_structured_wh_request_native(extracted_sql, db_wh)
             # wh_result = run_structured_wh_request_raw(extracted_sql, db_wh)
-            wh_result = run_structured_wh_request(extracted_sql, db_wh)
+            wh_result = await asyncio.to_thread(
+                run_structured_wh_request, extracted_sql, db_wh
+            )
         except Exception as e:
             error_pattern = r"(DB::Exception.*?)Stack trace"
             error_match = re.search(error_pattern, str(e), re.DOTALL)
@@ -262,7 +260,7 @@ async def simple_flow(
         flow_step_num=next(flow_step),
         ai_request=messages,
     )
-    ai_response = ai_model.get_response(messages)
+    ai_response = await ai_model.aget_response(messages)
 
     logger.info(
         "Got response",
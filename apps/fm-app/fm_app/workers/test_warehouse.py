@@ -0,0 +1,32 @@
+import pytest
+
+from fm_app.api.model import DBType, FlowType, ModelType, WorkerRequest
+from fm_app.workers.warehouse import wh_profile
+
+
+def worker_request(**fields) -> WorkerRequest:
+    # model_construct skips validation, as a raw db value from the queue would
+    return WorkerRequest.model_construct(**fields)
+
+
+@pytest.mark.parametrize(
+    "flow, db, profile",
+    [
+        (FlowType.openai_multisteps, DBType.v2, DBType.v2),
+        (FlowType.openai_simple_v2, DBType.new_wh, DBType.new_wh),
+        (FlowType.openai_simple_v2, "NWH", DBType.new_wh),
+        # an empty or unknown db falls back to the flow's warehouse
+        (FlowType.openai_simple_v2, "", DBType.v2),
+        (FlowType.openai_simple_new_wh, None, DBType.new_wh),
+        (FlowType.openai_simple_v2, "bogus", DBType.v2),
+        (FlowType.openai_multisteps, "", DBType.legacy),
+    ],
+)
+def test_wh_profile(flow, db, profile):
+    request = worker_request(flow=flow, model=ModelType.openai_default, db=db)
+    assert wh_profile(request) == profile
+
+
+def test_legacy_flows_ignore_db():
+    request = worker_request(flow=FlowType.openai_simple_v2, model=None, db="NWH")
+    assert wh_profile(request) == DBType.v2
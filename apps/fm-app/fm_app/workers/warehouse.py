@@ -0,0 +1,110 @@
+import threading
+from typing import Any
+
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from fm_app.api.model import DBType, FlowType, WorkerRequest
+from fm_app.config import Settings
+from fm_app.db.local_wh import LOCAL_DIALECT, local_wh_url, translate_clickhouse_sql
+
+_NEW_WH_FLOWS = {
+    FlowType.openai_simple_new_wh,
+    FlowType.gemini_simple_new_wh,
+    FlowType.deepseek_simple_new_wh,
+    FlowType.anthropic_simple_new_wh,
+}
+_V2_FLOWS = {
+    FlowType.openai_simple_v2,
+    FlowType.gemini_simple_v2,
+    FlowType.deepseek_simple_v2,
+    FlowType.anthropic_simple_v2,
+}
+
+
+def wh_profile(request: WorkerRequest) -> DBType:
+    """The warehouse a request runs against; legacy flows encode it in the name."""
+    if request.model and request.db:
+        try:
+            return DBType(request.db)
+        except ValueError:
+            pass
+    if request.flow in _NEW_WH_FLOWS:
+        return DBType.new_wh
+    if request.flow in _V2_FLOWS:
+        return DBType.v2
+    return DBType.legacy
+
+
+def wh_urls(settings: Settings) -> dict[DBType, str]:
+    if settings.wh_local_path:
+        # every profile reads the one local DuckDB file
+        return {db: local_wh_url(settings.wh_local_path) for db in DBType}
+    return {
+        DBType.legacy: f"clickhouse+native://{settings.database_wh_user}:{settings.database_wh_pass}@{settings.database_wh_server}:{settings.database_wh_port}/{settings.database_wh_db}{settings.database_wh_params}",  # noqa: E501
+        DBType.new_wh: f"clickhouse+native://{settings.database_wh_user}:{settings.database_wh_pass}@{settings.database_wh_server_new}:{settings.database_wh_port_new}/{settings.database_wh_db_new}{settings.database_wh_params_new}",  # noqa: E501
+        DBType.v2: f"clickhouse+native://{settings.database_wh_user}:{settings.database_wh_pass}@{settings.database_wh_server_v2}:{settings.database_wh_port_v2}/{settings.database_wh_db_v2}{settings.database_wh_params_v2}",  # noqa: E501
+    }
+
+
+class WarehouseRegistry:
+    """
+    Warehouse engines for the worker, one per DBType, created on first use.
+
+    A flow holds a single session at a time, so each pool is sized to the
+    number of flows this process runs concurrently plus a small overflow,
+    instead of a fixed 40 + 60 per profile per prefork child.
+    """
+
+    def __init__(self, urls: dict[DBType, str], pool_size: int, max_overflow: int):
+        self.urls = urls
+        self.pool_size = max(1, pool_size)
+        self.max_overflow = max_overflow
+        self._engines: dict[DBType, Engine] = {}
+        self._sessions: dict[DBType, sessionmaker] = {}
+        self._lock = threading.Lock()
+
+    def engine(self, db: DBType) -> Engine:
+        with self._lock:
+            if db not in self._engines:
+                if db not in self.urls:
+                    raise NotImplementedError("db not known or not implemented")
+                engine = create_engine(
+                    self.urls[db],
+                    pool_size=self.pool_size,
+                    max_overflow=self.max_overflow,
+                    pool_pre_ping=True,
+                    pool_recycle=360,
+                )
+                if engine.dialect.name == LOCAL_DIALECT:
+                    translate_clickhouse_sql(engine)
+                self._engines[db] = engine
+                self._sessions[db] = sessionmaker(bind=engine, expire_on_commit=False)
+            return self._engines[db]
+
+    def session(self, db: DBType) -> Session:
+        """A new session for `db`; the caller closes it when the flow ends."""
+        self.engine(db)
+        return self._sessions[db]()
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            engines = dict(self._engines)
+        out = {}
+        for db, engine in engines.items():
+            pool = engine.pool
+            out[db.name] = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+                "max_overflow": self.max_overflow,
+            }
+        return out
+
+    def dispose(self):
+        with self._lock:
+            engines, self._engines = self._engines, {}
+            self._sessions = {}
+        for engine in engines.values():
+            engine.dispose()
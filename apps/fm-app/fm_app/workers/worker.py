@@ -1,18 +1,30 @@
 import asyncio
 import logging
+import os
+import time
 from logging.config import dictConfig
 
 import structlog
 from celery import Celery
-from celery.signals import setup_logging
+from celery.signals import (
+    setup_logging,
+    worker_init,
+    worker_process_shutdown,
+    worker_shutdown,
+)
 from celery.utils.log import get_task_logger
 # from pydantic import ValidationError
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-from fm_app.ai_models.llm import AnthropicModel, DeepSeekModel, GeminiModel, OpenAIModel
+from fm_app.ai_models.llm import (
+    AnthropicModel,
+    DeepSeekModel,
+    GeminiModel,
+    OpenAIModel,
+    close_models,
+)
+from fm_app.ai_models.cache import cached_model
+from fm_app.ai_models.replay import replay_model
 from fm_app.api.model import (
-    DBType,
     FlowType,
     ModelType,
     RequestStatus,
@@ -22,17 +34,43 @@ from fm_app.api.model import (
     UpdateRequestModel,
 )
 from fm_app.config import get_settings
-from fm_app.db.db import update_request, update_request_failure, add_request
-from fm_app.stopwatch import stopwatch
+from fm_app.db.db import (
+    add_request,
+    update_request,
+    update_request_failure,
+    update_request_timings,
+)
+from fm_app.db.local_wh import prepare_local_warehouse
+from fm_app.mcp_servers.db_meta import close_db_meta_pools, get_db_meta_pool
+from fm_app.mcp_servers.db_ref import close_db_ref_client
+from fm_app.metrics import (
+    FLOW_DURATION,
+    FLOWS_IN_FLIGHT,
+    QueueDepthCollector,
+    mark_process_dead,
+    start_exporter,
+)
+from fm_app.tracing import (
+    TRACEPARENT_HEADER,
+    add_event,
+    start_trace,
+    summarize,
+    trace_headers,
+)
 from fm_app.workers.agent import close_agent, init_agent
 from fm_app.workers.data_only_flow import data_only_flow
 from fm_app.workers.db_session import get_db
 from fm_app.workers.flex_flow import flex_flow
+from fm_app.workers.flow_runner import FlowRunner
 from fm_app.workers.interactive_flow import interactive_flow
-from fm_app.workers.langgraph_flow import langgraph_flow
+from fm_app.workers.langgraph_flow import (
+    db_pool as langgraph_db_pool,
+    langgraph_flow,
+)
 from fm_app.workers.mcp_flow import mcp_flow
 from fm_app.workers.multistep_flow import multistep_flow
 from fm_app.workers.simple_flow import simple_flow
+from fm_app.workers.warehouse import WarehouseRegistry, wh_profile, wh_urls
 
 settings = get_settings()
 
@@ -101,36 +139,23 @@ app = Celery("ai_handler", broker=settings.wrk_broker_connection)
 
 app.conf.update(broker_connection_retry_on_startup=True)
 
-DATABASE_URL_WH = f"clickhouse+native://{settings.database_wh_user}:{settings.database_wh_pass}@{settings.database_wh_server}:{settings.database_wh_port}/{settings.database_wh_db}{settings.database_wh_params}"
-DATABASE_URL_WH_NEW = f"clickhouse+native://{settings.database_wh_user}:{settings.database_wh_pass}@{settings.database_wh_server_new}:{settings.database_wh_port_new}/{settings.database_wh_db_new}{settings.database_wh_params_new}"
-DATABASE_URL_WH_V2 = f"clickhouse+native://{settings.database_wh_user}:{settings.database_wh_pass}@{settings.database_wh_server_v2}:{settings.database_wh_port_v2}/{settings.database_wh_db_v2}{settings.database_wh_params_v2}"
-
-ENGINE_WH = create_engine(
-    DATABASE_URL_WH, pool_size=40, max_overflow=60, pool_pre_ping=True, pool_recycle=360
-)
-SESSION_WH = sessionmaker(bind=ENGINE_WH, expire_on_commit=False)
-
-ENGINE_WH_NEW = create_engine(
-    DATABASE_URL_WH_NEW,
-    pool_size=40,
-    max_overflow=60,
-    pool_pre_ping=True,
-    pool_recycle=360,
-)
-SESSION_WH_NWW = sessionmaker(bind=ENGINE_WH_NEW, expire_on_commit=False)
-
-ENGINE_WH_V2 = create_engine(
-    DATABASE_URL_WH_V2,
-    pool_size=40,
-    max_overflow=60,
-    pool_pre_ping=True,
-    pool_recycle=360,
+# engines are created on first use, per warehouse profile, sized to the
+# number of flows this process runs at once
+warehouses = WarehouseRegistry(
+    wh_urls(settings),
+    pool_size=settings.wrk_flow_concurrency,
+    max_overflow=settings.wrk_wh_max_overflow,
 )
-SESSION_WH_V2 = sessionmaker(bind=ENGINE_WH_V2, expire_on_commit=False)
 
 loop = asyncio.new_event_loop()
 asyncio.set_event_loop(loop)
 
+flow_runner = FlowRunner(loop, settings.wrk_flow_concurrency)
+if flow_runner.concurrent:
+    # reserve no more messages than we have flow slots; the rest of the backlog
+    # stays on the broker for other workers
+    app.conf.update(worker_prefetch_multiplier=1)
+
 
 def add_fields_to_log(logger, log_method, event_dict):
     if isinstance(logger, logging.Logger):
@@ -164,6 +189,9 @@ def config_loggers(*args, **kwargs):
 
 @app.on_after_finalize.connect
 def setup_agent_context(sender, **kwargs):
+    if settings.dbmeta_local:
+        # the agent talks to the hosted db-meta; offline runs go without it
+        return
     # Run the agent initializer once on worker startup
     asyncio.get_event_loop().run_until_complete(init_agent())
 
@@ -174,18 +202,88 @@ def cleanup_agent_context(sender, **kwargs):
     asyncio.get_event_loop().run_until_complete(close_agent())
 
 
-@app.task(name="wrk_add_request")
-def wrk_add_request(args):
-    return asyncio.get_event_loop().run_until_complete(_wrk_add_request(args))
+@worker_init.connect
+def load_local_warehouse(**kwargs):
+    # DuckDB takes a single writer, so load before any engine opens the file
+    if settings.wh_local_path:
+        prepare_local_warehouse(settings.wh_local_path, settings.wh_local_data_dir)
+
+
+@worker_init.connect
+def start_metrics_exporter(**kwargs):
+    # main worker process only; pool children write to the multiprocess dir
+    if settings.wrk_metrics_port:
+        start_exporter(settings.wrk_metrics_port, QueueDepthCollector(app))
+
+
+@worker_process_shutdown.connect
+def release_process_metrics(**kwargs):
+    mark_process_dead(os.getpid())
+
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def close_process_clients(**kwargs):
+    # LLM clients and MCP sessions are process-wide; release their pools once
+    flow_runner.run(close_models())
+    flow_runner.run(close_db_meta_pools())
+    flow_runner.run(close_db_ref_client())
+    flow_runner.run(langgraph_db_pool.close())
+    flow_runner.stop()
+    warehouses.dispose()
+
+
+@app.task(name="wrk_add_request", bind=True)
+def wrk_add_request(self, args):
+    # set by the API (or a parent flow) so the worker continues its trace
+    traceparent = self.request.get(TRACEPARENT_HEADER) or (
+        self.request.headers or {}
+    ).get(TRACEPARENT_HEADER)
+    return flow_runner.run(_traced_request(args, traceparent))
+
+
+def _label(value) -> str:
+    return str(getattr(value, "value", value))
+
+
+async def _traced_request(args, traceparent):
+    status = RequestStatus.error
+    start = time.perf_counter()
+    FLOWS_IN_FLIGHT.inc()
+    try:
+        with start_trace(
+            "wrk_add_request",
+            traceparent=traceparent,
+            request_id=str(args.get("request_id")),
+            flow=args.get("flow"),
+            model=args.get("model"),
+            db=args.get("db"),
+        ) as trace:
+            request = await _wrk_add_request(args)
+            status = request.status
+    finally:
+        FLOWS_IN_FLIGHT.dec()
+        FLOW_DURATION.labels(
+            _label(args.get("flow")), _label(args.get("model")), _label(status)
+        ).observe(time.perf_counter() - start)
+    timings = summarize(trace)
+    logger.info("Request timings", request_id=args.get("request_id"), **timings)
+    try:
+        async for db in get_db():
+            await update_request_timings(
+                db=db, request_id=args.get("request_id"), timings=timings
+            )
+    except Exception as e:
+        logger.warning("Failed to store request timings", error=str(e))
 
 
 async def _wrk_add_request(args):
     request = WorkerRequest(**args)
+    db_wh = None
     try:
         async for db in get_db():
-            db_wh = SESSION_WH()
-            db_wh_new = SESSION_WH_NWW()
-            db_wh_v2 = SESSION_WH_V2()
+            # only the profile this request targets; closed in `finally`
+            db_wh = warehouses.session(wh_profile(request))
             logger.info(
                 "Got request",
                 args=args,
@@ -194,6 +292,9 @@ async def _wrk_add_request(args):
                 flow=request.flow,
                 model=request.model,
                 db=request.db,
+                **flow_runner.stats(),
+                db_meta_mcp=get_db_meta_pool(settings).stats(),
+                wh_pools=warehouses.stats(),
             )
 
             # new flows
@@ -212,15 +313,7 @@ async def _wrk_add_request(args):
                     llm = AnthropicModel
                 else:
                     raise NotImplementedError("model not known or not implemented")
-
-                if request.db == DBType.legacy:
-                    db_wh = db_wh
-                elif request.db == DBType.new_wh:
-                    db_wh = db_wh_new
-                elif request.db == DBType.v2:
-                    db_wh = db_wh_v2
-                else:
-                    raise NotImplementedError("db not known or not implemented")
+                llm = cached_model(settings, replay_model(settings, llm))
 
                 if request.flow == FlowType.simple:
                     request = await simple_flow(request, llm, db_wh=db_wh, db=db)
@@ -246,11 +339,11 @@ async def _wrk_add_request(args):
             elif request.flow == FlowType.openai_simple_new_wh:
                 OpenAIModel.init(settings)  # Ensure client is initialized
                 request = await simple_flow(
-                    request, OpenAIModel, db_wh=db_wh_new, db=db
+                    request, OpenAIModel, db_wh=db_wh, db=db
                 )
             elif request.flow == FlowType.openai_simple_v2:
                 OpenAIModel.init(settings)  # Ensure client is initialized
-                request = await simple_flow(request, OpenAIModel, db_wh=db_wh_v2, db=db)
+                request = await simple_flow(request, OpenAIModel, db_wh=db_wh, db=db)
             elif request.flow == FlowType.openai_multisteps:
                 OpenAIModel.init(settings)  # Ensure client is initialized
                 request = await multistep_flow(request, OpenAIModel, db_wh=db_wh, db=db)
@@ -260,12 +353,12 @@ async def _wrk_add_request(args):
             elif request.flow == FlowType.deepseek_simple_new_wh:
                 DeepSeekModel.init(settings)  # Ensure client is initialized
                 request = await simple_flow(
-                    request, DeepSeekModel, db_wh=db_wh_new, db=db
+                    request, DeepSeekModel, db_wh=db_wh, db=db
                 )
             elif request.flow == FlowType.deepseek_simple_v2:
                 DeepSeekModel.init(settings)  # Ensure client is initialized
                 request = await simple_flow(
-                    request, DeepSeekModel, db_wh=db_wh_v2, db=db
+                    request, DeepSeekModel, db_wh=db_wh, db=db
                 )
             elif request.flow == FlowType.deepseek_multistep:
                 DeepSeekModel.init(settings)  # Ensure client is initialized
@@ -278,11 +371,11 @@ async def _wrk_add_request(args):
             elif request.flow == FlowType.gemini_simple_new_wh:
                 GeminiModel.init(settings)  # Ensure client is initialized
                 request = await simple_flow(
-                    request, GeminiModel, db_wh=db_wh_new, db=db
+                    request, GeminiModel, db_wh=db_wh, db=db
                 )
             elif request.flow == FlowType.gemini_simple_v2:
                 GeminiModel.init(settings)  # Ensure client is initialized
-                request = await simple_flow(request, GeminiModel, db_wh=db_wh_v2, db=db)
+                request = await simple_flow(request, GeminiModel, db_wh=db_wh, db=db)
             elif request.flow == FlowType.gemini_multistep:
                 GeminiModel.init(settings)  # Ensure client is initialized
                 request = await multistep_flow(request, GeminiModel, db_wh=db_wh, db=db)
@@ -292,12 +385,12 @@ async def _wrk_add_request(args):
             elif request.flow == FlowType.anthropic_simple_new_wh:
                 AnthropicModel.init(settings)  # Ensure client is initialized
                 request = await simple_flow(
-                    request, AnthropicModel, db_wh=db_wh_new, db=db
+                    request, AnthropicModel, db_wh=db_wh, db=db
                 )
             elif request.flow == FlowType.anthropic_simple_v2:
                 AnthropicModel.init(settings)  # Ensure client is initialized
                 request = await simple_flow(
-                    request, AnthropicModel, db_wh=db_wh_v2, db=db
+                    request, AnthropicModel, db_wh=db_wh, db=db
                 )
             elif request.flow == FlowType.anthropic_multistep:
                 AnthropicModel.init(settings)  # Ensure client is initialized
@@ -322,7 +415,7 @@ async def _wrk_add_request(args):
                     flow_step_num=10000,
                 )
 
-                print(">>> DONE", stopwatch.lap())
+                add_event("done")
 
                 status = (
                     RequestStatus.done
@@ -370,8 +463,12 @@ async def _wrk_add_request(args):
                             refs=request.refs,
                         )
                         wrk_arg = wrk_req.model_dump()
-                        task = wrk_add_request.apply_async(
-                            args=[wrk_arg], task_id=task_id
+                        # a broker round-trip; other flows share this loop
+                        task = await asyncio.to_thread(
+                            wrk_add_request.apply_async,
+                            args=[wrk_arg],
+                            task_id=task_id,
+                            headers=trace_headers(),
                         )
                         logging.info(
                             "Send linked task",
@@ -416,5 +513,8 @@ async def _wrk_add_request(args):
             await update_request_failure(err=str(e), status=RequestStatus.error, db=db)
             # await db.close()
 
-    # finally:
-    #    return request
+    finally:
+        if db_wh is not None:
+            await asyncio.to_thread(db_wh.close)
+
+    return request
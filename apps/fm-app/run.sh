@@ -1,3 +1,6 @@
 #!/usr/bin/env sh
 alembic upgrade head
+# the uvicorn workers share their Prometheus samples through this directory
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/fm_app_metrics}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
 uvicorn fm_app:app --host 0.0.0.0 --port 8080 --workers 4 --root-path "$ROOT_PATH"